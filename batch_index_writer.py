@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+from urllib.parse import quote
+
+import typesense
+
+logger = logging.getLogger(__name__)
+
+# Documents per bulk import request, shared by every writer and the ingestion scripts.
+TYPESENSE_IMPORT_BATCH_SIZE = int(os.getenv('TYPESENSE_IMPORT_BATCH_SIZE', '200'))
+
+# Row level errors that will fail the same way on every retry (bad document, missing collection).
+NON_RETRYABLE_CODES = {400, 404, 422}
+
+
+class BatchIndexWriter:
+    """
+    Buffers documents and writes them to a Typesense collection through the bulk
+    import endpoint, retrying only the rows that failed.
+    """
+
+    def __init__(self, client, collection_name, batch_size=TYPESENSE_IMPORT_BATCH_SIZE, action='upsert',
+                 max_retries=3, retry_interval_seconds=1.0):
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.action = action
+        self.max_retries = max_retries
+        self.retry_interval_seconds = retry_interval_seconds
+
+        self.buffer = []
+        self.delete_buffer = []
+        self.indexed = 0
+        self.deleted = 0
+        self.failures = []
+        self.batches = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, document):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, documents):
+        for document in documents:
+            self.add(document)
+
+    def delete(self, document_ids):
+        """Queue documents for deletion; they are removed in batches by id filter."""
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        self.delete_buffer.extend(document_ids)
+        if len(self.delete_buffer) >= self.batch_size:
+            self.flush_deletes()
+
+    def _delete_one(self, document_id):
+        try:
+            self.client.collections[self.collection_name].documents[quote(document_id, safe='')].delete()
+            self.deleted += 1
+        except typesense.exceptions.ObjectNotFound:
+            pass
+        except typesense.exceptions.TypesenseClientError as e:
+            self.failures.append({'id': document_id, 'error': str(e)})
+            logger.error(f"Failed to delete document {document_id} from '{self.collection_name}': {e}")
+
+    def flush_deletes(self):
+        while self.delete_buffer:
+            batch, self.delete_buffer = self.delete_buffer[:self.batch_size], self.delete_buffer[self.batch_size:]
+            # Values are backtick-quoted so commas and brackets in legacy ids are safe; a
+            # backtick cannot be quoted in a filter, so those ids are deleted one by one
+            for document_id in (document_id for document_id in batch if '`' in document_id):
+                self._delete_one(document_id)
+            batch = [document_id for document_id in batch if '`' not in document_id]
+            if not batch:
+                continue
+            filter_by = f"id:[{','.join(f'`{document_id}`' for document_id in batch)}]"
+            try:
+                result = self.client.collections[self.collection_name].documents.delete({'filter_by': filter_by})
+                self.deleted += result.get('num_deleted', 0)
+            except typesense.exceptions.TypesenseClientError as e:
+                self.failures.extend({'id': document_id, 'error': str(e)} for document_id in batch)
+                logger.error(f"Failed to delete {len(batch)} documents from '{self.collection_name}': {e}")
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        self.batches += 1
+
+        pending = batch
+        attempt = 0
+        while pending:
+            results = self._import(pending)
+            retry = []
+            for document, result in zip(pending, results):
+                if result.get('success'):
+                    self.indexed += 1
+                elif attempt < self.max_retries and result.get('code') not in NON_RETRYABLE_CODES:
+                    retry.append(document)
+                else:
+                    self.failures.append({'id': document.get('id'), 'error': result.get('error')})
+                    logger.error(f"Failed to index document {document.get('id')} into '{self.collection_name}': {result.get('error')}")
+
+            if retry:
+                attempt += 1
+                logger.warning(f"Retrying {len(retry)} of {len(pending)} documents for '{self.collection_name}' (attempt {attempt}/{self.max_retries})")
+                time.sleep(self.retry_interval_seconds * attempt)
+            pending = retry
+
+    def _import(self, documents):
+        try:
+            results = self.client.collections[self.collection_name].documents.import_(documents, {'action': self.action})
+        except typesense.exceptions.TypesenseClientError as e:
+            # The whole request failed (timeout, 5xx, ...): treat every row as failed so it gets retried.
+            logger.warning(f"Bulk import into '{self.collection_name}' failed: {e}")
+            retryable = not isinstance(e, (typesense.exceptions.RequestMalformed,
+                                           typesense.exceptions.ObjectNotFound,
+                                           typesense.exceptions.ObjectUnprocessable))
+            code = None if retryable else 400
+            return [{'success': False, 'error': str(e), 'code': code} for _ in documents]
+
+        if len(results) != len(documents):
+            raise typesense.exceptions.TypesenseClientError(
+                f"Bulk import returned {len(results)} results for {len(documents)} documents"
+            )
+        return results
+
+    def close(self):
+        self.flush()
+        self.flush_deletes()
+        if self.started_at is not None and self.finished_at is None:
+            self.finished_at = time.perf_counter()
+            stats = self.stats()
+            logger.info(
+                f"Indexed {stats['indexed']} documents into '{self.collection_name}' in {stats['batches']} batches "
+                f"and deleted {stats['deleted']}, "
+                f"{stats['elapsed_seconds']:.2f}s ({stats['docs_per_sec']:.1f} docs/sec), {stats['failed']} failed"
+            )
+
+    def stats(self):
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            'indexed': self.indexed,
+            'deleted': self.deleted,
+            'failed': len(self.failures),
+            'batches': self.batches,
+            'elapsed_seconds': elapsed,
+            'docs_per_sec': self.indexed / elapsed if elapsed > 0 else 0.0,
+        }
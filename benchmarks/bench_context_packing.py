@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of per-request tokenization cost when building the LLM context.
+
+Compares the previous `extract_content_for_llm` (an encoder lookup and a full encode
+per hit, plus a re-encode of the combined context for logging) with `pack_context`,
+both for hits carrying the token counts stored at ingest and for hits without them.
+
+    python benchmarks/bench_context_packing.py --hits 10 --repeat 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import tiktoken
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_packing import pack_context, render_hit  # noqa: E402
+from tokenization import count_tokens, get_encoding  # noqa: E402
+
+WORDS = ("keras layer model training spacy pipeline tokenizer allennlp crew agent task "
+         "memory gpu batch loss optimizer callback error install version python").split()
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + '.'
+
+
+def make_hits(n, with_counts, seed=0):
+    rng = random.Random(seed)
+    hits = []
+    for _ in range(n):
+        document = {
+            'title': random_text(rng, 10),
+            'bodyText': random_text(rng, 200),
+            'comments': [random_text(rng, 60) for _ in range(5)],
+        }
+        if with_counts:
+            document['token_count'] = count_tokens(document['bodyText'])
+            document['title_token_count'] = count_tokens(document['title'])
+            document['comments_token_count'] = count_tokens(' | '.join(document['comments']))
+        hits.append({'document': document})
+    return hits
+
+
+def legacy_extract(hits, max_tokens=3000):
+    contexts = []
+    total_tokens = 0
+    for hit in hits:
+        content = render_hit(hit['document'])
+        content_tokens = len(tiktoken.get_encoding("cl100k_base").encode(content))
+        if total_tokens + content_tokens > max_tokens:
+            break
+        contexts.append(content)
+        total_tokens += content_tokens
+    combined_context = "\n\n---\n\n".join(contexts)
+    # main() then encoded the whole context again just to log its size.
+    len(tiktoken.get_encoding("cl100k_base").encode(combined_context))
+    return combined_context
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hits', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--max-tokens', type=int, default=3000)
+    args = parser.parse_args()
+
+    get_encoding()  # load the BPE ranks once, outside the timings
+    plain_hits = make_hits(args.hits, with_counts=False)
+    counted_hits = make_hits(args.hits, with_counts=True)
+
+    cases = [
+        ('legacy extract_content_for_llm', lambda: legacy_extract(plain_hits, args.max_tokens)),
+        ('pack_context, no stored counts', lambda: pack_context(plain_hits, args.max_tokens)),
+        ('pack_context, stored counts', lambda: pack_context(counted_hits, args.max_tokens)),
+    ]
+    print(f"{args.hits} hits, {args.max_tokens} token budget, {args.repeat} runs")
+    for name, fn in cases:
+        median, p95 = timed(fn, args.repeat)
+        print(f"{name:<34} median {median:8.3f} ms   p95 {p95:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Offline retrieval benchmark over a labeled query set.
+
+Each line of the query set is a JSON object with a `query` and the ids of the relevant
+discussions (`owner_repo_number`, as assigned at ingest):
+
+    {"query": "How do I give an agent long-term memory?", "relevant": ["crewAIInc_crewAI_1234"]}
+
+Every query runs concurrently through the single search of `search_typesense` and the
+multi_search of all RAG approaches. Relevance is judged per discussion: chunk hits are
+collapsed to their discussion in rank order before scoring. The config, per-system
+summary and per-query scores are written as JSON, so runs can be compared with --compare.
+
+    python benchmarks/bench_retrieval.py queries.jsonl --output results.json
+    python benchmarks/bench_retrieval.py queries.jsonl --bm25 --compare results.json
+
+With --hybrid every query is also embedded (EMBEDDING_PROVIDER) and searched in hybrid
+mode. With --bm25 the queries run against the in-process BM25 indexes built by bm25_index.py,
+and with --corpus against a BM25 index built on the fly from a JSONL export of the
+chunks collection, so no server is needed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25_index import BM25_INDEX_DIR, BM25Index  # noqa: E402
+from embeddings import build_embedder, embed_query  # noqa: E402
+from ingest_pipeline import discussion_id_from_url  # noqa: E402
+from retrievers import BM25Retriever, TypesenseRetriever  # noqa: E402
+from retrieval_metrics import score_rankings, summarize  # noqa: E402
+from search_parameters import RAG_APPROACHES, build_search_parameters  # noqa: E402
+
+SUMMARY_METRICS = ('precision', 'recall', 'f1', 'mrr', 'ndcg', 'latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms')
+
+
+def load_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def discussion_ranking(results):
+    """Distinct discussion ids of the hits, in rank order."""
+    ranking = []
+    for hit in results['hits']:
+        document = hit['document']
+        discussion_id = document.get('discussion_id') or discussion_id_from_url(document.get('url') or document['id'])
+        if discussion_id not in ranking:
+            ranking.append(discussion_id)
+    return ranking
+
+
+def run_query(retriever, collection_name, query, k, approaches, embedder=None):
+    """Rankings and latencies (ms) of one query for `search_typesense` and every approach."""
+    outcome = {}
+
+    started = time.perf_counter()
+    # Embedding the query is part of the hybrid latency, as it is in the app
+    vector = embed_query(embedder, query) if embedder else None
+    params = build_search_parameters(query, k=k, query_vector=vector)
+    if vector:
+        results = retriever.multi_search([{**params, 'collection': collection_name}])[0]
+    else:
+        results = retriever.search(collection_name, params)
+    ranking = [] if 'error' in results else discussion_ranking(results)
+    outcome['search_typesense'] = (ranking, (time.perf_counter() - started) * 1000)
+
+    searches = [
+        {**build_search_parameters(query, k=k, query_vector=vector, **approach['params']), 'collection': collection_name}
+        for approach in approaches
+    ]
+    started = time.perf_counter()
+    response = retriever.multi_search(searches)
+    # All approaches share the one multi_search round-trip, so they share its latency.
+    elapsed = (time.perf_counter() - started) * 1000
+    for approach, approach_results in zip(approaches, response):
+        ranking = [] if 'error' in approach_results else discussion_ranking(approach_results)
+        outcome[approach['name']] = (ranking, elapsed)
+    return outcome
+
+
+def run_benchmark(retriever, collection_name, labeled_queries, k=10, concurrency=8, approaches=RAG_APPROACHES, embedder=None):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(
+            lambda labeled: run_query(retriever, collection_name, labeled['query'], k, approaches, embedder),
+            labeled_queries
+        ))
+
+    relevant_sets = [set(labeled['relevant']) for labeled in labeled_queries]
+    systems = {}
+    per_query = [{'query': labeled['query'], 'relevant': labeled['relevant'], 'systems': {}} for labeled in labeled_queries]
+    for system in outcomes[0] if outcomes else []:
+        rankings = [outcome[system][0] for outcome in outcomes]
+        latencies = [outcome[system][1] for outcome in outcomes]
+        scores = score_rankings(rankings, relevant_sets, k)
+        systems[system] = summarize(scores, latencies)
+        for i, entry in enumerate(per_query):
+            entry['systems'][system] = {
+                'ranking': rankings[i],
+                'latency_ms': latencies[i],
+                **{metric: float(values[i]) for metric, values in scores.items()},
+            }
+    return systems, per_query
+
+
+def print_summary(systems, previous=None):
+    print(f"{'system':<20}" + ''.join(f"{metric:>16}" for metric in SUMMARY_METRICS))
+    for system, summary in systems.items():
+        print(f"{system:<20}" + ''.join(f"{summary.get(metric, 0.0):>16.4f}" for metric in SUMMARY_METRICS))
+        if previous and system in previous:
+            deltas = [summary.get(metric, 0.0) - previous[system].get(metric, 0.0) for metric in SUMMARY_METRICS]
+            print(f"{'  vs previous':<20}" + ''.join(f"{delta:>+16.4f}" for delta in deltas))
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('queries', help="Labeled JSONL query set")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--collection', default='ai_related_discussions')
+    parser.add_argument('--bm25', action='store_true', help=f"Run against the BM25 indexes in {BM25_INDEX_DIR} instead of Typesense")
+    parser.add_argument('--corpus', help="JSONL export of the chunks collection to build a throwaway BM25 index from")
+    parser.add_argument('--hybrid', action='store_true', help="Search in hybrid mode with query embeddings")
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    parser.add_argument('--compare', help="Results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    with open(args.queries, 'rb') as f:
+        queries_sha1 = hashlib.sha1(f.read()).hexdigest()
+    labeled_queries = load_jsonl(args.queries)
+
+    if args.corpus:
+        index = BM25Index.build(load_jsonl(args.corpus), os.path.join(tempfile.mkdtemp(), args.collection))
+        retriever = BM25Retriever({args.collection: index})
+        backend = f"bm25:{os.path.basename(args.corpus)}"
+    elif args.bm25:
+        retriever = BM25Retriever.from_directory([args.collection])
+        backend = f"bm25:{BM25_INDEX_DIR}"
+    else:
+        # Imported here so the TYPESENSE_* settings are read after load_dotenv
+        from typesense_client import build_typesense_client
+        client = build_typesense_client()
+        retriever = TypesenseRetriever(client)
+        backend = 'typesense:' + ','.join(f"{node.host}:{node.port}" for node in client.api_call.all_nodes())
+
+    embedder = build_embedder() if args.hybrid else None
+    if args.hybrid and embedder is None:
+        parser.error("--hybrid needs EMBEDDING_PROVIDER=local or openai, matching the indexed chunks")
+
+    started = time.perf_counter()
+    systems, per_query = run_benchmark(retriever, args.collection, labeled_queries, k=args.k, concurrency=args.concurrency,
+                                       embedder=embedder)
+    elapsed = time.perf_counter() - started
+
+    config = {
+        'queries': os.path.basename(args.queries),
+        'queries_sha1': queries_sha1,
+        'query_count': len(labeled_queries),
+        'k': args.k,
+        'concurrency': args.concurrency,
+        'collection': args.collection,
+        'backend': backend,
+        'mode': f"hybrid:{embedder.name}" if embedder else 'keyword',
+        'approaches': RAG_APPROACHES,
+        'run_at': datetime.utcnow().isoformat(),
+        'elapsed_seconds': elapsed,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            earlier = json.load(f)
+        if (earlier['config']['queries_sha1'], earlier['config']['k']) != (queries_sha1, args.k):
+            print("Warning: the earlier run used a different query set or k; the deltas are not comparable")
+        previous = earlier['systems']
+
+    print(f"{len(labeled_queries)} queries, k={args.k}, {backend}, {elapsed:.2f}s")
+    print_summary(systems, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'systems': systems, 'queries': per_query}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+BM25_INDEX_DIR = os.getenv('BM25_INDEX_DIR', 'bm25_indexes')
+
+# Title terms count double: a title match says more about a chunk than a body match.
+DEFAULT_FIELD_WEIGHTS = {'title': 2.0, 'bodyText': 1.0}
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring over NumPy arrays.
+
+    The postings are stored CSR-style: `term_offsets[t]:term_offsets[t + 1]` slices
+    `postings_docs` (document numbers) and `postings_tf` (weighted term frequencies) for
+    term t. Every array is saved as an .npy file and opened memory-mapped, so loading is
+    near-instant and app processes on the same host share the pages. Documents are kept
+    as JSON lines in `documents.jsonl`, addressed by byte offset.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+            self.vocabulary = json.load(f)
+        self.term_offsets = self._array('term_offsets')
+        self.postings_docs = self._array('postings_docs')
+        self.postings_tf = self._array('postings_tf')
+        self.doc_lengths = self._array('doc_lengths')
+        self.doc_offsets = self._array('doc_offsets')
+        self.idf = self._array('idf')
+        with open(os.path.join(directory, 'documents.jsonl'), 'rb') as f:
+            self.documents_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        self.k1 = self.meta['k1']
+        self.b = self.meta['b']
+        # Per-document part of the BM25 denominator, computed once per process.
+        self.length_norm = (self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.meta['avg_doc_length'], 1e-9))).astype(np.float32)
+        self.columns = {}
+
+    def _array(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+
+    def __len__(self):
+        return self.meta['document_count']
+
+    def document(self, number):
+        start, end = int(self.doc_offsets[number]), int(self.doc_offsets[number + 1])
+        return json.loads(self.documents_map[start:end])
+
+    def column(self, field):
+        """All values of one document field, in document order (loaded once, for filtering)."""
+        if field not in self.columns:
+            self.columns[field] = [self.document(number).get(field) for number in range(len(self))]
+        return self.columns[field]
+
+    def score(self, query, mask=None):
+        """BM25 score of every document for `query`; documents outside `mask` score 0."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            # Each document appears once per term, so plain fancy-index addition is safe.
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+        if mask is not None:
+            scores[~mask] = 0
+        return scores
+
+    def top_k(self, query, k=10, mask=None):
+        """`(document numbers, scores, found)` of the best `k` of the `found` matching documents, best first."""
+        scores = self.score(query, mask)
+        matching = np.flatnonzero(scores > 0)
+        found = len(matching)
+        if found > k:
+            matching = matching[np.argpartition(-scores[matching], k - 1)[:k]] if k > 0 else matching[:0]
+        order = np.lexsort((matching, -scores[matching]))
+        return matching[order], scores[matching[order]], found
+
+    @staticmethod
+    def build(documents, directory, field_weights=DEFAULT_FIELD_WEIGHTS, k1=1.2, b=0.75):
+        """
+        Build an index over `documents` (dicts with an `id`) into `directory`. The index is
+        written next to it first and swapped in, so running processes keep reading the old
+        files until they reopen the index.
+        """
+        staging = f"{directory}.building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        vocabulary = {}
+        posting_terms = []
+        posting_docs = []
+        posting_tfs = []
+        doc_lengths = []
+        doc_offsets = [0]
+        with open(os.path.join(staging, 'documents.jsonl'), 'wb') as f:
+            for number, document in enumerate(documents):
+                frequencies = {}
+                for field, weight in field_weights.items():
+                    for term in tokenize(document.get(field, '')):
+                        frequencies[term] = frequencies.get(term, 0.0) + weight
+                for term, tf in frequencies.items():
+                    posting_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                    posting_docs.append(number)
+                    posting_tfs.append(tf)
+                doc_lengths.append(sum(frequencies.values()))
+                f.write(json.dumps(document).encode('utf-8') + b'\n')
+                doc_offsets.append(f.tell())
+
+        document_count = len(doc_lengths)
+        posting_terms = np.array(posting_terms, dtype=np.int64)
+        posting_docs = np.array(posting_docs, dtype=np.int32)
+        order = np.lexsort((posting_docs, posting_terms))
+        document_frequencies = np.bincount(posting_terms, minlength=len(vocabulary))
+        term_offsets = np.concatenate([[0], np.cumsum(document_frequencies)]).astype(np.int64)
+        idf = np.log(1 + (document_count - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32)
+        doc_lengths = np.array(doc_lengths, dtype=np.float32)
+
+        arrays = {
+            'term_offsets': term_offsets,
+            'postings_docs': posting_docs[order],
+            'postings_tf': np.array(posting_tfs, dtype=np.float32)[order],
+            'doc_lengths': doc_lengths,
+            'doc_offsets': np.array(doc_offsets, dtype=np.int64),
+            'idf': idf,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+        with open(os.path.join(staging, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump(vocabulary, f)
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'document_count': document_count,
+                'term_count': len(vocabulary),
+                'avg_doc_length': float(doc_lengths.mean()) if document_count else 0.0,
+                'field_weights': field_weights,
+                'k1': k1,
+                'b': b,
+            }, f)
+
+        previous = f"{directory}.previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, previous)
+        os.replace(staging, directory)
+        shutil.rmtree(previous, ignore_errors=True)
+        logger.info(f"Built BM25 index of {document_count} documents and {len(vocabulary)} terms in {directory}")
+        return BM25Index(directory)
+
+
+def export_collection(client, collection_name):
+    """Every document of a Typesense collection, streamed from its JSONL export."""
+    for line in client.collections[collection_name].documents.export().splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    # Imported after load_dotenv, as it reads its settings at import time
+    from typesense_client import build_typesense_client
+
+    parser = argparse.ArgumentParser(description="Build the in-process BM25 indexes from the Typesense collections.")
+    parser.add_argument('collections', nargs='*', default=['ai_related_discussions', 'ai_related_discussion_threads'])
+    parser.add_argument('--output', default=BM25_INDEX_DIR, help="Directory holding one index per collection")
+    args = parser.parse_args()
+
+    client = build_typesense_client()
+    for collection_name in args.collections:
+        BM25Index.build(export_collection(client, collection_name), os.path.join(args.output, collection_name))
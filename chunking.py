@@ -0,0 +1,71 @@
+import re
+
+from tokenization import get_encoding
+
+PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_long_sentence(tokens, encoding, target_tokens):
+    for start in range(0, len(tokens), target_tokens):
+        window = tokens[start:start + target_tokens]
+        yield encoding.decode(window), len(window)
+
+
+def _sentences(text, encoding, target_tokens):
+    """Yield `(sentence, token_count, starts_paragraph)` for every sentence of `text`."""
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        first = True
+        for sentence in SENTENCE_SPLIT.split(paragraph.strip()):
+            sentence = ' '.join(sentence.split())
+            if not sentence:
+                continue
+            tokens = encoding.encode(sentence)
+            if len(tokens) <= target_tokens:
+                yield sentence, len(tokens), first
+            else:
+                for piece, count in _split_long_sentence(tokens, encoding, target_tokens):
+                    yield piece, count, first
+                    first = False
+            first = False
+
+
+def chunk_by_tokens(text, target_tokens=256, overlap_tokens=32):
+    """
+    Split `text` into chunks of about `target_tokens` tokens, cutting on sentence
+    boundaries and preferring paragraph boundaries once a chunk is half full.
+
+    Consecutive chunks share up to `overlap_tokens` tokens of trailing sentences.
+    Returns `(chunk_text, token_count)` pairs; the count is measured on the final
+    chunk text so it can be stored and trusted at query time.
+    """
+    encoding = get_encoding()
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def emit():
+        chunk = ' '.join(sentence for sentence, _ in current)
+        chunks.append((chunk, len(encoding.encode(chunk))))
+
+    for sentence, count, starts_paragraph in _sentences(text, encoding, target_tokens):
+        overflow = current_tokens + count > target_tokens
+        paragraph_break = starts_paragraph and current_tokens >= target_tokens // 2
+        if current and (overflow or paragraph_break):
+            emit()
+            # Carry the tail of the previous chunk over as overlap.
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                if carried_tokens + previous[1] > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[1]
+            current = carried if carried_tokens + count <= target_tokens else []
+            current_tokens = sum(c for _, c in current)
+        current.append((sentence, count))
+        current_tokens += count
+
+    if current:
+        emit()
+    return chunks
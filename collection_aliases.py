@@ -0,0 +1,147 @@
+import logging
+import os
+from datetime import datetime
+
+import typesense
+
+logger = logging.getLogger(__name__)
+
+# A rebuilt collection smaller than this share of the live one is not published.
+REINDEX_MIN_RATIO = float(os.getenv('REINDEX_MIN_RATIO', '0.9'))
+# Versions kept per alias after a swap, the live one included, for rolling back by hand.
+REINDEX_KEEP_VERSIONS = int(os.getenv('REINDEX_KEEP_VERSIONS', '2'))
+
+VERSION_SEPARATOR = '__v'
+
+
+class ReindexValidationError(Exception):
+    pass
+
+
+def alias_target(client, alias):
+    """Name of the collection `alias` points at, or None if there is no such alias."""
+    try:
+        return client.aliases[alias].retrieve()['collection_name']
+    except typesense.exceptions.ObjectNotFound:
+        return None
+
+
+def _collection_size(client, collection_name):
+    try:
+        return client.collections[collection_name].retrieve()['num_documents']
+    except typesense.exceptions.ObjectNotFound:
+        return None
+
+
+def create_version(client, alias, fields):
+    name = f"{alias}{VERSION_SEPARATOR}{datetime.utcnow():%Y%m%d%H%M%S%f}"
+    client.collections.create({'name': name, 'fields': fields})
+    logger.info(f"Created collection '{name}' for alias '{alias}'")
+    return name
+
+
+def validate_version(client, alias, collection_name, expected_count=None, min_ratio=REINDEX_MIN_RATIO):
+    """
+    Check a rebuilt collection before it goes live: it must hold `expected_count`
+    documents when given, must not be empty, and must not have shrunk below
+    `min_ratio` of what `alias` serves now. Returns the document count.
+    """
+    count = _collection_size(client, collection_name) or 0
+    if expected_count is not None and count != expected_count:
+        raise ReindexValidationError(f"'{collection_name}' holds {count} documents, expected {expected_count}")
+    if count == 0:
+        raise ReindexValidationError(f"'{collection_name}' is empty")
+    # The alias resolves to the live collection, or to the pre-alias collection of the same name
+    live_count = _collection_size(client, alias)
+    if live_count and count < live_count * min_ratio:
+        raise ReindexValidationError(
+            f"'{collection_name}' holds {count} documents, fewer than {min_ratio:.0%} of the {live_count} served by '{alias}'"
+        )
+    return count
+
+
+def publish_version(client, alias, collection_name):
+    """
+    Atomically point `alias` at `collection_name`.
+
+    A collection named like the alias, left from before aliases were used, shadows the
+    alias while it exists. The alias is therefore upserted and checked first, and the old
+    collection dropped only then: searches fall through to the alias the moment it is
+    gone, and if anything fails before that, the old collection keeps serving.
+    """
+    legacy = alias_target(client, alias) is None and _collection_size(client, alias) is not None
+    client.aliases.upsert(alias, {'collection_name': collection_name})
+    if legacy:
+        if alias_target(client, alias) != collection_name:
+            raise ReindexValidationError(f"Alias '{alias}' does not point at '{collection_name}'; keeping collection '{alias}'")
+        logger.warning(f"Dropping collection '{alias}', now replaced by the alias of the same name")
+        client.collections[alias].delete()
+    logger.info(f"Alias '{alias}' now points at '{collection_name}'")
+
+
+def garbage_collect(client, alias, keep=REINDEX_KEEP_VERSIONS):
+    """Drop all but the newest `keep` versions of `alias`; the live version is always kept. Returns the dropped names."""
+    live = alias_target(client, alias)
+    versions = sorted(
+        (collection['name'] for collection in client.collections.retrieve()
+         if collection['name'].startswith(f"{alias}{VERSION_SEPARATOR}")),
+        reverse=True
+    )
+    dropped = []
+    for name in versions[max(keep, 1):]:
+        if name == live:
+            continue
+        client.collections[name].delete()
+        dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped old versions of '{alias}': {dropped}")
+    return dropped
+
+
+def blue_green_reindex(client, layouts, load, versions=None, keep=REINDEX_KEEP_VERSIONS, min_ratio=REINDEX_MIN_RATIO,
+                       existing=None, keep_failed=False):
+    """
+    Rebuild the collections behind a set of aliases without touching what they serve.
+
+    `layouts` maps every alias to its schema fields. A new versioned collection is created
+    per alias and `load(targets)` fills them, `targets` mapping each alias to its new
+    collection; it returns the expected document count per alias (or None to skip that
+    check). Only when every new collection validates are the aliases repointed, in the
+    order of `layouts`, and the old versions garbage-collected. On failure the new
+    collections are dropped and the aliases keep serving the previous versions. The
+    version stamps in `versions` (a CollectionVersions) are bumped so cached searches of
+    the aliases are invalidated. `existing` maps aliases to unpublished versions an
+    interrupted rebuild left behind, to continue filling instead of starting over; with
+    `keep_failed` a failed load leaves its versions in place for that. Older versions are
+    garbage-collected by the next successful swap. Returns the published collection per alias.
+    """
+    targets = {}
+    try:
+        for alias, fields in layouts.items():
+            resumed = (existing or {}).get(alias)
+            if resumed and _collection_size(client, resumed) is not None and resumed != alias_target(client, alias):
+                logger.info(f"Continuing the rebuild of '{alias}' in '{resumed}'")
+                targets[alias] = resumed
+            else:
+                targets[alias] = create_version(client, alias, fields)
+        expected_counts = load(targets) or {}
+        for alias, collection_name in targets.items():
+            count = validate_version(client, alias, collection_name, expected_counts.get(alias), min_ratio)
+            logger.info(f"Validated '{collection_name}' with {count} documents")
+    except Exception as e:
+        if keep_failed and not isinstance(e, ReindexValidationError):
+            raise
+        for collection_name in targets.values():
+            try:
+                client.collections[collection_name].delete()
+            except typesense.exceptions.ObjectNotFound:
+                pass
+        raise
+
+    for alias, collection_name in targets.items():
+        publish_version(client, alias, collection_name)
+        if versions is not None:
+            versions.bump(alias)
+    for alias in targets:
+        garbage_collect(client, alias, keep)
+    return targets
@@ -0,0 +1,119 @@
+import math
+import os
+import re
+
+from bm25_index import tokenize
+from context_packing import render_hit, stored_token_count, template_tokens
+from tokenization import get_encoding
+
+CONTEXT_COMPRESSION_ENABLED = os.getenv('CONTEXT_COMPRESSION_ENABLED', 'true').lower() == 'true'
+# Share of each hit's sentences kept as top-scoring spans, before neighbours are added back.
+CONTEXT_COMPRESSION_KEEP_RATIO = float(os.getenv('CONTEXT_COMPRESSION_KEEP_RATIO', '0.25'))
+# Sentences kept on each side of a selected one, so a span still reads on its own.
+CONTEXT_COMPRESSION_NEIGHBOURS = int(os.getenv('CONTEXT_COMPRESSION_NEIGHBOURS', '1'))
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+GAP_MARKER = '[...]'
+
+
+def split_sentences(text):
+    return [sentence for sentence in (' '.join(part.split()) for part in SENTENCE_SPLIT.split(text or '')) if sentence]
+
+
+def _passages(document):
+    """The body and every comment of a document, each as a list of sentences."""
+    return [split_sentences(document.get('bodyText', ''))] + [split_sentences(comment) for comment in document.get('comments', [])]
+
+
+def sentence_idf(passages_per_hit):
+    """Inverse document frequency of every term, treating each sentence of the retrieved hits as a document."""
+    frequencies = {}
+    count = 0
+    for passages in passages_per_hit:
+        for sentences in passages:
+            for sentence in sentences:
+                count += 1
+                for term in set(tokenize(sentence)):
+                    frequencies[term] = frequencies.get(term, 0) + 1
+    return {term: math.log(1 + count / frequency) for term, frequency in frequencies.items()}
+
+
+def select_sentences(passages, query_terms, idf, keep_ratio, neighbours):
+    """
+    Positions `(passage, sentence)` to keep: the best `keep_ratio` of the sentences by the
+    summed IDF of the query terms they contain, plus `neighbours` sentences on each side.
+    Without any matching sentence the lead sentence of the body is kept.
+    """
+    scored = []
+    for p, sentences in enumerate(passages):
+        for s, sentence in enumerate(sentences):
+            score = sum(idf.get(term, 0.0) for term in query_terms & set(tokenize(sentence)))
+            if score > 0:
+                scored.append((score, p, s))
+    total = sum(len(sentences) for sentences in passages)
+    scored.sort(key=lambda item: (-item[0], item[1], item[2]))
+    top = scored[:max(1, math.ceil(total * keep_ratio))]
+    if not top:
+        return {(0, 0)} if passages[0] else set()
+
+    keep = set()
+    for _, p, s in top:
+        for neighbour in range(max(s - neighbours, 0), min(s + neighbours + 1, len(passages[p]))):
+            keep.add((p, neighbour))
+    return keep
+
+
+def _join(sentences, keep, p):
+    """Kept sentences of one passage in order, with GAP_MARKER wherever sentences were dropped."""
+    parts = []
+    previous = -1
+    for s, sentence in enumerate(sentences):
+        if (p, s) not in keep:
+            continue
+        if parts and s != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(sentence)
+        previous = s
+    return ' '.join(parts)
+
+
+def compress_hits(hits, query, keep_ratio=CONTEXT_COMPRESSION_KEEP_RATIO, neighbours=CONTEXT_COMPRESSION_NEIGHBOURS):
+    """
+    Query-focused extractive compression of the retrieved hits. The sentences of every
+    body and comment are scored against the query with TF-IDF weights computed over the
+    retrieved sentences, and only the best spans (with their neighbours) are kept.
+    Titles stay whole. Returns the compressed hits and the token counts before and after.
+    """
+    query_terms = set(tokenize(query))
+    passages_per_hit = [_passages(hit['document']) for hit in hits]
+    idf = sentence_idf(passages_per_hit)
+
+    compressed = []
+    for hit, passages in zip(hits, passages_per_hit):
+        keep = select_sentences(passages, query_terms, idf, keep_ratio, neighbours)
+        document = {key: value for key, value in hit['document'].items()
+                    if key not in ('token_count', 'comments_token_count')}
+        document['bodyText'] = _join(passages[0], keep, 0)
+        document['comments'] = [text for text in (_join(sentences, keep, p) for p, sentences in enumerate(passages[1:], 1)) if text]
+        compressed.append({**hit, 'document': document})
+
+    encoding = get_encoding()
+    original_counts = [stored_token_count(hit['document']) for hit in hits]
+    missing = [i for i, count in enumerate(original_counts) if count is None]
+    for i, tokens in zip(missing, encoding.encode_batch([render_hit(hits[i]['document']) for i in missing])):
+        original_counts[i] = len(tokens)
+    compressed_counts = [len(tokens) for tokens in encoding.encode_batch([render_hit(hit['document']) for hit in compressed])]
+    # pack_context reuses the measured counts instead of encoding the compressed hits again;
+    # the whole rendered hit is counted in `token_count`, so the template is taken out of it
+    for hit, count in zip(compressed, compressed_counts):
+        hit['document']['token_count'] = count - template_tokens()
+        hit['document']['title_token_count'] = 0
+        hit['document']['comments_token_count'] = 0
+
+    original_tokens = sum(original_counts)
+    compressed_tokens = sum(compressed_counts)
+    return compressed, {
+        'original_tokens': original_tokens,
+        'compressed_tokens': compressed_tokens,
+        'compression_ratio': original_tokens / compressed_tokens if compressed_tokens else 1.0,
+    }
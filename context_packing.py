@@ -0,0 +1,91 @@
+from functools import lru_cache
+
+from tokenization import get_encoding
+
+CONTEXT_TEMPLATE = "Title: {title}\n\nBody: {body}\n\nComments: {comments}"
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Leftover budget below this is not worth filling with a truncated hit.
+MIN_TRUNCATED_TOKENS = 64
+
+
+def render_hit(document):
+    return CONTEXT_TEMPLATE.format(
+        title=document.get('title', ''),
+        body=document.get('bodyText', ''),
+        comments=' | '.join(document.get('comments', []))
+    )
+
+
+@lru_cache(maxsize=None)
+def template_tokens():
+    return len(get_encoding().encode(CONTEXT_TEMPLATE.format(title='', body='', comments='')))
+
+
+@lru_cache(maxsize=None)
+def separator_tokens():
+    return len(get_encoding().encode(CONTEXT_SEPARATOR))
+
+
+def stored_token_count(document):
+    """Tokens of a rendered hit from the counts stored at ingest, or None if the document has none."""
+    counts = [document.get('token_count'), document.get('title_token_count'), document.get('comments_token_count')]
+    if any(count is None for count in counts):
+        return None
+    return sum(counts) + template_tokens()
+
+
+def pack_context(hits, max_tokens=3000):
+    """
+    Fill a token budget with retrieved hits in relevance order.
+
+    Hits that do not fit are skipped rather than ending the packing, so smaller
+    lower-ranked hits can still use the budget, and the best-ranked skipped hit is
+    truncated at a token boundary to fill what is left. Token counts come from the
+    stored ingest counts; hits without them are encoded together in one batch.
+
+    Returns a dict with the context `text`, its `token_count`, the number of
+    `hits_used` and whether the last hit was `truncated`.
+    """
+    encoding = get_encoding()
+    documents = [hit['document'] for hit in hits]
+    texts = [render_hit(document) for document in documents]
+    counts = [stored_token_count(document) for document in documents]
+
+    missing = [i for i, count in enumerate(counts) if count is None]
+    encoded = {}
+    if missing:
+        encoded = dict(zip(missing, encoding.encode_batch([texts[i] for i in missing])))
+        for i, tokens in encoded.items():
+            counts[i] = len(tokens)
+
+    selected = []
+    skipped = []
+    total_tokens = 0
+    for i, count in enumerate(counts):
+        cost = count + (separator_tokens() if selected else 0)
+        if total_tokens + cost <= max_tokens:
+            selected.append(i)
+            total_tokens += cost
+        else:
+            skipped.append(i)
+
+    truncated_text = None
+    if skipped:
+        remaining = max_tokens - total_tokens - (separator_tokens() if selected else 0)
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            tokens = encoded.get(skipped[0]) or encoding.encode(texts[skipped[0]])
+            tokens = tokens[:remaining]
+            truncated_text = encoding.decode(tokens)
+            total_tokens += len(tokens) + (separator_tokens() if selected else 0)
+
+    parts = [texts[i] for i in selected]
+    if truncated_text is not None:
+        parts.append(truncated_text)
+
+    return {
+        'text': CONTEXT_SEPARATOR.join(parts),
+        'token_count': total_tokens,
+        'hits_used': len(parts),
+        'truncated': truncated_text is not None,
+    }
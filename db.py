@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import create_engine, BigInteger, Boolean, Column, Integer, String, Float, DateTime, Text, JSON, Index
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+# Database setup
+DB_USER = os.getenv('POSTGRES_USER', 'llm_logging_user')
+DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'llm_logging_password')
+DB_HOST = os.getenv('POSTGRES_HOST', 'host.docker.internal')  
+DB_PORT = os.getenv('POSTGRES_PORT', '5433')
+DB_NAME = os.getenv('POSTGRES_DB', 'llm_logging_db')
+
+# Every app process shares one bounded pool; keep pool_size + max_overflow per process well
+# below the server's max_connections.
+DB_POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('POSTGRES_MAX_OVERFLOW', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('POSTGRES_POOL_TIMEOUT', '10'))
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=1800
+)
+Session = sessionmaker(bind=engine)
+Base = declarative_base()
+
+# The tables are created by the SQL files in migrations/ (see migrate.py), not create_all.
+# The log tables are range-partitioned by month on timestamp, which is therefore part of their key.
+
+class LLMResponse(Base):
+    __tablename__ = 'llm_responses'
+
+    id = Column(BigInteger, primary_key=True)
+    query = Column(String)
+    response = Column(String)
+    rating = Column(Float, index=True)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+
+class LLMCacheEntry(Base):
+    __tablename__ = 'llm_cache'
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)
+    params_hash = Column(String(64), nullable=False, index=True)
+    context_hash = Column(String(64), nullable=False)
+    prompt = Column(Text, nullable=False)
+    embedding = Column(JSON)
+    response = Column(Text, nullable=False)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime)
+
+class RAGRequestMetrics(Base):
+    __tablename__ = 'rag_request_metrics'
+
+    id = Column(BigInteger, primary_key=True)
+    request_id = Column(String(32), nullable=False, index=True)
+    operation = Column(String(32), nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+    duration_ms = Column(Float, nullable=False)
+    approach = Column(String(64))
+    strategy = Column(String(32))
+    hit_count = Column(Integer)
+    hits_used = Column(Integer)
+    context_tokens = Column(Integer)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    cache_hits = Column(Integer)
+    precision = Column(Float)
+    recall = Column(Float)
+    f1_score = Column(Float)
+    compression_ratio = Column(Float)
+
+class RAGStageMetrics(Base):
+    __tablename__ = 'rag_stage_metrics'
+    __table_args__ = (Index('ix_rag_stage_metrics_stage_timestamp', 'stage', 'timestamp'),)
+
+    id = Column(BigInteger, primary_key=True)
+    request_id = Column(String(32), nullable=False, index=True)
+    operation = Column(String(32), nullable=False)
+    stage = Column(String(32), nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    duration_ms = Column(Float, nullable=False)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    hit_count = Column(Integer)
+    cache_hit = Column(Boolean)
+    attributes = Column(JSON(none_as_null=True))
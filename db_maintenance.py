@@ -0,0 +1,85 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ('llm_responses', 'rag_request_metrics', 'rag_stage_metrics')
+
+PARTITION_MONTHS_AHEAD = int(os.getenv('LOG_PARTITION_MONTHS_AHEAD', '3'))
+LOG_RETENTION_MONTHS = int(os.getenv('LOG_RETENTION_MONTHS', '6'))
+MINUTE_ROLLUP_RETENTION_DAYS = int(os.getenv('MINUTE_ROLLUP_RETENTION_DAYS', '14'))
+# Each refresh also recomputes the buckets this far before the previous one, for rows committed late.
+ROLLUP_LOOKBACK_MINUTES = int(os.getenv('ROLLUP_LOOKBACK_MINUTES', '15'))
+
+
+def ensure_partitions(engine, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create the monthly partitions from the current month to `months_ahead` months out. Returns how many were created."""
+    today = datetime.utcnow().date()
+    created = 0
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            created += connection.execute(
+                text("SELECT create_monthly_partitions(:parent, CAST(:first AS DATE), CAST(CAST(:first AS DATE) + make_interval(months => :months) AS DATE))"),
+                {'parent': table, 'first': today, 'months': months_ahead}
+            ).scalar()
+    return created
+
+
+def refresh_rollups(engine, lookback_minutes=ROLLUP_LOOKBACK_MINUTES):
+    """
+    Recompute the minute and hour rollup buckets with rows since the last refresh, minus
+    `lookback_minutes`. Returns the number of buckets that changed.
+    """
+    with engine.begin() as connection:
+        return connection.execute(
+            text("SELECT refresh_metrics_rollups(make_interval(mins => :minutes))"), {'minutes': lookback_minutes}
+        ).scalar()
+
+
+def apply_retention(engine, retention_months=LOG_RETENTION_MONTHS, minute_retention_days=MINUTE_ROLLUP_RETENTION_DAYS):
+    """
+    Drop log partitions older than `retention_months` (a metadata-only operation, no row
+    deletes) and minute rollups older than `minute_retention_days`. Hour rollups are kept.
+    """
+    today = datetime.utcnow().date()
+    month = today.month - 1 - retention_months
+    cutoff = datetime(today.year + month // 12, month % 12 + 1, 1)
+    dropped = []
+    with engine.begin() as connection:
+        # Roll up before the rows disappear, so the hour rollups keep their history.
+        connection.execute(text("SELECT refresh_metrics_rollups()"))
+        for table in PARTITIONED_TABLES:
+            dropped.extend(connection.execute(
+                text("SELECT drop_partitions_before(:parent, :cutoff)"), {'parent': table, 'cutoff': cutoff}
+            ).scalars())
+        connection.execute(
+            text("DELETE FROM rag_metrics_minute WHERE bucket < :cutoff"),
+            {'cutoff': datetime.utcnow() - timedelta(days=minute_retention_days)}
+        )
+    return dropped
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from db import engine
+    from migrate import run_migrations
+
+    parser = argparse.ArgumentParser(description="Maintain the interaction log: migrations, partitions, rollups and retention.")
+    parser.add_argument('--no-retention', action='store_true', help="Skip dropping old partitions and minute rollups")
+    parser.add_argument('--rollup-lookback-minutes', type=int, default=ROLLUP_LOOKBACK_MINUTES,
+                        help="Also recompute rollups this far back, e.g. to cover records replayed after an outage")
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    logger.info(f"Created {ensure_partitions(engine)} partitions")
+    logger.info(f"Refreshed {refresh_rollups(engine, args.rollup_lookback_minutes)} rollup buckets")
+    if not args.no_retention:
+        dropped = apply_retention(engine)
+        logger.info(f"Dropped {len(dropped)} partitions" + (f": {', '.join(dropped)}" if dropped else ""))
@@ -0,0 +1,132 @@
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from hashing import hashing_embedding
+
+logger = logging.getLogger(__name__)
+
+# 'none' (default) disables the embedding stage, which only SEARCH_MODE=hybrid uses;
+# 'local' is a deterministic hashing embedder (offline, free); 'openai' calls the embeddings API.
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'none')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-ada-002')
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '1536' if EMBEDDING_PROVIDER == 'openai' else '256'))
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '.embedding_cache.sqlite')
+
+
+class HashingEmbedder:
+    """Deterministic local embedder, for offline runs and tests; captures word overlap only."""
+
+    def __init__(self, dimensions=EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts):
+        return [hashing_embedding(text, self.dimensions) for text in texts]
+
+
+class OpenAIEmbedder:
+    def __init__(self, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+        import openai
+
+        self.openai = openai
+        self.model = model
+        self.dimensions = dimensions
+        self.name = f"openai:{model}"
+
+    def embed(self, texts):
+        response = self.openai.Embedding.create(input=list(texts), model=self.model)
+        return [item['embedding'] for item in sorted(response['data'], key=lambda item: item['index'])]
+
+
+def build_embedder(provider=EMBEDDING_PROVIDER):
+    """The configured embedder, or None when embeddings are disabled."""
+    if provider == 'none':
+        return None
+    if provider == 'openai':
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by embedder name and document content hash in a local SQLite file,
+    so a chunk is embedded once per model no matter how often it is re-indexed.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, content_hash))"
+            )
+
+    def get_many(self, model, content_hashes):
+        found = {}
+        content_hashes = list(content_hashes)
+        with self.lock:
+            # Stay below SQLite's bound-parameter limit.
+            for start in range(0, len(content_hashes), 500):
+                chunk = content_hashes[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk]
+                )
+                for content_hash, vector in rows:
+                    found[content_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, vectors):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector) VALUES (?, ?, ?)",
+                [(model, content_hash, np.asarray(vector, dtype=np.float32).tobytes()) for content_hash, vector in vectors.items()]
+            )
+
+
+def embedding_text(document):
+    return f"{document.get('title', '')}\n\n{document.get('bodyText', '')}"
+
+
+def embed_documents(documents, embedder, cache=None, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Set `embedding` on every document. Vectors come from the cache by content hash when
+    possible; the rest are embedded in batches of `batch_size` and cached. Returns the
+    numbers of `embedded` and `cached` documents.
+    """
+    vectors = cache.get_many(embedder.name, {document['content_hash'] for document in documents}) if cache else {}
+    cached = sum(1 for document in documents if document['content_hash'] in vectors)
+
+    missing = {}
+    for document in documents:
+        if document['content_hash'] not in vectors:
+            missing.setdefault(document['content_hash'], embedding_text(document))
+    hashes = list(missing)
+    for start in range(0, len(hashes), batch_size):
+        batch = hashes[start:start + batch_size]
+        computed = dict(zip(batch, embedder.embed([missing[content_hash] for content_hash in batch])))
+        if cache:
+            cache.put_many(embedder.name, computed)
+        vectors.update(computed)
+
+    for document in documents:
+        document['embedding'] = vectors[document['content_hash']]
+    return {'embedded': len(missing), 'cached': cached}
+
+
+@lru_cache(maxsize=1024)
+def _embed_query(embedder, query):
+    return tuple(embedder.embed([query])[0])
+
+
+def embed_query(embedder, query):
+    """Query vector, memoized per process since rewritten and repeated queries recur."""
+    return list(_embed_query(embedder, query))
@@ -1,149 +1,117 @@
+import argparse
 import os
+import tempfile
 from dotenv import load_dotenv
 import typesense
-import requests
 import logging
 
 # Load environment variables
 load_dotenv()
 
+# Local modules read their settings from the environment at import time
+from collection_aliases import blue_green_reindex
+from batch_index_writer import TYPESENSE_IMPORT_BATCH_SIZE
+from embeddings import EmbeddingCache, build_embedder
+import github_fetcher
+from ingest_pipeline import run_ingest_pipeline
+from github_fetcher import GitHubGraphQLClient
+from index_versions import CollectionVersions
+from sync_state import SyncStateStore
+from typesense_client import build_typesense_client
+from typesense_schema import CHUNK_SCHEMA_FIELDS, DISCUSSION_SCHEMA_FIELDS, ensure_schema_fields
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Typesense client setup
-node = {
-    "host": "localhost",
-    "port": "8108",
-    "protocol": "http"
-}
-typesense_client = typesense.Client(
-    {
-      "nodes": [node],
-      "api_key": os.getenv('TYPESENSE_API_KEY'),
-      "connection_timeout_seconds": 2
-    }
-)
+# Typesense client setup (TYPESENSE_NODES, TYPESENSE_API_KEY, ...)
+typesense_client = build_typesense_client()
 collection_name = "ai_related_discussions"
+# Discussion-level records (url, author, comments) referenced by the chunks
+discussions_collection_name = "ai_related_discussion_threads"
+
+# Number of chunk documents sent per bulk import request
+IMPORT_BATCH_SIZE = int(os.getenv('TYPESENSE_IMPORT_BATCH_SIZE', TYPESENSE_IMPORT_BATCH_SIZE))
 
 # GitHub API details
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
-    "Content-Type": "application/json"
-}
-
-def chunk_text(text, chunk_size=200):
-    words = text.split()
-    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-
-def fetch_discussions(owner, repo):
-    query = """
-    query($cursor: String) {
-      repository(owner: "%s", name: "%s") {
-        discussions(first: 100, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
-          pageInfo {
-            endCursor
-            hasNextPage
-          }
-          edges {
-            node {
-              title
-              bodyText
-              createdAt
-              url
-              author {
-                login
-              }
-              comments(first: 5) {
-                edges {
-                  node {
-                    bodyText
-                    author {
-                      login
-                    }
-                  }
-                }
-              }
-            }
-          }
-        }
-      }
-    }
-    """ % (owner, repo)
-
-    variables = {
-        "cursor": None
-    }
-
-    discussions = []
-
-    while True:
-        response = requests.post(
-            'https://api.github.com/graphql',
-            headers=HEADERS,
-            json={'query': query, 'variables': variables}
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"Query failed to run by returning code of {response.status_code}. {response.text}")
-
-        response_json = response.json()
-        if 'errors' in response_json:
-            raise Exception(f"GraphQL query error: {response_json['errors']}")
+github_client = GitHubGraphQLClient(GITHUB_TOKEN)
 
-        if 'data' not in response_json or 'repository' not in response_json['data'] or 'discussions' not in response_json['data']['repository']:
-            raise Exception(f"Unexpected response format: {response_json}")
+# Chunk embeddings for hybrid search (EMBEDDING_PROVIDER=none skips them); unchanged chunks reuse the cached vectors
+embedder = build_embedder()
+embedding_cache = EmbeddingCache() if embedder else None
 
-        data = response_json['data']['repository']['discussions']
-        discussions.extend([edge['node'] for edge in data['edges']])
-
-        if not data['pageInfo']['hasNextPage']:
-            break
-
-        variables['cursor'] = data['pageInfo']['endCursor']
-
-    return discussions
-
-def create_collection_if_not_exists(collection_name):
+def create_collection_if_not_exists(collection_name, fields=CHUNK_SCHEMA_FIELDS):
     schema = {
         'name': collection_name,
-        'fields': [
-            {'name': 'repository', 'type': 'string'},
-            {'name': 'title', 'type': 'string'},
-            {'name': 'bodyText', 'type': 'string'},
-            {'name': 'createdAt', 'type': 'string'},
-            {'name': 'url', 'type': 'string'},
-            {'name': 'author', 'type': 'string'},
-            {'name': 'comments', 'type': 'string[]'}
-        ]
+        'fields': fields
     }
 
     try:
         typesense_client.collections[collection_name].retrieve()
         print(f"Collection '{collection_name}' already exists.")
+        added, _ = ensure_schema_fields(typesense_client, collection_name, fields)
+        if added:
+            print(f"Added fields {added} to collection '{collection_name}'.")
     except typesense.exceptions.ObjectNotFound:
         typesense_client.collections.create(schema)
         print(f"Collection '{collection_name}' created.")
 
-def insert_into_typesense(collection_name, discussions, repo_info):
-    create_collection_if_not_exists(collection_name)
-
-    for discussion in discussions:
-        chunks = chunk_text(discussion['bodyText'])
-        for chunk in chunks:
-            document_id = f"{repo_info['owner']}_{repo_info['repo']}_{discussion['createdAt']}_{chunk[:50]}"
-            document = {
-                'id': document_id,
-                'repository': f"{repo_info['owner']}/{repo_info['repo']}",
-                'title': discussion['title'],
-                'bodyText': chunk,
-                'createdAt': discussion['createdAt'],
-                'url': discussion['url'],
-                'author': discussion['author']['login'],
-                'comments': [comment['node']['bodyText'] for comment in discussion['comments']['edges']]
-            }
-            typesense_client.collections[collection_name].documents.upsert(document)
+def sync_repository(repo_info, sync_state, full=False, targets=None):
+    """Sync one repository into the collections (or aliases); `targets` maps them to other collections to write to."""
+    targets = targets or {}
+    since = None if full else sync_state.watermark(repo_info['owner'], repo_info['repo'])
+    mode = f"changes since {since}" if since else "full sync"
+    print(f"Syncing discussions for {repo_info['owner']}/{repo_info['repo']} ({mode})...")
+    result = run_ingest_pipeline(github_client, typesense_client, targets.get(collection_name, collection_name),
+                                 targets.get(discussions_collection_name, discussions_collection_name), repo_info,
+                                 since=since, batch_size=IMPORT_BATCH_SIZE, embedder=embedder, embedding_cache=embedding_cache)
+    if not result['discussions']:
+        print(f"No new discussions for {repo_info['owner']}/{repo_info['repo']}.")
+        return result
+
+    print(f"Indexed {result['indexed']} chunks from {result['discussions']} discussions for "
+          f"{repo_info['owner']}/{repo_info['repo']} ({result['unchanged']} unchanged, {result['deleted']} deleted, "
+          f"{result['docs_per_sec']:.1f} docs/sec, {result['failed']} failed, "
+          f"{result['embedded']} embedded, {result['embeddings_cached']} embeddings cached).")
+    if result['failed'] == 0:
+        sync_state.update(repo_info['owner'], repo_info['repo'], result['updatedAt'], result['createdAt'], result['cursor'])
+    else:
+        print("Some chunks failed to index; keeping the previous watermark.")
+    return result
+
+def reindex(repositories, sync_state):
+    """
+    Blue/green rebuild: sync every repository from scratch into new versioned collections
+    while the aliases keep serving the current ones, then swap the aliases once the
+    document counts check out. Watermarks only advance when the new collections go live.
+    """
+    rebuild_state = SyncStateStore(os.path.join(tempfile.mkdtemp(), 'sync_state.json'))
+
+    def load(targets):
+        results = github_fetcher.run_for_repositories(
+            repositories, lambda repo_info: sync_repository(repo_info, rebuild_state, full=True, targets=targets)
+        )
+        failed = [f"{repo_info['owner']}/{repo_info['repo']}" for repo_info, result, error in results
+                  if error is not None or result['failed']]
+        if failed:
+            raise RuntimeError(f"Rebuild incomplete for {failed}; keeping the current collections")
+        return {
+            collection_name: sum(result['indexed'] for _, result, _ in results),
+            discussions_collection_name: sum(result['discussions_indexed'] for _, result, _ in results),
+        }
+
+    # Discussions go live first, so chunks served from the new version always find their parent
+    published = blue_green_reindex(
+        typesense_client,
+        {discussions_collection_name: DISCUSSION_SCHEMA_FIELDS, collection_name: CHUNK_SCHEMA_FIELDS},
+        load, versions=CollectionVersions(typesense_client)
+    )
+    for repo_info in repositories:
+        entry = rebuild_state.get(repo_info['owner'], repo_info['repo'])
+        if entry:
+            sync_state.update(repo_info['owner'], repo_info['repo'], entry.get('updatedAt'), entry.get('createdAt'), entry.get('cursor'))
+    print(f"Published {published}.")
 
 def verify_data_insertion(collection_name):
     try:
@@ -173,6 +141,13 @@ def print_sample_documents(collection_name, sample_size=5):
 
 # Main function
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync GitHub discussions into Typesense.")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the stored watermarks and resync every discussion.")
+    parser.add_argument('--reindex', action='store_true',
+                        help="Rebuild both collections into new versions and swap the aliases once they validate.")
+    args = parser.parse_args()
+
     collection_name = "ai_related_discussions"  
     repositories = [
         {"owner": "keras-team", "repo": "keras"},
@@ -180,18 +155,16 @@ if __name__ == "__main__":
         {"owner": "allenai", "repo": "allennlp"},
         {"owner": "crewAIInc", "repo": "crewAI"}
     ]
-
-    for repo_info in repositories:
-        try:
-            print(f"Fetching discussions for {repo_info['owner']}/{repo_info['repo']}...")
-            discussions = fetch_discussions(repo_info['owner'], repo_info['repo'])
-            if discussions:
-                print(f"Fetched {len(discussions)} discussions. Inserting into Typesense...")
-                insert_into_typesense(collection_name, discussions, repo_info)
-            else:
-                print(f"No discussions found for {repo_info['owner']}/{repo_info['repo']}. Skipping...")
-        except Exception as e:
-            print(f"Error fetching discussions for {repo_info['owner']}/{repo_info['repo']}: {e}")
+    sync_state = SyncStateStore()
+    if args.reindex:
+        reindex(repositories, sync_state)
+    else:
+        create_collection_if_not_exists(collection_name)
+        create_collection_if_not_exists(discussions_collection_name, DISCUSSION_SCHEMA_FIELDS)
+
+        github_fetcher.run_for_repositories(
+            repositories, lambda repo_info: sync_repository(repo_info, sync_state, full=args.full)
+        )
 
     verify_data_insertion(collection_name)
     print_sample_documents(collection_name)
@@ -0,0 +1,251 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Point this at a local stub server to exercise the fetcher without GitHub.
+GITHUB_GRAPHQL_URL = os.getenv('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+MAX_CONCURRENT_REPOSITORIES = int(os.getenv('GITHUB_MAX_CONCURRENT_REPOSITORIES', '4'))
+
+DISCUSSIONS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
+  repository(owner: $owner, name: $name) {
+    discussions(first: 100, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo {
+        endCursor
+        hasNextPage
+      }
+      edges {
+        node {
+          title
+          bodyText
+          createdAt
+          updatedAt
+          url
+          author {
+            login
+          }
+          comments(first: 5) {
+            edges {
+              node {
+                bodyText
+                author {
+                  login
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class GitHubQueryError(Exception):
+    pass
+
+
+class RateLimitBudget:
+    """
+    Tracks the GraphQL point budget reported by `rateLimit` and makes callers wait
+    for the reset once it runs low. Shared by every thread using the same client.
+    """
+
+    def __init__(self, min_remaining=100):
+        self.min_remaining = min_remaining
+        self.remaining = None
+        self.reset_at = None
+        self.lock = threading.Lock()
+
+    def update(self, rate_limit):
+        if not rate_limit:
+            return
+        with self.lock:
+            self.remaining = rate_limit.get('remaining')
+            reset_at = rate_limit.get('resetAt')
+            if reset_at:
+                self.reset_at = datetime.fromisoformat(reset_at.replace('Z', '+00:00'))
+        logger.debug(f"GraphQL rate limit: cost={rate_limit.get('cost')} remaining={rate_limit.get('remaining')}")
+
+    def wait(self):
+        with self.lock:
+            if self.remaining is None or self.remaining >= self.min_remaining or self.reset_at is None:
+                return
+            delay = (self.reset_at - datetime.now(timezone.utc)).total_seconds() + 1
+        if delay > 0:
+            logger.warning(f"GraphQL budget low ({self.remaining} points left), sleeping {delay:.0f}s until reset")
+            time.sleep(delay)
+
+
+class GitHubGraphQLClient:
+    """GraphQL client over a pooled keep-alive session with jittered retries."""
+
+    RETRY_STATUS_CODES = {502, 503, 504}
+
+    def __init__(self, token, url=GITHUB_GRAPHQL_URL, max_retries=5, backoff_seconds=1.0,
+                 max_backoff_seconds=60.0, pool_size=MAX_CONCURRENT_REPOSITORIES, timeout_seconds=30):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.budget = RateLimitBudget()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def _server_delay(response):
+        """
+        Seconds the server asks to wait: `Retry-After` as seconds or as an HTTP date, else
+        the `X-RateLimit-Reset` epoch once `X-RateLimit-Remaining` hits 0. None if neither.
+        """
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                except (TypeError, ValueError):
+                    logger.warning(f"Ignoring unparseable Retry-After header: {retry_after!r}")
+                    return None
+                if retry_at.tzinfo is None:
+                    retry_at = retry_at.replace(tzinfo=timezone.utc)
+                return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        reset = response.headers.get('X-RateLimit-Reset')
+        if reset is not None and response.headers.get('X-RateLimit-Remaining') == '0':
+            try:
+                return max(float(reset) - time.time(), 0.0) + 1
+            except ValueError:
+                return None
+        return None
+
+    def _backoff(self, attempt, server_delay=None):
+        if server_delay is not None:
+            return server_delay
+        # Full jitter keeps concurrent workers from retrying in lockstep.
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    @staticmethod
+    def _is_secondary_rate_limit(response):
+        if response.status_code not in (403, 429):
+            return False
+        return ('Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+                or 'rate limit' in response.text.lower())
+
+    def execute(self, query, variables):
+        attempt = 0
+        while True:
+            self.budget.wait()
+            try:
+                response = self.session.post(self.url, json={'query': query, 'variables': variables},
+                                             timeout=self.timeout_seconds)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"GraphQL request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            retryable = response.status_code in self.RETRY_STATUS_CODES or self._is_secondary_rate_limit(response)
+            if retryable and attempt < self.max_retries:
+                delay = self._backoff(attempt, self._server_delay(response))
+                logger.warning(f"GraphQL request returned {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if response.status_code != 200:
+                raise GitHubQueryError(f"Query failed to run by returning code of {response.status_code}. {response.text}")
+
+            response_json = response.json()
+            if 'errors' in response_json:
+                raise GitHubQueryError(f"GraphQL query error: {response_json['errors']}")
+
+            self.budget.update((response_json.get('data') or {}).get('rateLimit'))
+            return response_json
+
+
+def iter_discussion_pages(client, owner, repo, since=None, cursor=None):
+    """
+    Yield `(discussions, end_cursor)` for each page of a repository's discussions,
+    newest activity first.
+
+    When `since` (an ISO `updatedAt` watermark) is given, paging stops at the first
+    discussion that has not changed since then.
+    """
+    variables = {"owner": owner, "name": repo, "cursor": cursor}
+
+    while True:
+        response_json = client.execute(DISCUSSIONS_QUERY, variables)
+
+        if 'data' not in response_json or not response_json['data'].get('repository') or 'discussions' not in response_json['data']['repository']:
+            raise GitHubQueryError(f"Unexpected response format: {response_json}")
+
+        data = response_json['data']['repository']['discussions']
+        discussions = []
+        reached_watermark = False
+        for edge in data['edges']:
+            if since and edge['node']['updatedAt'] <= since:
+                reached_watermark = True
+                break
+            discussions.append(edge['node'])
+
+        yield discussions, data['pageInfo']['endCursor']
+
+        if reached_watermark or not data['pageInfo']['hasNextPage']:
+            break
+
+        variables['cursor'] = data['pageInfo']['endCursor']
+
+
+def fetch_discussions(client, owner, repo, since=None):
+    """Fetch all (or, with `since`, all new or edited) discussions. Returns the discussions and the last cursor."""
+    discussions = []
+    end_cursor = None
+    for page, end_cursor in iter_discussion_pages(client, owner, repo, since=since):
+        discussions.extend(page)
+    return discussions, end_cursor
+
+
+def run_for_repositories(repositories, fn, max_workers=MAX_CONCURRENT_REPOSITORIES):
+    """
+    Run `fn(repo_info)` for every repository on a bounded thread pool.
+
+    Returns `(repo_info, result, error)` tuples in the order of `repositories`, so one
+    failing repository does not abort the others.
+    """
+    def run(repo_info):
+        try:
+            return repo_info, fn(repo_info), None
+        except Exception as e:
+            logger.error(f"Error processing {repo_info['owner']}/{repo_info['repo']}: {e}")
+            return repo_info, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(repositories)))) as executor:
+        return list(executor.map(run, repositories))
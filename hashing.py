@@ -0,0 +1,21 @@
+import hashlib
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def hashing_embedding(text, dimensions=512):
+    """
+    Cheap local embedding: hashed unigrams and bigrams, L2-normalized. Good enough to
+    catch reworded questions; any `text -> list[float]` function can replace it.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = [0.0] * dimensions
+    for feature in features:
+        digest = hashlib.md5(feature.encode('utf-8')).digest()
+        index = int.from_bytes(digest[:4], 'little') % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+import typesense
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "index_versions"
+
+VERSIONS_SCHEMA = {
+    'name': VERSIONS_COLLECTION,
+    'fields': [
+        {'name': 'version', 'type': 'int64'}
+    ]
+}
+
+
+class CollectionVersions:
+    """
+    Version stamps of the searchable collections, stored in Typesense so the ingestion
+    jobs and every app worker see the same value. Ingestion bumps the stamp after it
+    changed a collection; readers cache it for `refresh_seconds` to stay off the hot path.
+    """
+
+    def __init__(self, client, refresh_seconds=5.0):
+        self.client = client
+        self.refresh_seconds = refresh_seconds
+        self.cached = {}
+        self.lock = threading.Lock()
+
+    def current(self, collection_name):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cached.get(collection_name)
+            if entry and now - entry[1] < self.refresh_seconds:
+                return entry[0]
+        try:
+            version = self.client.collections[VERSIONS_COLLECTION].documents[collection_name].retrieve()['version']
+        except typesense.exceptions.ObjectNotFound:
+            version = 0
+        with self.lock:
+            self.cached[collection_name] = (version, now)
+        return version
+
+    def bump(self, collection_name):
+        version = time.time_ns() // 1000
+        document = {'id': collection_name, 'version': version}
+        try:
+            self.client.collections[VERSIONS_COLLECTION].documents.upsert(document)
+        except typesense.exceptions.ObjectNotFound:
+            try:
+                self.client.collections.create(VERSIONS_SCHEMA)
+            except typesense.exceptions.ObjectAlreadyExists:
+                pass
+            self.client.collections[VERSIONS_COLLECTION].documents.upsert(document)
+        with self.lock:
+            self.cached.pop(collection_name, None)
+        logger.info(f"Bumped version of collection '{collection_name}' to {version}")
+        return version
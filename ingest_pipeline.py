@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+import typesense
+
+from batch_index_writer import TYPESENSE_IMPORT_BATCH_SIZE, BatchIndexWriter
+from chunking import chunk_by_tokens
+from embeddings import embed_documents
+from github_fetcher import iter_discussion_pages
+from index_versions import CollectionVersions
+from tokenization import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+CHUNK_TARGET_TOKENS = int(os.getenv('CHUNK_TARGET_TOKENS', '256'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+
+DISCUSSION_URL_PATTERN = re.compile(r'github\.com/([^/]+)/([^/]+)/discussions/(\d+)')
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def discussion_id_from_url(url):
+    """Compact, stable id for a discussion: `owner_repo_number` taken from its URL."""
+    match = DISCUSSION_URL_PATTERN.search(url)
+    if match:
+        return '_'.join(match.groups())
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(document):
+    payload = {key: value for key, value in document.items() if key not in ('id', 'content_hash')}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def created_at_timestamp(created_at):
+    """Unix seconds of a GitHub ISO 8601 timestamp, or None when it cannot be parsed."""
+    try:
+        return int(datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _set_created_at(document, created_at):
+    # Numeric copy of createdAt for date-range filters and recency sorting
+    timestamp = created_at_timestamp(created_at)
+    if timestamp is not None:
+        document['created_at'] = timestamp
+
+
+def build_discussion_document(discussion, repo_info):
+    document = {
+        'id': discussion_id_from_url(discussion['url']),
+        'repository': f"{repo_info['owner']}/{repo_info['repo']}",
+        'title': discussion['title'],
+        'url': discussion['url'],
+        'author': discussion['author']['login'],
+        'createdAt': discussion['createdAt'],
+        'comments': [comment['node']['bodyText'] for comment in discussion['comments']['edges']]
+    }
+    _set_created_at(document, discussion['createdAt'])
+    # Token counts of the parts rendered into the LLM context, so retrieval never has to tokenize them.
+    document['title_token_count'] = count_tokens(document['title'])
+    document['comments_token_count'] = count_tokens(' | '.join(document['comments']))
+    document['content_hash'] = content_hash(document)
+    return document
+
+
+def build_chunk_documents(discussion, repo_info, embedding_model=None):
+    discussion_id = discussion_id_from_url(discussion['url'])
+    documents = []
+    chunks = chunk_by_tokens(discussion['bodyText'], CHUNK_TARGET_TOKENS, CHUNK_OVERLAP_TOKENS)
+    for chunk_index, (chunk, token_count) in enumerate(chunks):
+        document = {
+            'id': f"{discussion_id}_{chunk_index}",
+            'discussion_id': discussion_id,
+            'chunk_index': chunk_index,
+            'repository': f"{repo_info['owner']}/{repo_info['repo']}",
+            'title': discussion['title'],
+            'bodyText': chunk,
+            'token_count': token_count,
+            'createdAt': discussion['createdAt']
+        }
+        _set_created_at(document, discussion['createdAt'])
+        if embedding_model:
+            # Part of the hash, so switching embedders re-embeds and rewrites every chunk.
+            document['embedding_model'] = embedding_model
+        document['content_hash'] = content_hash(document)
+        documents.append(document)
+    return documents
+
+
+def _export(typesense_client, collection_name, repository, include_fields):
+    try:
+        export = typesense_client.collections[collection_name].documents.export({
+            'filter_by': f"repository:=`{repository}`",
+            'include_fields': include_fields
+        })
+    except typesense.exceptions.ObjectNotFound:
+        return
+    for line in export.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def load_chunk_hashes(typesense_client, collection_name, repository):
+    """
+    Map discussion id -> {chunk id: content hash} for every chunk already indexed for
+    a repository. Chunks written before content hashes existed map to None, so they
+    are rewritten (or deleted, for the old prefix-based ids) on the next sync.
+    """
+    hashes = {}
+    for document in _export(typesense_client, collection_name, repository, 'id,discussion_id,url,content_hash'):
+        discussion_id = document.get('discussion_id') or discussion_id_from_url(document.get('url') or '')
+        hashes.setdefault(discussion_id, {})[document['id']] = document.get('content_hash')
+    return hashes
+
+
+def load_discussion_hashes(typesense_client, collection_name, repository):
+    """Map discussion id -> content hash for every discussion record already indexed for a repository."""
+    return {
+        document['id']: document.get('content_hash')
+        for document in _export(typesense_client, collection_name, repository, 'id,content_hash')
+    }
+
+
+def _put(out_queue, item, stop_event):
+    # Bounded queues block the producer (backpressure) but must not hang it once the consumer gave up.
+    while not stop_event.is_set():
+        try:
+            out_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _run_stage(iterable, out_queue, stop_event):
+    try:
+        for item in iterable:
+            if not _put(out_queue, item, stop_event):
+                return
+        _put(out_queue, _DONE, stop_event)
+    except Exception as e:
+        _put(out_queue, _StageError(e), stop_event)
+
+
+def _drain(in_queue):
+    while True:
+        item = in_queue.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def _chunk_pages(pages, repo_info, existing_chunk_hashes, existing_discussion_hashes, embedding_model=None):
+    for discussions, cursor in pages:
+        upserts = []
+        deletes = []
+        discussion_upserts = []
+        chunk_count = 0
+        for discussion in discussions:
+            discussion_document = build_discussion_document(discussion, repo_info)
+            if existing_discussion_hashes.pop(discussion_document['id'], None) != discussion_document['content_hash']:
+                discussion_upserts.append(discussion_document)
+
+            documents = build_chunk_documents(discussion, repo_info, embedding_model)
+            chunk_count += len(documents)
+            previous = existing_chunk_hashes.pop(discussion_document['id'], {})
+            for document in documents:
+                if previous.pop(document['id'], None) != document['content_hash']:
+                    upserts.append(document)
+            # Whatever is left belonged to this discussion but is no longer produced by it.
+            deletes.extend(previous)
+        yield discussions, discussion_upserts, upserts, deletes, chunk_count, cursor
+
+
+def _embed_pages(pages, embedder, embedding_cache, counts):
+    # Only changed chunks reach this stage, and the cache covers full resyncs and retries.
+    for discussions, discussion_upserts, upserts, deletes, chunk_count, cursor in pages:
+        if upserts:
+            stats = embed_documents(upserts, embedder, embedding_cache)
+            counts['embedded'] += stats['embedded']
+            counts['embeddings_cached'] += stats['cached']
+        yield discussions, discussion_upserts, upserts, deletes, chunk_count, cursor
+
+
+def run_ingest_pipeline(github_client, typesense_client, collection_name, discussions_collection_name, repo_info,
+                        since=None, batch_size=TYPESENSE_IMPORT_BATCH_SIZE, queue_size=2, embedder=None, embedding_cache=None):
+    """
+    Stream one repository through fetch -> chunk -> index.
+
+    Each stage runs on its own thread connected by bounded queues, so the next page is
+    downloaded while the current one is chunked and indexed, and at most a few pages
+    are held in memory at once. Every discussion is written as one record to
+    `discussions_collection_name` and as lean chunk records to `collection_name`.
+    Records whose content hash is unchanged are skipped and chunks that disappeared
+    from an edited discussion are deleted. With an `embedder`, changed chunks pass an
+    embedding stage between chunking and indexing. Returns the counts
+    and the newest `updatedAt`/`createdAt` seen, for advancing the sync watermark.
+    """
+    repository = f"{repo_info['owner']}/{repo_info['repo']}"
+    existing_chunk_hashes = load_chunk_hashes(typesense_client, collection_name, repository)
+    existing_discussion_hashes = load_discussion_hashes(typesense_client, discussions_collection_name, repository)
+
+    stop_event = threading.Event()
+    page_queue = queue.Queue(maxsize=queue_size)
+    document_queue = queue.Queue(maxsize=queue_size)
+    embedding_model = embedder.name if embedder else None
+
+    pages = iter_discussion_pages(github_client, repo_info['owner'], repo_info['repo'], since=since)
+    chunked = _chunk_pages(_drain(page_queue), repo_info, existing_chunk_hashes, existing_discussion_hashes, embedding_model)
+    threads = [
+        threading.Thread(target=_run_stage, args=(pages, page_queue, stop_event), daemon=True),
+    ]
+    result = {'pages': 0, 'discussions': 0, 'chunks': 0, 'unchanged': 0, 'embedded': 0, 'embeddings_cached': 0,
+              'updatedAt': None, 'createdAt': None, 'cursor': None}
+    if embedder:
+        chunk_queue = queue.Queue(maxsize=queue_size)
+        threads.append(threading.Thread(target=_run_stage, args=(chunked, chunk_queue, stop_event), daemon=True))
+        chunked = _embed_pages(_drain(chunk_queue), embedder, embedding_cache, result)
+    threads.append(threading.Thread(target=_run_stage, args=(chunked, document_queue, stop_event), daemon=True))
+
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    writer = BatchIndexWriter(typesense_client, collection_name, batch_size=batch_size)
+    discussion_writer = BatchIndexWriter(typesense_client, discussions_collection_name, batch_size=batch_size)
+    try:
+        for discussions, discussion_upserts, upserts, deletes, chunk_count, cursor in _drain(document_queue):
+            # Parents first, so a chunk never points at a discussion record that is not there yet.
+            discussion_writer.add_many(discussion_upserts)
+            writer.add_many(upserts)
+            writer.delete(deletes)
+            result['pages'] += 1
+            result['discussions'] += len(discussions)
+            result['chunks'] += chunk_count
+            result['unchanged'] += chunk_count - len(upserts)
+            result['cursor'] = cursor
+            for discussion in discussions:
+                if result['updatedAt'] is None or discussion['updatedAt'] > result['updatedAt']:
+                    result['updatedAt'] = discussion['updatedAt']
+                if result['createdAt'] is None or discussion['createdAt'] > result['createdAt']:
+                    result['createdAt'] = discussion['createdAt']
+        discussion_writer.close()
+        writer.close()
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    result.update(writer.stats())
+    discussion_stats = discussion_writer.stats()
+    result['discussions_indexed'] = discussion_stats['indexed']
+    result['failed'] += discussion_stats['failed']
+
+    # Invalidate cached search results that were computed against the old contents.
+    versions = CollectionVersions(typesense_client)
+    if result['indexed'] or result['deleted']:
+        versions.bump(collection_name)
+    if result['discussions_indexed']:
+        versions.bump(discussions_collection_name)
+    result['elapsed_seconds'] = time.perf_counter() - started_at
+    logger.info(
+        f"{repository}: {result['discussions']} discussions, {result['chunks']} chunks "
+        f"({result['unchanged']} unchanged, {result['deleted']} deleted) from {result['pages']} pages "
+        f"in {result['elapsed_seconds']:.2f}s"
+    )
+    return result
@@ -1,23 +1,20 @@
 import os
 import json
-from typesense import Client
+import argparse
 import logging
 from tqdm import tqdm
 
+from collection_aliases import blue_green_reindex
+from index_versions import CollectionVersions
+from streaming_loader import LoadCheckpoint, load_file
+from typesense_client import build_typesense_client
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Typesense client configuration
-client = Client({
-    'nodes': [{
-        'host': 'localhost',
-        'port': '8108',
-        'protocol': 'http'
-    }],
-    'api_key': 'xyz',
-    'connection_timeout_seconds': 2
-})
+# Typesense client configuration (TYPESENSE_NODES, TYPESENSE_API_KEY, ...)
+client = build_typesense_client()
 
 # Schema definition
 schema = {
@@ -29,42 +26,30 @@ schema = {
     ]
 }
 
-def create_collection():
+def map_document(doc):
+    """A record of the chunks file as a `typesense_docs` document, or None if it lacks a field."""
     try:
-        client.collections.create(schema)
-        logger.info("Collection 'typesense_docs' created successfully.")
-    except Exception as e:
-        if 'already exists' in str(e):
-            logger.info("Collection 'typesense_docs' already exists.")
-        else:
-            logger.error(f"Error creating collection: {e}")
-            raise
+        return {
+            'id': doc['id'],
+            'content': doc['content'],
+            'source': doc['metadata']['source']
+        }
+    except (KeyError, TypeError) as e:
+        logger.warning(f"Skipping malformed record {str(doc)[:100]}: missing {e}")
+        return None
 
-def delete_collection():
-    try:
-        client.collections['typesense_docs'].delete()
-        logger.info("Collection 'typesense_docs' deleted successfully.")
-    except Exception as e:
-        logger.warning(f"Error deleting collection: {e}")
-
-def insert_documents(data_file):
-    try:
-        with open(data_file, 'r') as f:
-            documents = json.load(f)
-        
-        with tqdm(total=len(documents), desc="Inserting documents") as pbar:
-            for doc in documents:
-                document = {
-                    'id': doc['id'],
-                    'content': doc['content'],
-                    'source': doc['metadata']['source']
-                }
-                client.collections['typesense_docs'].documents.upsert(document)
-                pbar.update(1)
-        logger.info(f"Successfully inserted {len(documents)} documents.")
-    except Exception as e:
-        logger.error(f"Error inserting documents: {e}")
-        raise
+def insert_documents(data_file, collection_name='typesense_docs', checkpoint=None, batch_size=500, workers=4):
+    """
+    Stream the chunks file (a JSON array or JSONL) into the collection with concurrent bulk
+    imports. Returns the number of documents the file holds, for validating the collection.
+    """
+    with tqdm(total=os.path.getsize(data_file), unit='B', unit_scale=True, desc="Inserting documents") as pbar:
+        stats = load_file(client, collection_name, data_file, map_document, checkpoint=checkpoint,
+                          batch_size=batch_size, workers=workers, progress=pbar.update)
+    if stats['failed']:
+        raise RuntimeError(f"{stats['failed']} documents failed to index; rerun to resume from the checkpoint")
+    logger.info(f"Successfully inserted {stats['indexed']} documents ({stats['documents']} in the file).")
+    return stats['documents']
 
 def query_documents():
     try:
@@ -80,9 +65,28 @@ def query_documents():
         raise
 
 if __name__ == "__main__":
-    data_file = 'data_raw/typesense_docs_chunks.json'
-    
-    delete_collection()  # Add this line
-    create_collection()
-    insert_documents(data_file)
+    parser = argparse.ArgumentParser(description="Load the Typesense docs chunks into the typesense_docs collection.")
+    parser.add_argument('data_file', nargs='?', default='data_raw/typesense_docs_chunks.json',
+                        help="JSON array or JSONL file of chunks")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4, help="Bulk imports in flight")
+    parser.add_argument('--checkpoint', default='.typesense_docs_load.json', help="Progress file for resuming")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of an interrupted load")
+    args = parser.parse_args()
+
+    alias = schema['name']
+    checkpoint = LoadCheckpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.clear()
+    state = checkpoint.read()
+
+    # Build a new version next to the live one and only repoint the alias once it holds every
+    # document; an interrupted load continues in the version it was filling
+    blue_green_reindex(
+        client, {alias: schema['fields']},
+        lambda targets: {alias: insert_documents(args.data_file, targets[alias], checkpoint, args.batch_size, args.workers)},
+        versions=CollectionVersions(client),
+        existing={alias: state['collection']} if state else None,
+        keep_failed=True
+    )
     query_documents()
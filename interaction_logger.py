@@ -0,0 +1,273 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy.exc import InterfaceError, OperationalError, SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_LOG_BATCH_SIZE = int(os.getenv('INTERACTION_LOG_BATCH_SIZE', '200'))
+INTERACTION_LOG_FLUSH_SECONDS = float(os.getenv('INTERACTION_LOG_FLUSH_SECONDS', '1.0'))
+INTERACTION_LOG_QUEUE_SIZE = int(os.getenv('INTERACTION_LOG_QUEUE_SIZE', '10000'))
+INTERACTION_LOG_SPILL_PATH = os.getenv('INTERACTION_LOG_SPILL_PATH', '.interaction_log_spill.jsonl')
+INTERACTION_LOG_REPLAY_SECONDS = float(os.getenv('INTERACTION_LOG_REPLAY_SECONDS', '30'))
+# A record the database rejects this many times is moved to the dead-letter file instead of being replayed again.
+INTERACTION_LOG_MAX_ATTEMPTS = int(os.getenv('INTERACTION_LOG_MAX_ATTEMPTS', '5'))
+INTERACTION_LOG_DEAD_LETTER_PATH = os.getenv('INTERACTION_LOG_DEAD_LETTER_PATH', '.interaction_log_dead_letter.jsonl')
+# How often the worker creates upcoming log partitions itself, so rows keep landing when db_maintenance.py is not scheduled.
+INTERACTION_LOG_PARTITION_CHECK_SECONDS = float(os.getenv('INTERACTION_LOG_PARTITION_CHECK_SECONDS', '3600'))
+
+_STOP = object()
+
+
+class WriteBehindLogger:
+    """
+    Background writer for interaction records.
+
+    `log()` only puts the record on an in-memory queue, so the request thread never
+    waits on the database. A single worker thread drains the queue and writes each
+    table's records with one multi-row insert per batch, over the engine's bounded
+    connection pool. Batches that cannot be written (Postgres down, queue full) are
+    appended to a local JSONL spill file that is replayed once writes succeed again.
+    A record the database itself rejects `max_attempts` times goes to a dead-letter file
+    for inspection instead of being replayed forever. Whatever is still queued at interpreter exit is flushed (or spilled) by `close()`.
+
+    With `ensure_partitions` (a callable creating the upcoming log partitions), the worker
+    calls it every `partition_check_seconds` and whenever the database rejects a batch,
+    so a missed maintenance run does not turn into dead-lettered rows.
+    """
+
+    def __init__(self, engine, metadata, batch_size=INTERACTION_LOG_BATCH_SIZE,
+                 flush_interval_seconds=INTERACTION_LOG_FLUSH_SECONDS, max_queue_size=INTERACTION_LOG_QUEUE_SIZE,
+                 spill_path=INTERACTION_LOG_SPILL_PATH, replay_interval_seconds=INTERACTION_LOG_REPLAY_SECONDS,
+                 max_attempts=INTERACTION_LOG_MAX_ATTEMPTS, dead_letter_path=INTERACTION_LOG_DEAD_LETTER_PATH,
+                 ensure_partitions=None, partition_check_seconds=INTERACTION_LOG_PARTITION_CHECK_SECONDS):
+        self.engine = engine
+        self.metadata = metadata
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.spill_path = spill_path
+        self.replay_interval_seconds = replay_interval_seconds
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self.ensure_partitions = ensure_partitions
+        self.partition_check_seconds = partition_check_seconds
+        self.last_partition_check = time.monotonic()
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.spill_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.last_replay_attempt = 0.0
+        self.closed = False
+        self.counts = {'queued': 0, 'written': 0, 'batches': 0, 'spilled': 0, 'replayed': 0, 'dead_lettered': 0}
+        self.thread = threading.Thread(target=self._run, name='interaction-logger', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, table_name, record):
+        """Queue one row for `table_name`. Never blocks; returns False if the row went to the spill file instead."""
+        if self.closed:
+            self._spill([(table_name, record)])
+            return False
+        try:
+            self.queue.put_nowait((table_name, record))
+        except queue.Full:
+            logger.warning("Interaction log queue is full, spilling the record to disk")
+            self._spill([(table_name, record)])
+            return False
+        self._count('queued')
+        return True
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+            if not batch or self.queue.empty():
+                self._maybe_ensure_partitions()
+                self._maybe_replay()
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Drain what is left without waiting; close() stops producers first.
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        return batch, True
+                    if item is not _STOP:
+                        batch.append(item)
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch, attempts=None):
+        """
+        Insert a batch with one multi-row insert per table; spill it if the database is
+        unavailable. `attempts` counts, per record, how often the database rejected it before.
+        """
+        # Rows of one executemany must share their columns, so group by table and column set.
+        rows_by_table = {}
+        for table_name, record in batch:
+            rows_by_table.setdefault((table_name, tuple(sorted(record))), []).append(record)
+        try:
+            with self.engine.begin() as connection:
+                for (table_name, _), rows in rows_by_table.items():
+                    # A list of parameter sets is sent as batched multi-row INSERT ... VALUES by the driver.
+                    connection.execute(self.metadata.tables[table_name].insert(), rows)
+        except (OperationalError, InterfaceError) as e:
+            logger.warning(f"Could not write {len(batch)} interaction records, spilling them to disk: {e}")
+            self._spill(batch, attempts)
+            return False
+        except SQLAlchemyError as e:
+            # A bad row (e.g. outside every log partition) must not take the whole batch down with it.
+            logger.warning(f"Batch insert of {len(batch)} interaction records failed, writing them one by one: {e}")
+            self._maybe_ensure_partitions(force=True)
+            return self._write_rows(batch, attempts)
+        self._count('written', len(batch))
+        self._count('batches')
+        return True
+
+    def _write_rows(self, batch, attempts=None):
+        failed, failed_attempts, dead = [], [], []
+        for (table_name, record), attempt in zip(batch, attempts or [0] * len(batch)):
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(self.metadata.tables[table_name].insert(), record)
+            except (OperationalError, InterfaceError) as e:
+                # The database went away; that is not the record's fault
+                logger.warning(f"Could not write a {table_name} record, spilling it to disk: {e}")
+                failed.append((table_name, record))
+                failed_attempts.append(attempt)
+            except SQLAlchemyError as e:
+                if attempt + 1 >= self.max_attempts:
+                    logger.error(f"A {table_name} record was rejected {attempt + 1} times, moving it to {self.dead_letter_path}: {e}")
+                    dead.append((table_name, record))
+                else:
+                    logger.warning(f"Could not write a {table_name} record, spilling it to disk: {e}")
+                    failed.append((table_name, record))
+                    failed_attempts.append(attempt + 1)
+        if failed:
+            self._spill(failed, failed_attempts)
+        if dead:
+            self._spill(dead, path=self.dead_letter_path)
+            self._count('dead_lettered', len(dead))
+        self._count('written', len(batch) - len(failed) - len(dead))
+        return not failed
+
+    def _maybe_ensure_partitions(self, force=False):
+        if self.ensure_partitions is None:
+            return
+        if not force and time.monotonic() - self.last_partition_check < self.partition_check_seconds:
+            return
+        self.last_partition_check = time.monotonic()
+        try:
+            created = self.ensure_partitions()
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not create the upcoming log partitions: {e}")
+            return
+        if created:
+            logger.info(f"Created {created} log partitions")
+
+    def _spill(self, batch, attempts=None, path=None):
+        with self.spill_lock:
+            with open(path or self.spill_path, 'a', encoding='utf-8') as f:
+                for (table_name, record), attempt in zip(batch, attempts or [0] * len(batch)):
+                    entry = {'table': table_name, 'record': record}
+                    if attempt:
+                        entry['attempts'] = attempt
+                    f.write(json.dumps(entry, default=str) + '\n')
+        if path is None:
+            self._count('spilled', len(batch))
+
+    def _load_record(self, table_name, record):
+        # Timestamps were written as strings; turn them back into datetimes for the insert.
+        table = self.metadata.tables[table_name]
+        for column in table.columns:
+            value = record.get(column.name)
+            if isinstance(value, str) and isinstance(column.type, DateTime):
+                record[column.name] = datetime.fromisoformat(value)
+        return record
+
+    def _maybe_replay(self):
+        if not os.path.exists(self.spill_path):
+            return
+        if time.monotonic() - self.last_replay_attempt < self.replay_interval_seconds:
+            return
+        self.last_replay_attempt = time.monotonic()
+        replay_path = f"{self.spill_path}.replay"
+        with self.spill_lock:
+            # A leftover replay file means an earlier replay was interrupted; finish that one first.
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+        with open(replay_path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        for start in range(0, len(entries), self.batch_size):
+            chunk = entries[start:start + self.batch_size]
+            batch = [(entry['table'], self._load_record(entry['table'], entry['record'])) for entry in chunk]
+            # On failure _write spills this batch again; the rest follows so nothing is lost.
+            if not self._write(batch, [entry.get('attempts', 0) for entry in chunk]):
+                rest = entries[start + self.batch_size:]
+                self._spill([(entry['table'], entry['record']) for entry in rest], [entry.get('attempts', 0) for entry in rest])
+                break
+            self._count('replayed', len(batch))
+        os.remove(replay_path)
+        if self.counts['replayed']:
+            logger.info(f"Replayed spilled interaction records: {self.counts['replayed']} so far")
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written or spilled (for scripts and shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks and self.thread.is_alive():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=10):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout=timeout)
+        # Anything the worker could not get to in time still ends up on disk.
+        leftover = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._spill(leftover)
+
+    def _count(self, counter, amount=1):
+        with self.lock:
+            self.counts[counter] += amount
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, pending=self.queue.qsize())
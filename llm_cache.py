@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from db import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('LLM_CACHE_SIMILARITY_THRESHOLD', '0.97'))
+# Kinds of calls the semantic tier serves. Rewrites are cached without context, so a near-identical
+# question with the opposite meaning ("freeze" / "unfreeze") must never get another question's rewrite.
+LLM_CACHE_SEMANTIC_KINDS = tuple(kind for kind in os.getenv('LLM_CACHE_SEMANTIC_KINDS', 'answer').split(',') if kind)
+# Most recent entries compared against a prompt by the semantic tier.
+LLM_CACHE_MAX_CANDIDATES = int(os.getenv('LLM_CACHE_MAX_CANDIDATES', '100'))
+# Entries older than this are ignored and replaced on the next call; 0 keeps them forever.
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+
+def normalize_prompt(prompt):
+    return ' '.join(str(prompt).lower().split())
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent cache for deterministic LLM calls, stored in the `llm_cache` table.
+
+    Lookups try an exact tier keyed on the normalized prompt, the model parameters and
+    a hash of the context the prompt was built with, then a semantic tier that reuses
+    the answer of the most similar cached prompt with the same parameters and context
+    when the similarity exceeds `similarity_threshold`. Because the context is part of
+    the key, answers are invalidated as soon as retrieval returns different context.
+    Entries expire `ttl_seconds` after they were stored.
+
+    The semantic tier needs an `embed` function (`text -> list[float]`) from a model that
+    captures meaning; without one, and for kinds outside `semantic_kinds`, only exact
+    matches are served. Word-overlap vectors cannot tell a question from its negation.
+    """
+
+    def __init__(self, session_factory, embed=None, similarity_threshold=LLM_CACHE_SIMILARITY_THRESHOLD,
+                 max_candidates=LLM_CACHE_MAX_CANDIDATES, enabled=LLM_CACHE_ENABLED, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 semantic_kinds=LLM_CACHE_SEMANTIC_KINDS):
+        self.session_factory = session_factory
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.semantic_kinds = set(semantic_kinds)
+
+    def semantic(self, kind):
+        return self.embed is not None and kind in self.semantic_kinds and self.similarity_threshold < 1
+
+    def _fresh(self, query):
+        if not self.ttl_seconds:
+            return query
+        return query.filter(LLMCacheEntry.created_at >= datetime.utcnow() - timedelta(seconds=self.ttl_seconds))
+
+    @staticmethod
+    def cacheable(model_params):
+        # Only deterministic calls can be replayed.
+        return model_params.get('temperature', 0) == 0
+
+    def _keys(self, kind, prompt, model_params, context):
+        params_hash = sha256(json.dumps({'kind': kind, 'params': model_params}, sort_keys=True, default=str))
+        context_hash = sha256(context)
+        cache_key = sha256(f"{params_hash}:{context_hash}:{normalize_prompt(prompt)}")
+        return cache_key, params_hash, context_hash
+
+    def lookup(self, kind, prompt, model_params, context=''):
+        """Return `(response, tier)` with tier 'exact' or 'semantic', or `(None, None)` on a miss."""
+        if not self.enabled or not self.cacheable(model_params):
+            return None, None
+        cache_key, params_hash, context_hash = self._keys(kind, prompt, model_params, context)
+        session = self.session_factory()
+        try:
+            entry = self._fresh(session.query(LLMCacheEntry).filter_by(cache_key=cache_key)).one_or_none()
+            tier = 'exact'
+            if entry is None and self.semantic(kind):
+                entry = self._most_similar(session, prompt, params_hash, context_hash)
+                tier = 'semantic'
+            if entry is None:
+                return None, None
+            entry.hit_count += 1
+            entry.last_hit_at = datetime.utcnow()
+            session.commit()
+            return entry.response, tier
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None, None
+        finally:
+            session.close()
+
+    def _most_similar(self, session, prompt, params_hash, context_hash):
+        candidates = (
+            self._fresh(session.query(LLMCacheEntry).filter_by(params_hash=params_hash, context_hash=context_hash))
+            .filter(LLMCacheEntry.embedding.isnot(None))
+            .order_by(LLMCacheEntry.created_at.desc())
+            .limit(self.max_candidates)
+            .all()
+        )
+        embedding = np.asarray(self.embed(normalize_prompt(prompt)), dtype=np.float32)
+        # Entries embedded by another model (of another size) cannot be compared
+        candidates = [candidate for candidate in candidates if candidate.embedding and len(candidate.embedding) == len(embedding)]
+        if not candidates:
+            return None
+        matrix = np.asarray([candidate.embedding for candidate in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+        scores = np.divide(matrix @ embedding, norms, out=np.zeros(len(candidates), dtype=np.float32), where=norms > 0)
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity_threshold else None
+
+    def store(self, kind, prompt, model_params, response, context=''):
+        if not self.enabled or not self.cacheable(model_params):
+            return
+        cache_key, params_hash, context_hash = self._keys(kind, prompt, model_params, context)
+        session = self.session_factory()
+        try:
+            # An expired entry still holds the unique cache key
+            session.query(LLMCacheEntry).filter_by(cache_key=cache_key).delete()
+            session.add(LLMCacheEntry(
+                kind=kind,
+                cache_key=cache_key,
+                params_hash=params_hash,
+                context_hash=context_hash,
+                prompt=normalize_prompt(prompt),
+                embedding=self.embed(normalize_prompt(prompt)) if self.semantic(kind) else None,
+                response=response
+            ))
+            session.commit()
+        except IntegrityError:
+            # Another worker stored the same prompt first.
+            session.rollback()
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.warning(f"LLM cache store failed: {e}")
+        finally:
+            session.close()
+
+    def get_or_invoke(self, kind, prompt, model_params, invoke, context=''):
+        """Return `(response, tier)`, calling `invoke()` and caching its result on a miss (tier None)."""
+        response, tier = self.lookup(kind, prompt, model_params, context)
+        if response is not None:
+            logger.info(f"LLM cache {tier} hit for {kind}")
+            return response, tier
+        response = invoke()
+        self.store(kind, prompt, model_params, response, context)
+        return response, None
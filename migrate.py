@@ -0,0 +1,59 @@
+import logging
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Any constant works as long as every process migrating this database uses the same one.
+MIGRATIONS_LOCK_KEY = 7203114
+
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    """`(version, path)` for every `NNNN_description.sql` file, in version order."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.sql'):
+            migrations.append((filename[:-len('.sql')], os.path.join(directory, filename)))
+    return migrations
+
+
+def run_migrations(engine, directory=MIGRATIONS_DIR):
+    """
+    Apply every migration not yet recorded in `schema_migrations`, in order, in one
+    transaction. An advisory lock makes concurrent app processes wait for the first one
+    instead of racing it. Returns the versions applied.
+    """
+    applied_now = []
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': MIGRATIONS_LOCK_KEY})
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(255) PRIMARY KEY, "
+            "applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'))"
+        ))
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+        for version, path in available_migrations(directory):
+            if version in applied:
+                continue
+            logger.info(f"Applying migration {version}")
+            with open(path, encoding='utf-8') as f:
+                sql = f.read()
+            # no_parameters keeps the driver from treating the % in format() calls as placeholders
+            connection.execution_options(no_parameters=True).exec_driver_sql(sql)
+            connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {'version': version})
+            applied_now.append(version)
+    return applied_now
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from db import engine
+
+    versions = run_migrations(engine)
+    logger.info(f"Applied {len(versions)} migrations" + (f": {', '.join(versions)}" if versions else ""))
@@ -0,0 +1,63 @@
+-- Tables previously created by Base.metadata.create_all. IF NOT EXISTS keeps this a no-op
+-- on databases that already have them.
+
+CREATE TABLE IF NOT EXISTS llm_responses (
+    id SERIAL PRIMARY KEY,
+    query VARCHAR,
+    response VARCHAR,
+    rating DOUBLE PRECISION,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE
+);
+
+CREATE TABLE IF NOT EXISTS llm_cache (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    cache_key VARCHAR(64) NOT NULL,
+    params_hash VARCHAR(64) NOT NULL,
+    context_hash VARCHAR(64) NOT NULL,
+    prompt TEXT NOT NULL,
+    embedding JSON,
+    response TEXT NOT NULL,
+    hit_count INTEGER NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    last_hit_at TIMESTAMP WITHOUT TIME ZONE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_llm_cache_cache_key ON llm_cache (cache_key);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_params_hash ON llm_cache (params_hash);
+
+CREATE TABLE IF NOT EXISTS rag_request_metrics (
+    id SERIAL PRIMARY KEY,
+    request_id VARCHAR(32) NOT NULL,
+    operation VARCHAR(32) NOT NULL,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    approach VARCHAR(64),
+    strategy VARCHAR(32),
+    hit_count INTEGER,
+    hits_used INTEGER,
+    context_tokens INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cache_hits INTEGER,
+    precision DOUBLE PRECISION,
+    recall DOUBLE PRECISION,
+    f1_score DOUBLE PRECISION
+);
+CREATE INDEX IF NOT EXISTS ix_rag_request_metrics_request_id ON rag_request_metrics (request_id);
+CREATE INDEX IF NOT EXISTS ix_rag_request_metrics_timestamp ON rag_request_metrics ("timestamp");
+
+CREATE TABLE IF NOT EXISTS rag_stage_metrics (
+    id SERIAL PRIMARY KEY,
+    request_id VARCHAR(32) NOT NULL,
+    operation VARCHAR(32) NOT NULL,
+    stage VARCHAR(32) NOT NULL,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    hit_count INTEGER,
+    cache_hit BOOLEAN,
+    attributes JSON
+);
+CREATE INDEX IF NOT EXISTS ix_rag_stage_metrics_request_id ON rag_stage_metrics (request_id);
+CREATE INDEX IF NOT EXISTS ix_rag_stage_metrics_stage_timestamp ON rag_stage_metrics (stage, "timestamp");
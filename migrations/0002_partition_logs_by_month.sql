@@ -0,0 +1,153 @@
+-- Range-partition the interaction and metrics logs by month on "timestamp", so dashboards
+-- only scan the partitions of the time range they show and retention drops whole
+-- partitions instead of deleting rows. There is deliberately no DEFAULT partition:
+-- creating a partition is then always safe, and a row outside every partition fails to
+-- insert, is spilled by the write-behind logger and replayed once the partition exists.
+
+-- Partitions are named <parent>_YYYY_MM.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, first_month DATE, last_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', first_month)::DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition_name := format('%s_%s', parent, to_char(month, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, parent, month, (month + INTERVAL '1 month')::DATE);
+            created := created + 1;
+        END IF;
+        month := (month + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach and drop every monthly partition that ends on or before `cutoff`; returns the dropped names.
+CREATE OR REPLACE FUNCTION drop_partitions_before(parent TEXT, cutoff TIMESTAMP)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = parent::REGCLASS
+          AND child.relname ~ ('^' || parent || '_\d{4}_\d{2}$')
+        ORDER BY child.relname
+    LOOP
+        IF to_date(right(partition_name, 7), 'YYYY_MM') + INTERVAL '1 month' <= cutoff THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition_name);
+            EXECUTE format('DROP TABLE %I', partition_name);
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- llm_responses
+ALTER TABLE llm_responses RENAME TO llm_responses_unpartitioned;
+ALTER TABLE llm_responses_unpartitioned RENAME CONSTRAINT llm_responses_pkey TO llm_responses_unpartitioned_pkey;
+ALTER SEQUENCE llm_responses_id_seq RENAME TO llm_responses_unpartitioned_id_seq;
+
+CREATE TABLE llm_responses (
+    id BIGSERIAL,
+    query VARCHAR,
+    response VARCHAR,
+    rating DOUBLE PRECISION,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp");
+CREATE INDEX ix_llm_responses_timestamp ON llm_responses ("timestamp");
+CREATE INDEX ix_llm_responses_rating ON llm_responses (rating);
+
+SELECT create_monthly_partitions(
+    'llm_responses',
+    coalesce((SELECT min("timestamp") FROM llm_responses_unpartitioned), now() AT TIME ZONE 'utc')::DATE,
+    ((now() AT TIME ZONE 'utc') + INTERVAL '3 months')::DATE
+);
+INSERT INTO llm_responses (id, query, response, rating, "timestamp")
+SELECT id, query, response, rating, coalesce("timestamp", now() AT TIME ZONE 'utc')
+FROM llm_responses_unpartitioned;
+SELECT setval(pg_get_serial_sequence('llm_responses', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM llm_responses), false);
+DROP TABLE llm_responses_unpartitioned;
+
+-- rag_request_metrics
+ALTER TABLE rag_request_metrics RENAME TO rag_request_metrics_unpartitioned;
+ALTER TABLE rag_request_metrics_unpartitioned RENAME CONSTRAINT rag_request_metrics_pkey TO rag_request_metrics_unpartitioned_pkey;
+ALTER SEQUENCE rag_request_metrics_id_seq RENAME TO rag_request_metrics_unpartitioned_id_seq;
+DROP INDEX ix_rag_request_metrics_request_id;
+DROP INDEX ix_rag_request_metrics_timestamp;
+
+CREATE TABLE rag_request_metrics (
+    id BIGSERIAL,
+    request_id VARCHAR(32) NOT NULL,
+    operation VARCHAR(32) NOT NULL,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    duration_ms DOUBLE PRECISION NOT NULL,
+    approach VARCHAR(64),
+    strategy VARCHAR(32),
+    hit_count INTEGER,
+    hits_used INTEGER,
+    context_tokens INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cache_hits INTEGER,
+    precision DOUBLE PRECISION,
+    recall DOUBLE PRECISION,
+    f1_score DOUBLE PRECISION,
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp");
+CREATE INDEX ix_rag_request_metrics_request_id ON rag_request_metrics (request_id);
+CREATE INDEX ix_rag_request_metrics_timestamp ON rag_request_metrics ("timestamp");
+
+SELECT create_monthly_partitions(
+    'rag_request_metrics',
+    coalesce((SELECT min("timestamp") FROM rag_request_metrics_unpartitioned), now() AT TIME ZONE 'utc')::DATE,
+    ((now() AT TIME ZONE 'utc') + INTERVAL '3 months')::DATE
+);
+INSERT INTO rag_request_metrics
+SELECT id, request_id, operation, coalesce("timestamp", now() AT TIME ZONE 'utc'), duration_ms, approach, strategy,
+       hit_count, hits_used, context_tokens, prompt_tokens, completion_tokens, cache_hits, precision, recall, f1_score
+FROM rag_request_metrics_unpartitioned;
+SELECT setval(pg_get_serial_sequence('rag_request_metrics', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM rag_request_metrics), false);
+DROP TABLE rag_request_metrics_unpartitioned;
+
+-- rag_stage_metrics
+ALTER TABLE rag_stage_metrics RENAME TO rag_stage_metrics_unpartitioned;
+ALTER TABLE rag_stage_metrics_unpartitioned RENAME CONSTRAINT rag_stage_metrics_pkey TO rag_stage_metrics_unpartitioned_pkey;
+ALTER SEQUENCE rag_stage_metrics_id_seq RENAME TO rag_stage_metrics_unpartitioned_id_seq;
+DROP INDEX ix_rag_stage_metrics_request_id;
+DROP INDEX ix_rag_stage_metrics_stage_timestamp;
+
+CREATE TABLE rag_stage_metrics (
+    id BIGSERIAL,
+    request_id VARCHAR(32) NOT NULL,
+    operation VARCHAR(32) NOT NULL,
+    stage VARCHAR(32) NOT NULL,
+    "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    duration_ms DOUBLE PRECISION NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    hit_count INTEGER,
+    cache_hit BOOLEAN,
+    attributes JSON,
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp");
+CREATE INDEX ix_rag_stage_metrics_request_id ON rag_stage_metrics (request_id);
+CREATE INDEX ix_rag_stage_metrics_stage_timestamp ON rag_stage_metrics (stage, "timestamp");
+
+SELECT create_monthly_partitions(
+    'rag_stage_metrics',
+    coalesce((SELECT min("timestamp") FROM rag_stage_metrics_unpartitioned), now() AT TIME ZONE 'utc')::DATE,
+    ((now() AT TIME ZONE 'utc') + INTERVAL '3 months')::DATE
+);
+INSERT INTO rag_stage_metrics
+SELECT id, request_id, operation, stage, coalesce("timestamp", now() AT TIME ZONE 'utc'), duration_ms,
+       prompt_tokens, completion_tokens, hit_count, cache_hit, attributes
+FROM rag_stage_metrics_unpartitioned;
+SELECT setval(pg_get_serial_sequence('rag_stage_metrics', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM rag_stage_metrics), false);
+DROP TABLE rag_stage_metrics_unpartitioned;
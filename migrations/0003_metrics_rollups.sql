@@ -0,0 +1,110 @@
+-- Per-minute and per-hour rollups for the dashboards, refreshed incrementally by
+-- refresh_metrics_rollups(): only buckets that received rows since the last refresh are
+-- recomputed, each from its own time range of the partitioned logs. Whole buckets are
+-- recomputed because percentiles cannot be merged, and this also picks up late rows
+-- (e.g. replayed by the write-behind logger) that land in an already rolled-up bucket.
+
+CREATE TABLE rag_metrics_minute (
+    bucket TIMESTAMP WITHOUT TIME ZONE PRIMARY KEY,
+    requests INTEGER NOT NULL,
+    avg_duration_ms DOUBLE PRECISION,
+    p50_duration_ms DOUBLE PRECISION,
+    p95_duration_ms DOUBLE PRECISION,
+    p99_duration_ms DOUBLE PRECISION,
+    prompt_tokens BIGINT,
+    completion_tokens BIGINT,
+    cache_hits BIGINT,
+    ratings INTEGER NOT NULL,
+    avg_rating DOUBLE PRECISION
+);
+
+CREATE TABLE rag_metrics_hour (LIKE rag_metrics_minute INCLUDING ALL);
+
+-- Highest log id already rolled up, per source table.
+CREATE TABLE rag_metrics_rollup_state (
+    source VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL
+);
+INSERT INTO rag_metrics_rollup_state (source, last_id) VALUES ('rag_request_metrics', 0), ('llm_responses', 0);
+
+CREATE OR REPLACE FUNCTION refresh_metrics_rollups()
+RETURNS INTEGER AS $$
+DECLARE
+    requests_from BIGINT;
+    requests_to BIGINT;
+    ratings_from BIGINT;
+    ratings_to BIGINT;
+    granularity TEXT;
+    rows_written INTEGER;
+    total INTEGER := 0;
+BEGIN
+    -- Concurrent refreshes would read the same watermarks; let them queue instead.
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_metrics_rollups'));
+
+    SELECT last_id INTO requests_from FROM rag_metrics_rollup_state WHERE source = 'rag_request_metrics';
+    SELECT last_id INTO ratings_from FROM rag_metrics_rollup_state WHERE source = 'llm_responses';
+    SELECT coalesce(max(id), requests_from) INTO requests_to FROM rag_request_metrics WHERE id > requests_from;
+    SELECT coalesce(max(id), ratings_from) INTO ratings_to FROM llm_responses WHERE id > ratings_from;
+
+    FOREACH granularity IN ARRAY ARRAY['minute', 'hour'] LOOP
+        EXECUTE format($sql$
+            WITH touched AS (
+                SELECT DISTINCT date_trunc(%1$L, "timestamp") AS bucket
+                FROM rag_request_metrics WHERE id > $1 AND id <= $2
+                UNION
+                SELECT DISTINCT date_trunc(%1$L, "timestamp")
+                FROM llm_responses WHERE id > $3 AND id <= $4
+            ),
+            requests AS (
+                SELECT touched.bucket,
+                       count(*) AS requests,
+                       avg(m.duration_ms) AS avg_duration_ms,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY m.duration_ms) AS p50_duration_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY m.duration_ms) AS p95_duration_ms,
+                       percentile_cont(0.99) WITHIN GROUP (ORDER BY m.duration_ms) AS p99_duration_ms,
+                       sum(m.prompt_tokens) AS prompt_tokens,
+                       sum(m.completion_tokens) AS completion_tokens,
+                       sum(m.cache_hits) AS cache_hits
+                FROM touched
+                JOIN rag_request_metrics m
+                  ON m."timestamp" >= touched.bucket AND m."timestamp" < touched.bucket + INTERVAL '1 %1$s'
+                WHERE m.operation = 'answer'
+                GROUP BY touched.bucket
+            ),
+            ratings AS (
+                SELECT touched.bucket, count(r.rating) AS ratings, avg(r.rating) AS avg_rating
+                FROM touched
+                JOIN llm_responses r
+                  ON r."timestamp" >= touched.bucket AND r."timestamp" < touched.bucket + INTERVAL '1 %1$s'
+                GROUP BY touched.bucket
+            )
+            INSERT INTO %2$I AS rollup
+            SELECT touched.bucket, coalesce(requests.requests, 0), requests.avg_duration_ms,
+                   requests.p50_duration_ms, requests.p95_duration_ms, requests.p99_duration_ms,
+                   requests.prompt_tokens, requests.completion_tokens, requests.cache_hits,
+                   coalesce(ratings.ratings, 0), ratings.avg_rating
+            FROM touched
+            LEFT JOIN requests ON requests.bucket = touched.bucket
+            LEFT JOIN ratings ON ratings.bucket = touched.bucket
+            ON CONFLICT (bucket) DO UPDATE SET
+                requests = EXCLUDED.requests,
+                avg_duration_ms = EXCLUDED.avg_duration_ms,
+                p50_duration_ms = EXCLUDED.p50_duration_ms,
+                p95_duration_ms = EXCLUDED.p95_duration_ms,
+                p99_duration_ms = EXCLUDED.p99_duration_ms,
+                prompt_tokens = EXCLUDED.prompt_tokens,
+                completion_tokens = EXCLUDED.completion_tokens,
+                cache_hits = EXCLUDED.cache_hits,
+                ratings = EXCLUDED.ratings,
+                avg_rating = EXCLUDED.avg_rating
+        $sql$, granularity, 'rag_metrics_' || granularity)
+        USING requests_from, requests_to, ratings_from, ratings_to;
+        GET DIAGNOSTICS rows_written = ROW_COUNT;
+        total := total + rows_written;
+    END LOOP;
+
+    UPDATE rag_metrics_rollup_state SET last_id = requests_to WHERE source = 'rag_request_metrics';
+    UPDATE rag_metrics_rollup_state SET last_id = ratings_to WHERE source = 'llm_responses';
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
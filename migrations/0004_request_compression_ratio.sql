@@ -0,0 +1,4 @@
+-- Ratio of retrieved to compressed context tokens per request, recorded by the context
+-- compression stage. Added on the partitioned parent, so every partition gets it.
+
+ALTER TABLE rag_request_metrics ADD COLUMN IF NOT EXISTS compression_ratio DOUBLE PRECISION;
@@ -0,0 +1,104 @@
+-- Window the incremental rollups on "timestamp" instead of the BIGSERIAL id. Ids are taken
+-- when a row is inserted, not when its transaction commits, so a row committing after a
+-- refresh had already passed a higher id was never rolled up. Each refresh now recomputes
+-- every bucket with rows at or after the previous refresh minus `lookback`, which covers
+-- transactions that commit late; whole buckets are recomputed and upserted, so looking
+-- back over buckets that are already rolled up is idempotent. Rows replayed from the
+-- write-behind logger's spill file keep their original timestamps: after an outage longer
+-- than the lookback, refresh once with a lookback that reaches back to its start.
+
+DROP TABLE rag_metrics_rollup_state;
+
+-- Time of the last refresh (UTC); NULL until the first one, which rolls up everything.
+CREATE TABLE rag_metrics_rollup_state (
+    name VARCHAR(64) PRIMARY KEY,
+    refreshed_at TIMESTAMP WITHOUT TIME ZONE
+);
+INSERT INTO rag_metrics_rollup_state (name, refreshed_at)
+SELECT 'rollups', max(bucket) FROM rag_metrics_minute;
+
+DROP FUNCTION refresh_metrics_rollups();
+
+CREATE OR REPLACE FUNCTION refresh_metrics_rollups(lookback INTERVAL DEFAULT INTERVAL '15 minutes')
+RETURNS INTEGER AS $$
+DECLARE
+    window_start TIMESTAMP;
+    started_at TIMESTAMP := now() AT TIME ZONE 'utc';
+    granularity TEXT;
+    rows_written INTEGER;
+    total INTEGER := 0;
+BEGIN
+    -- Concurrent refreshes would read the same window; let them queue instead.
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_metrics_rollups'));
+
+    SELECT coalesce(state.refreshed_at - lookback, '-infinity') INTO window_start
+    FROM rag_metrics_rollup_state state WHERE state.name = 'rollups';
+
+    FOREACH granularity IN ARRAY ARRAY['minute', 'hour'] LOOP
+        EXECUTE format($sql$
+            WITH touched AS (
+                SELECT DISTINCT date_trunc(%1$L, "timestamp") AS bucket
+                FROM rag_request_metrics WHERE "timestamp" >= $1
+                UNION
+                SELECT DISTINCT date_trunc(%1$L, "timestamp")
+                FROM llm_responses WHERE "timestamp" >= $1
+            ),
+            requests AS (
+                SELECT touched.bucket,
+                       count(*) AS requests,
+                       avg(m.duration_ms) AS avg_duration_ms,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY m.duration_ms) AS p50_duration_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY m.duration_ms) AS p95_duration_ms,
+                       percentile_cont(0.99) WITHIN GROUP (ORDER BY m.duration_ms) AS p99_duration_ms,
+                       sum(m.prompt_tokens) AS prompt_tokens,
+                       sum(m.completion_tokens) AS completion_tokens,
+                       sum(m.cache_hits) AS cache_hits
+                FROM touched
+                JOIN rag_request_metrics m
+                  ON m."timestamp" >= touched.bucket AND m."timestamp" < touched.bucket + INTERVAL '1 %1$s'
+                WHERE m.operation = 'answer'
+                GROUP BY touched.bucket
+            ),
+            ratings AS (
+                SELECT touched.bucket, count(r.rating) AS ratings, avg(r.rating) AS avg_rating
+                FROM touched
+                JOIN llm_responses r
+                  ON r."timestamp" >= touched.bucket AND r."timestamp" < touched.bucket + INTERVAL '1 %1$s'
+                GROUP BY touched.bucket
+            )
+            INSERT INTO %2$I AS rollup
+            SELECT touched.bucket, coalesce(requests.requests, 0), requests.avg_duration_ms,
+                   requests.p50_duration_ms, requests.p95_duration_ms, requests.p99_duration_ms,
+                   requests.prompt_tokens, requests.completion_tokens, requests.cache_hits,
+                   coalesce(ratings.ratings, 0), ratings.avg_rating
+            FROM touched
+            LEFT JOIN requests ON requests.bucket = touched.bucket
+            LEFT JOIN ratings ON ratings.bucket = touched.bucket
+            ON CONFLICT (bucket) DO UPDATE SET
+                requests = EXCLUDED.requests,
+                avg_duration_ms = EXCLUDED.avg_duration_ms,
+                p50_duration_ms = EXCLUDED.p50_duration_ms,
+                p95_duration_ms = EXCLUDED.p95_duration_ms,
+                p99_duration_ms = EXCLUDED.p99_duration_ms,
+                prompt_tokens = EXCLUDED.prompt_tokens,
+                completion_tokens = EXCLUDED.completion_tokens,
+                cache_hits = EXCLUDED.cache_hits,
+                ratings = EXCLUDED.ratings,
+                avg_rating = EXCLUDED.avg_rating
+            WHERE (rollup.requests, rollup.avg_duration_ms, rollup.p50_duration_ms, rollup.p95_duration_ms,
+                   rollup.p99_duration_ms, rollup.prompt_tokens, rollup.completion_tokens, rollup.cache_hits,
+                   rollup.ratings, rollup.avg_rating)
+                  IS DISTINCT FROM
+                  (EXCLUDED.requests, EXCLUDED.avg_duration_ms, EXCLUDED.p50_duration_ms, EXCLUDED.p95_duration_ms,
+                   EXCLUDED.p99_duration_ms, EXCLUDED.prompt_tokens, EXCLUDED.completion_tokens, EXCLUDED.cache_hits,
+                   EXCLUDED.ratings, EXCLUDED.avg_rating)
+        $sql$, granularity, 'rag_metrics_' || granularity)
+        USING window_start;
+        GET DIAGNOSTICS rows_written = ROW_COUNT;
+        total := total + rows_written;
+    END LOOP;
+
+    UPDATE rag_metrics_rollup_state SET refreshed_at = started_at WHERE name = 'rollups';
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,79 @@
+import logging
+import os
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# 'fusion' merges the original and rewritten result sets, 'rewrite' only keeps the rewritten one
+RAG_QUERY_STRATEGY = os.getenv('RAG_QUERY_STRATEGY', 'fusion')
+RAG_REWRITE_DEADLINE_SECONDS = float(os.getenv('RAG_REWRITE_DEADLINE_SECONDS', '3.0'))
+
+
+def reciprocal_rank_fusion(result_sets, k=60, limit=None):
+    """
+    Merge ranked Typesense result sets with reciprocal rank fusion: every hit scores
+    sum(1 / (k + rank)) over the lists it appears in. Returns a result set in the same
+    shape, each hit carrying its `rrf_score`.
+    """
+    scores = {}
+    hits = {}
+    for results in result_sets:
+        for rank, hit in enumerate(results['hits'], start=1):
+            document_id = hit['document']['id']
+            scores[document_id] = scores.get(document_id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(document_id, hit)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+    fused = []
+    for document_id in ranked:
+        hit = dict(hits[document_id])
+        hit['rrf_score'] = scores[document_id]
+        fused.append(hit)
+    return {'hits': fused, 'found': len(scores)}
+
+
+def speculative_retrieval(query, rewrite, search, executor, deadline_seconds=RAG_REWRITE_DEADLINE_SECONDS,
+                          strategy=RAG_QUERY_STRATEGY):
+    """
+    Start retrieving for the original query while the query rewrite is still running.
+
+    If the rewrite finishes within `deadline_seconds` (counted from the start of the
+    request) its results are searched too and either fused with the original results
+    (strategy 'fusion') or used instead of them ('rewrite'). A slow or failing rewrite
+    falls back to the original-query results, which by then are usually ready.
+
+    Returns a dict with the `rewritten_query` (None on fallback), the `results` and
+    the `strategy` that produced them.
+    """
+    started_at = time.monotonic()
+    original_future = executor.submit(search, query)
+    rewrite_future = executor.submit(rewrite, query)
+
+    try:
+        rewritten_query = rewrite_future.result(timeout=deadline_seconds)
+    except FuturesTimeoutError:
+        logger.warning(f"Query rewrite missed the {deadline_seconds}s deadline; using the original query results")
+        return {'rewritten_query': None, 'results': original_future.result(), 'strategy': 'original'}
+    except Exception as e:
+        logger.error(f"Query rewrite failed, using the original query results: {e}")
+        return {'rewritten_query': None, 'results': original_future.result(), 'strategy': 'original'}
+
+    rewrite_seconds = time.monotonic() - started_at
+    if not rewritten_query or normalize_query(rewritten_query) == normalize_query(query):
+        return {'rewritten_query': rewritten_query, 'results': original_future.result(), 'strategy': 'original'}
+
+    rewritten_results = search(rewritten_query)
+    if strategy == 'rewrite':
+        original_future.cancel()
+        return {'rewritten_query': rewritten_query, 'results': rewritten_results, 'strategy': 'rewrite'}
+
+    original_results = original_future.result()
+    limit = max(len(original_results['hits']), len(rewritten_results['hits']))
+    fused = reciprocal_rank_fusion([rewritten_results, original_results], limit=limit)
+    logger.info(f"Fused original and rewritten results (rewrite took {rewrite_seconds:.2f}s)")
+    return {'rewritten_query': rewritten_query, 'results': fused, 'strategy': 'fusion'}
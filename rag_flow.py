@@ -1,60 +1,130 @@
-import os
 from dotenv import load_dotenv
-import typesense
 from langchain_community.llms import OpenAI
 from langchain.prompts import PromptTemplate
 import streamlit as st
 import logging
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
-import tiktoken
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Local modules read their settings from the environment at import time
+from compression import CONTEXT_COMPRESSION_ENABLED, compress_hits
+from context_packing import pack_context
+from db import Base, Session, engine
+from db_maintenance import ensure_partitions
+from embeddings import EMBEDDING_PROVIDER, build_embedder, embed_query
+from index_versions import CollectionVersions
+from interaction_logger import WriteBehindLogger
+from llm_cache import LLMCache
+from migrate import run_migrations
+from query_pipeline import speculative_retrieval
+from rerank import rerank_hits
+from retrievers import build_retriever
+from search_cache import build_search_cache, normalize_query
+from search_parameters import RAG_APPROACHES, SEARCH_MODE, build_filter_by, build_search_parameters
+from tokenization import count_tokens
+from tracing import NULL_TRACE, Tracer
+from typesense_client import build_typesense_client
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Typesense client setup
-node = {
-    "host": "localhost",
-    "port": "8108",
-    "protocol": "http"
-}
-typesense_client = typesense.Client(
-    {
-      "nodes": [node],
-      "api_key": os.getenv('TYPESENSE_API_KEY'),
-      "connection_timeout_seconds": 2
-    }
-)
-collection_name = "ai_related_discussions"
+ANSWER_PROMPT_TEMPLATE = """You are a helpful AI assistant specializing in information about Crew AI. 
+            Use ONLY the following context from discussions to answer the user's question. 
+            The context contains titles, body text, and comments from relevant discussions about Crew AI. 
+            If the context doesn't contain relevant information to answer the question, say that you don't have enough 
+            information from the available discussions.
 
-# Database setup
-DB_USER = os.getenv('POSTGRES_USER', 'llm_logging_user')
-DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'llm_logging_password')
-DB_HOST = os.getenv('POSTGRES_HOST', 'host.docker.internal')  
-DB_PORT = os.getenv('POSTGRES_PORT', '5433')
-DB_NAME = os.getenv('POSTGRES_DB', 'llm_logging_db')
+            Context:
+            {context}
+
+            User's Question: {question}
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-Base = declarative_base()
+            Answer based ONLY on the above context. If the information is not in the context, say you don't have enough information:"""
 
-class LLMResponse(Base):
-    __tablename__ = 'llm_responses'
+# Streamlit re-runs this script on every widget interaction. Everything expensive to build
+# is created once per process through st.cache_resource and shared by all sessions.
+
+@st.cache_resource
+def get_typesense_client():
+    # One pooled client per process; searches are spread over the healthy TYPESENSE_NODES
+    return build_typesense_client()
+
+@st.cache_resource
+def get_search_cache():
+    # Search results are cached until ingestion bumps the version of the collections they came from
+    return build_search_cache(CollectionVersions(get_typesense_client()))
+
+@st.cache_resource
+def get_database():
+    # Brings the logging database schema up to date once per process
+    run_migrations(engine)
+    ensure_partitions(engine)
+    return engine
+
+@st.cache_resource
+def get_llm_cache():
+    # Rewrites and answers are cached in Postgres; answers only match for the same retrieved context.
+    # Paraphrased answers are only served with a model embedder: hashed word overlap would match negations.
+    get_database()
+    embedder = build_embedder() if EMBEDDING_PROVIDER == 'openai' else None
+    return LLMCache(Session, embed=(lambda text: embed_query(embedder, text)) if embedder else None)
+
+@st.cache_resource
+def get_llm():
+    return OpenAI(temperature=0, max_tokens=256)
+
+@st.cache_resource
+def get_answer_chain():
+    prompt = PromptTemplate(
+        input_variables=["question", "context"],
+        template=ANSWER_PROMPT_TEMPLATE
+    )
+    return prompt, prompt | get_llm()
+
+@st.cache_resource
+def get_interaction_logger():
+    # Ratings are written behind the request in batches; queued rows are flushed at exit.
+    # The worker also creates upcoming log partitions, in case db_maintenance.py is not scheduled.
+    database = get_database()
+    return WriteBehindLogger(database, Base.metadata, ensure_partitions=lambda: ensure_partitions(database))
+
+@st.cache_resource
+def get_tracer():
+    # Per-request and per-stage metrics share the write-behind logger; TRACING_ENABLED=false turns them off
+    return Tracer(get_interaction_logger())
+
+@st.cache_resource
+def get_executor():
+    # Runs the query rewrite and the speculative searches of concurrent requests
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix='rag')
+
+# Answers kept per session so that rating a response never re-runs the pipeline
+MAX_SESSION_ANSWERS = 20
 
-    id = Column(Integer, primary_key=True)
-    query = Column(String)
-    response = Column(String)
-    rating = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+collection_name = "ai_related_discussions"
+# Discussion-level records (url, author, comments) referenced by the chunks
+discussions_collection_name = "ai_related_discussion_threads"
 
-Base.metadata.create_all(engine)
+@st.cache_resource
+def get_retriever():
+    # RETRIEVER_BACKEND=bm25 serves searches from the memory-mapped indexes built by bm25_index.py
+    return build_retriever(get_typesense_client(), [collection_name, discussions_collection_name])
+
+retriever = get_retriever()
+
+@st.cache_resource
+def get_embedder():
+    # Query embedder for SEARCH_MODE=hybrid; must match the EMBEDDING_PROVIDER the chunks were indexed with
+    return build_embedder() if SEARCH_MODE == 'hybrid' else None
+
+search_cache = get_search_cache()
+llm_cache = get_llm_cache()
+interaction_logger = get_interaction_logger()
+tracer = get_tracer()
 
 def calculate_precision_recall_f1(retrieved_docs, relevant_docs):
     retrieved_set = set(retrieved_docs)
@@ -70,18 +140,75 @@ def calculate_precision_recall_f1(retrieved_docs, relevant_docs):
 
     return precision, recall, f1_score
 
-def search_typesense(query: str, relevant_docs: list, k: int = 10, num_typos: int = 2):
+def cached_search(namespace, params, collections, compute):
+    # In-process searches are cheaper than a cache lookup; only remote ones go through the cache
+    if not retriever.remote:
+        return compute()
+    return search_cache.get_or_compute(namespace, params, collections, compute)
+
+def hydrate_discussions(search_results):
+    """Attach the parent discussion fields (url, author, comments) to every chunk hit, fetching each discussion once."""
+    discussion_ids = sorted({hit['document']['discussion_id'] for hit in search_results['hits']
+                             if hit['document'].get('discussion_id')})
+    if not discussion_ids:
+        return search_results
+
     search_parameters = {
-        'q': query,
-        'query_by': 'title,bodyText,comments',
-        'num_typos': num_typos,
-        'per_page': k
+        'q': '*',
+        'query_by': 'title',
+        'filter_by': f"id:[{','.join(discussion_ids)}]",
+        'exclude_fields': 'content_hash',
+        'per_page': len(discussion_ids)
     }
+    response = cached_search(
+        'hydrate', search_parameters, [discussions_collection_name],
+        lambda: retriever.search(discussions_collection_name, search_parameters)
+    )
+    discussions = {hit['document']['id']: hit['document'] for hit in response['hits']}
+
+    for hit in search_results['hits']:
+        discussion = discussions.get(hit['document'].get('discussion_id'))
+        if discussion:
+            for field in ('url', 'author', 'comments', 'title_token_count', 'comments_token_count'):
+                if field in discussion:
+                    hit['document'].setdefault(field, discussion[field])
+    return search_results
+
+def score_results(results, relevant_docs: list):
+    retrieved_docs = [hit['document']['id'] for hit in results['hits']]
+    return calculate_precision_recall_f1(retrieved_docs, relevant_docs)
+
+def query_vector(query, trace=NULL_TRACE):
+    """Embedding of the query in hybrid mode, None for keyword search."""
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+    with trace.span('embed_query', model=embedder.name):
+        return embed_query(embedder, query)
+
+def search_typesense(query: str, relevant_docs: list, k: int = 10, num_typos: int = 2, trace=NULL_TRACE,
+                     filter_by=None, recency=False):
+    vector = query_vector(query, trace)
+    search_parameters = build_search_parameters(query, k=k, num_typos=num_typos, query_vector=vector,
+                                                filter_by=filter_by, recency=recency)
     
-    results = typesense_client.collections[collection_name].documents.search(search_parameters)
+    with trace.span('search', cache_hit=True, mode='hybrid' if vector else 'keyword',
+                    filtered=bool(filter_by), recency=recency) as span:
+        def search():
+            span['cache_hit'] = False
+            if vector:
+                # A query vector is too long for a GET query string; multi_search sends it in the body
+                results = retriever.multi_search([{**search_parameters, 'collection': collection_name}])[0]
+                if 'error' in results:
+                    raise ValueError(f"Search failed: {results['error']}")
+                return results
+            return retriever.search(collection_name, search_parameters)
+
+        results = cached_search('search', search_parameters, [collection_name], search)
+        hydrate_discussions(results)
+        span['hit_count'] = len(results['hits'])
     
-    retrieved_docs = [hit['document']['id'] for hit in results['hits']]
-    precision, recall, f1_score = calculate_precision_recall_f1(retrieved_docs, relevant_docs)
+    precision, recall, f1_score = score_results(results, relevant_docs)
     
     logger.info(f"Precision: {precision}, Recall: {recall}, F1 Score: {f1_score}")
     
@@ -89,143 +216,246 @@ def search_typesense(query: str, relevant_docs: list, k: int = 10, num_typos: in
 
 def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding(encoding_name)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
-
-def extract_content_for_llm(search_results, max_tokens=3000):
-    contexts = []
-    total_tokens = 0
-    for hit in search_results['hits']:
-        title = hit['document'].get('title', '')
-        body = hit['document'].get('bodyText', '')
-        comments = hit['document'].get('comments', [])
-        
-        content = f"Title: {title}\n\nBody: {body}\n\nComments: {' | '.join(comments)}"
-        content_tokens = num_tokens_from_string(content)
-        
-        if total_tokens + content_tokens > max_tokens:
-            break
-        
-        contexts.append(content)
-        total_tokens += content_tokens
-    
-    combined_context = "\n\n---\n\n".join(contexts)
-    return combined_context
-
-def log_response(query, response, rating, precision, recall, f1_score):
-    session = Session()
-    new_response = LLMResponse(query=query, response=response, rating=rating)
-    session.add(new_response)
-    session.commit()
-    session.close()
+    return count_tokens(string, encoding_name)
+
+def extract_content_for_llm(search_results, max_tokens=3000, trace=NULL_TRACE, query=None):
+    """
+    Collapse the hits to one per discussion, rerank them for diversity, compress them to
+    the sentences relevant to `query` and pack them into the prompt budget. Returns the
+    combined context and its token count.
+    """
+    with trace.span('rerank', hit_count=len(search_results['hits'])) as span:
+        hits = rerank_hits(search_results['hits'])
+        span['discussion_count'] = len(hits)
+    if query and CONTEXT_COMPRESSION_ENABLED:
+        with trace.span('compress', hit_count=len(hits)) as span:
+            hits, compression = compress_hits(hits, query)
+            span.update(compression)
+        trace.set(compression_ratio=compression['compression_ratio'])
+        logger.info(f"Compressed the context from {compression['original_tokens']} to {compression['compressed_tokens']} tokens "
+                    f"({compression['compression_ratio']:.2f}x)")
+    with trace.span('extract') as span:
+        packed = pack_context(hits, max_tokens=max_tokens)
+        span.update(hit_count=packed['hits_used'], context_tokens=packed['token_count'], truncated=packed['truncated'])
+    trace.set(hits_used=packed['hits_used'], context_tokens=packed['token_count'])
+    logger.info(f"Packed {packed['hits_used']} of {len(hits)} discussions from {len(search_results['hits'])} hits "
+                f"({packed['token_count']} tokens, truncated={packed['truncated']})")
+    return packed['text'], packed['token_count']
+
+def log_response(query, response, rating, precision, recall, f1_score, request_id=None):
+    trace = tracer.start('rating', request_id=request_id)
+    with trace.span('log_response'):
+        # Only queues the row; the write-behind logger inserts it in the background
+        interaction_logger.log('llm_responses', {
+            'query': query,
+            'response': response,
+            'rating': rating,
+            'timestamp': datetime.utcnow()
+        })
+    trace.finish()
 
     logger.info(f"Logged response with Precision: {precision}, Recall: {recall}, F1 Score: {f1_score}")
 
-# Define different RAG approaches
-def rag_approach_1(query, relevant_docs):
-    # Implementation for RAG Approach 1 with num_typos=2
-    return search_typesense(query, relevant_docs, num_typos=2)
-
-def rag_approach_2(query, relevant_docs):
-    # Implementation for RAG Approach 2 with num_typos=1
-    return search_typesense(query, relevant_docs, num_typos=1)
-
-def evaluate_rag_approaches(query, relevant_docs):
-    approaches = [rag_approach_1, rag_approach_2]
-    best_approach = None
-    best_f1_score = 0
-
-    for approach in approaches:
-        try:
-            _, _, _, f1_score = approach(query, relevant_docs)
-            if f1_score > best_f1_score:
-                best_f1_score = f1_score
-                best_approach = approach
-        except Exception as e:
-            logger.error(f"Error evaluating approach {approach.__name__}: {e}")
-
-    if best_approach is None:
-        raise ValueError("No valid RAG approach found")
+def evaluate_rag_approaches(query, relevant_docs, approaches=RAG_APPROACHES, k=10, trace=NULL_TRACE,
+                            filter_by=None, recency=False):
+    """
+    Run every approach in one multi_search round-trip and return the best one as
+    `(name, search_results, precision, recall, f1_score)`. Ties keep the earlier approach.
+    """
+    vector = query_vector(query, trace)
+    searches = [
+        {**build_search_parameters(query, k=k, query_vector=vector, filter_by=filter_by, recency=recency, **approach['params']),
+         'collection': collection_name}
+        for approach in approaches
+    ]
+    with trace.span('search', cache_hit=True, mode='hybrid' if vector else 'keyword',
+                    filtered=bool(filter_by), recency=recency) as span:
+        def search():
+            span['cache_hit'] = False
+            return {'results': retriever.multi_search(searches)}
+
+        response = cached_search('multi_search', searches, [collection_name], search)
+
+        best = None
+        for approach, results in zip(approaches, response['results']):
+            if 'error' in results:
+                logger.error(f"Error evaluating approach {approach['name']}: {results['error']}")
+                continue
+            precision, recall, f1_score = score_results(results, relevant_docs)
+            logger.info(f"{approach['name']}: Precision: {precision}, Recall: {recall}, F1 Score: {f1_score}")
+            if best is None or f1_score > best[4]:
+                best = (approach['name'], results, precision, recall, f1_score)
+
+        if best is None:
+            raise ValueError("No valid RAG approach found")
+
+        hydrate_discussions(best[1])
+        span.update(hit_count=len(best[1]['hits']), approach=best[0])
+    return best
+
+def llm_params(llm, **extra):
+    """Parameters that change an LLM's output; part of every LLM cache key."""
+    params = {
+        'model': getattr(llm, 'model_name', type(llm).__name__),
+        'temperature': getattr(llm, 'temperature', None),
+        'max_tokens': getattr(llm, 'max_tokens', None),
+    }
+    params.update(extra)
+    return params
 
-    return best_approach
+def retrieve(query, relevant_docs, trace=NULL_TRACE, filter_by=None, recency=False):
+    """Best-approach results for a query, tagged with the approach that produced them."""
+    best_rag_approach, search_results, _, _, _ = evaluate_rag_approaches(query, relevant_docs, trace=trace,
+                                                                         filter_by=filter_by, recency=recency)
+    search_results['rag_approach'] = best_rag_approach
+    return search_results
 
-def rewrite_query(query, llm):
+def rewrite_query(query, llm, trace=NULL_TRACE):
     # Example implementation of query rewriting using the same model
     prompt = f"Rewrite the following query for better clarity and context: {query}"
-    rewritten_query = llm.invoke({"question": prompt})
+    with trace.span('rewrite') as span:
+        rewritten_query, cache_tier = llm_cache.get_or_invoke(
+            'rewrite', query, llm_params(llm, prompt=prompt.replace(query, '')),
+            lambda: llm.invoke({"question": prompt})
+        )
+        span['cache_hit'] = cache_tier is not None
+        if trace.enabled and cache_tier is None:
+            span.update(prompt_tokens=count_tokens(prompt), completion_tokens=count_tokens(rewritten_query))
     return rewritten_query
 
-def process_query(query, llm):
-    rewritten_query = rewrite_query(query, llm)
+def process_query(query, llm, trace=NULL_TRACE):
+    rewritten_query = rewrite_query(query, llm, trace)
     logger.info(f"Original Query: {query}")
     logger.info(f"Rewritten Query: {rewritten_query}")
     return rewritten_query
 
+def answer_question(user_query, llm, filter_by=None, recency=False):
+    """
+    Run the whole RAG pipeline for one question and return everything the UI and the rating log need.
+    `filter_by` restricts retrieval (see build_filter_by) and `recency` prefers newer discussions.
+    """
+    # Perform RAG evaluation, retrieving for the original query while it is being rewritten
+    trace = tracer.start('answer')
+    relevant_docs = []  # This should be a list of relevant document IDs for the query
+    outcome = speculative_retrieval(
+        user_query,
+        lambda query: process_query(query, llm, trace),
+        lambda query: retrieve(query, relevant_docs, trace, filter_by=filter_by, recency=recency),
+        get_executor()
+    )
+    rewritten_query = outcome['rewritten_query'] or user_query
+    search_results = outcome['results']
+    best_rag_approach = search_results.get('rag_approach', outcome['strategy'])
+    precision, recall, f1_score = score_results(search_results, relevant_docs)
+    logger.info(f"Selected {best_rag_approach} ({outcome['strategy']}), number of search results: {len(search_results['hits'])}")
+    logger.info(f"Search cache: {search_cache.stats()}")
+
+    # Extract content for LLM
+    # Sentences are scored against both phrasings of the question
+    compression_query = user_query if rewritten_query == user_query else f"{user_query} {rewritten_query}"
+    combined_context, context_tokens = extract_content_for_llm(search_results, max_tokens=3000, trace=trace,
+                                                               query=compression_query)
+    logger.info(f"Combined context length: {len(combined_context)} characters")
+    logger.info(f"Estimated tokens: {context_tokens}")
+    logger.info(f"Context preview:\n{combined_context[:1000]}...")  # Log the first 1000 characters of the context
+
+    prompt, chain = get_answer_chain()
+
+    # Use the chain with the user's query
+    logger.info("Sending request to OpenAI")
+    with trace.span('llm') as span:
+        response, cache_tier = llm_cache.get_or_invoke(
+            'answer', user_query, llm_params(llm, prompt_template=prompt.template),
+            lambda: chain.invoke({"question": user_query, "context": combined_context}),
+            context=combined_context
+        )
+        span.update(cache_hit=cache_tier is not None, cache_tier=cache_tier)
+        if trace.enabled and cache_tier is None:
+            # The context was counted while packing; only the template and question are tokenized here
+            span.update(prompt_tokens=context_tokens + count_tokens(prompt.template) + count_tokens(user_query),
+                        completion_tokens=count_tokens(response))
+    logger.info(f"OpenAI response: {response}")
+
+    trace.set(approach=best_rag_approach, strategy=outcome['strategy'], hit_count=len(search_results['hits']),
+              precision=precision, recall=recall, f1_score=f1_score)
+    trace.finish()
+
+    return {
+        'request_id': trace.request_id,
+        'rewritten_query': rewritten_query,
+        'approach': best_rag_approach,
+        'response': response,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score,
+    }
+
+def repository_facets():
+    """Repositories in the index with their discussion counts, most discussed first."""
+    search_parameters = {'q': '*', 'query_by': 'title', 'facet_by': 'repository', 'max_facet_values': 100, 'per_page': 0}
+    try:
+        response = cached_search(
+            'facets', search_parameters, [discussions_collection_name],
+            lambda: retriever.search(discussions_collection_name, search_parameters)
+        )
+    except Exception as e:
+        # The filters are optional; a schema without facets just hides them
+        logger.warning(f"Could not load the repository facets: {e}")
+        return []
+    counts = next((facet['counts'] for facet in response.get('facet_counts', []) if facet['field_name'] == 'repository'), [])
+    return [(count['value'], count['count']) for count in counts]
+
+def search_filters():
+    """Sidebar filters as `(filter_by, recency)`."""
+    st.sidebar.header("Filters")
+    facets = dict(repository_facets())
+    repositories = st.sidebar.multiselect("Repositories", list(facets), format_func=lambda name: f"{name} ({facets[name]})")
+    created = st.sidebar.date_input("Created between", value=())
+    recency = st.sidebar.checkbox("Prefer recent discussions")
+
+    created_from = created_to = None
+    if len(created) >= 1:
+        created_from = datetime.combine(created[0], time.min, tzinfo=timezone.utc).timestamp()
+    if len(created) == 2:
+        created_to = (datetime.combine(created[1], time.min, tzinfo=timezone.utc) + timedelta(days=1)).timestamp() - 1
+    return build_filter_by(repositories, created_from, created_to), recency
+
 def main():
     st.title("Search and Q&A Chatbot Github Discussions about Crew AI, Spacy, AllenAI, and more")
 
     # Set up Langchain components
-    llm = OpenAI(temperature=0, max_tokens=256)
+    llm = get_llm()
 
     # User input
+    filter_by, recency = search_filters()
     user_query = st.text_input("Enter your question:")
 
     if user_query:
-        logger.info(f"User query: {user_query}")
-
-        # Rewrite the user query
-        rewritten_query = process_query(user_query, llm)
-
-        # Perform RAG evaluation
-        relevant_docs = []  # This should be a list of relevant document IDs for the query
-        try:
-            best_rag_approach = evaluate_rag_approaches(rewritten_query, relevant_docs)
-            search_results, precision, recall, f1_score = best_rag_approach(rewritten_query, relevant_docs)
-            logger.info(f"Number of search results: {len(search_results['hits'])}")
-        except ValueError as e:
-            st.error(f"Error: {e}")
-            return
-
-        # Extract content for LLM
-        combined_context = extract_content_for_llm(search_results, max_tokens=3000)
-        logger.info(f"Combined context length: {len(combined_context)} characters")
-        logger.info(f"Estimated tokens: {num_tokens_from_string(combined_context)}")
-        logger.info(f"Context preview:\n{combined_context[:1000]}...")  # Log the first 1000 characters of the context
-
-        # Set up Langchain components
-        prompt = PromptTemplate(
-            input_variables=["question", "context"],
-            template="""You are a helpful AI assistant specializing in information about Crew AI. 
-            Use ONLY the following context from discussions to answer the user's question. 
-            The context contains titles, body text, and comments from relevant discussions about Crew AI. 
-            If the context doesn't contain relevant information to answer the question, say that you don't have enough 
-            information from the available discussions.
-
-            Context:
-            {context}
-
-            User's Question: {question}
-
-            Answer based ONLY on the above context. If the information is not in the context, say you don't have enough information:"""
-        )
-        chain = prompt | llm
-
-        # Use the chain with the user's query
-        logger.info("Sending request to OpenAI")
-        response = chain.invoke({"question": user_query, "context": combined_context})
-        logger.info(f"OpenAI response: {response}")
+        # Reruns triggered by the rating widgets reuse the answer computed for this question
+        answers = st.session_state.setdefault('answers', {})
+        answer_key = (normalize_query(user_query), filter_by, recency)
+        if answer_key not in answers:
+            logger.info(f"User query: {user_query} (filter: {filter_by}, recency: {recency})")
+            try:
+                answers[answer_key] = answer_question(user_query, llm, filter_by=filter_by, recency=recency)
+            except ValueError as e:
+                st.error(f"Error: {e}")
+                return
+            while len(answers) > MAX_SESSION_ANSWERS:
+                answers.pop(next(iter(answers)))
+        result = answers[answer_key]
 
         # Display the LLM response to the user
         st.subheader("Answer")
-        st.write(response)
+        st.write(result['response'])
 
         # Add a rating input
         rating = st.slider("Rate the response (1-5)", 1, 5, 3)
 
         # Add a submit button for the rating
         if st.button("Submit Rating"):
-            log_response(user_query, response, float(rating), precision, recall, f1_score)
+            log_response(user_query, result['response'], float(rating), result['precision'], result['recall'], result['f1_score'],
+                         request_id=result['request_id'])
             st.success("Rating submitted successfully!")
 
 if __name__ == "__main__":
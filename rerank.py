@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+
+from hashing import hashing_embedding
+
+# Trade-off between relevance (1.0) and novelty (0.0) when reranking the collapsed hits.
+RERANK_MMR_LAMBDA = float(os.getenv('RERANK_MMR_LAMBDA', '0.7'))
+RERANK_DIMENSIONS = 512
+
+# Marks the skipped chunks between two non-adjacent chunks of a discussion.
+GAP_MARKER = ' [...] '
+
+
+def _group_key(document):
+    return document.get('discussion_id') or document.get('url') or document['id']
+
+
+def merge_overlapping(previous, following):
+    """Join two consecutive chunks, dropping the sentences the second repeats from the first."""
+    if following:
+        start = previous.find(following[0])
+        while start != -1:
+            # The overlap is made of whole sentences, so it starts right after a sentence end.
+            at_sentence = start == 0 or previous[max(start - 2, 0):start] in ('. ', '! ', '? ')
+            if at_sentence and following.startswith(previous[start:]):
+                return previous[:start] + following
+            start = previous.find(following[0], start + 1)
+    return f"{previous} {following}"
+
+
+def merge_chunks(hits):
+    """
+    One document from the hits of a single discussion: chunks in document order, adjacent
+    ones joined without their shared overlap and gaps marked with GAP_MARKER.
+    """
+    ordered = sorted(hits, key=lambda hit: hit['document'].get('chunk_index', 0))
+    document = dict(hits[0]['document'])
+    body = ordered[0]['document'].get('bodyText', '')
+    for previous, hit in zip(ordered, ordered[1:]):
+        text = hit['document'].get('bodyText', '')
+        if hit['document'].get('chunk_index', 0) == previous['document'].get('chunk_index', 0) + 1:
+            body = merge_overlapping(body, text)
+        else:
+            body = f"{body}{GAP_MARKER}{text}"
+    document['bodyText'] = body
+    if len(hits) > 1:
+        # The stored count is per chunk; packing measures the merged body instead
+        document.pop('token_count', None)
+        document['merged_chunks'] = [hit['document'].get('chunk_index') for hit in ordered]
+    return {**hits[0], 'document': document}
+
+
+def collapse_hits(hits):
+    """Group the hits by discussion, ranked by their best hit, and merge each group into one hit."""
+    groups = {}
+    for hit in hits:
+        groups.setdefault(_group_key(hit['document']), []).append(hit)
+    return [merge_chunks(group) for group in groups.values()]
+
+
+def _relevance(hits):
+    # Fused hits carry comparable `rrf_score`s; their `text_match` comes from different queries
+    key = 'rrf_score' if any('rrf_score' in hit for hit in hits) else 'text_match'
+    scores = np.array([float(hit.get(key) or 0) for hit in hits])
+    if len(hits) and scores.max() > scores.min():
+        return (scores - scores.min()) / (scores.max() - scores.min())
+    # No usable scores (or all equal): fall back to the retrieval order.
+    return 1.0 - np.arange(len(hits)) / max(len(hits), 1)
+
+
+def mmr_rerank(hits, mmr_lambda=RERANK_MMR_LAMBDA):
+    """
+    Maximal marginal relevance: repeatedly take the hit with the best trade-off between
+    its relevance and its similarity to the hits already taken, so near-duplicate
+    evidence sinks below distinct evidence.
+    """
+    if len(hits) < 3:
+        return list(hits)
+    relevance = _relevance(hits)
+    vectors = np.array([
+        hashing_embedding(f"{hit['document'].get('title', '')} {hit['document'].get('bodyText', '')}", RERANK_DIMENSIONS)
+        for hit in hits
+    ])
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    remaining = np.ones(len(hits), dtype=bool)
+    remaining[selected[0]] = False
+    while remaining.any():
+        scores = np.where(remaining, mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return [hits[i] for i in selected]
+
+
+def rerank_hits(hits, mmr_lambda=RERANK_MMR_LAMBDA):
+    """Collapse the hits to one per discussion, then order them for diversity."""
+    return mmr_rerank(collapse_hits(hits), mmr_lambda)
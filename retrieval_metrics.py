@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def relevance_matrix(rankings, relevant_sets, k):
+    """
+    Boolean `(queries, k)` matrix: entry `[q, i]` says whether the i-th ranked id of query
+    q is relevant. Rankings shorter than `k` are padded with non-relevant slots.
+    """
+    matrix = np.zeros((len(rankings), k), dtype=bool)
+    for row, (ranking, relevant) in enumerate(zip(rankings, relevant_sets)):
+        hits = [document_id in relevant for document_id in ranking[:k]]
+        matrix[row, :len(hits)] = hits
+    return matrix
+
+
+def score_rankings(rankings, relevant_sets, k=10):
+    """
+    Score every query at once. `rankings` are lists of retrieved ids in rank order and
+    `relevant_sets` the matching sets of relevant ids. Returns per-query arrays of
+    precision@k, recall@k, f1@k, reciprocal rank and binary nDCG@k. Queries without any
+    relevant id score 0 on every metric.
+    """
+    relevance = relevance_matrix(rankings, relevant_sets, k)
+    retrieved = np.array([min(len(ranking), k) for ranking in rankings], dtype=float)
+    relevant = np.array([len(relevant_set) for relevant_set in relevant_sets], dtype=float)
+    true_positives = relevance.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(retrieved > 0, true_positives / retrieved, 0.0)
+        recall = np.where(relevant > 0, true_positives / relevant, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        first_relevant = relevance.argmax(axis=1)
+        reciprocal_rank = np.where(relevance.any(axis=1), 1.0 / (first_relevant + 1), 0.0)
+
+        discounts = 1.0 / np.log2(np.arange(2, k + 2))
+        dcg = relevance @ discounts
+        # Ideal DCG: all relevant ids (up to k) ranked first.
+        ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(relevant, k).astype(int)]
+        ndcg = np.where(ideal_dcg > 0, dcg / ideal_dcg, 0.0)
+
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'reciprocal_rank': reciprocal_rank,
+        'ndcg': ndcg,
+    }
+
+
+def summarize(scores, latencies_ms, percentiles=(50, 90, 95, 99)):
+    """Mean of every per-query metric (MRR for the reciprocal rank) and latency percentiles in ms."""
+    summary = {name: float(values.mean()) if len(values) else 0.0 for name, values in scores.items()}
+    summary['mrr'] = summary.pop('reciprocal_rank')
+    latencies = np.asarray(latencies_ms, dtype=float)
+    if len(latencies):
+        for percentile, value in zip(percentiles, np.percentile(latencies, percentiles)):
+            summary[f"latency_p{percentile}_ms"] = float(value)
+        summary['latency_mean_ms'] = float(latencies.mean())
+    return summary
@@ -0,0 +1,187 @@
+import logging
+import os
+import re
+
+import numpy as np
+
+from bm25_index import BM25_INDEX_DIR, BM25Index
+
+logger = logging.getLogger(__name__)
+
+# 'typesense' queries the server, 'bm25' serves the searches from the in-process indexes.
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'typesense')
+
+FILTER_CLAUSE_PATTERN = re.compile(r'^\s*(\w+)\s*:\s*(>=|<=|!=|>|<|=)?\s*(.+?)\s*$')
+SORT_CLAUSE_PATTERN = re.compile(r'^\s*(\w+)(?:\(buckets:\s*(\d+)\))?\s*:\s*(asc|desc)\s*$')
+
+
+class TypesenseRetriever:
+    """
+    Retriever interface: `search(collection_name, params)` and `multi_search(searches)`
+    take Typesense search parameters and return Typesense-shaped results, so callers
+    work the same with every backend. `remote` tells whether a search costs a round-trip
+    (and is therefore worth caching).
+    """
+
+    remote = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def search(self, collection_name, params):
+        return self.client.collections[collection_name].documents.search(params)
+
+    def multi_search(self, searches):
+        return self.client.multi_search.perform({'searches': searches}, {})['results']
+
+
+def _filter_values(value):
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        return [item.strip().strip('`') for item in value[1:-1].split(',') if item.strip()]
+    return [value.strip('`')]
+
+
+def _matches(values, operator, expected):
+    if operator in ('>=', '<=', '>', '<'):
+        bound = float(expected[0])
+        numbers = np.array([float(v) if v is not None else np.nan for v in values])
+        with np.errstate(invalid='ignore'):
+            return {'>=': numbers >= bound, '<=': numbers <= bound, '>': numbers > bound, '<': numbers < bound}[operator]
+    if len(expected) == 1 and '..' in expected[0]:
+        low, high = (float(bound) for bound in expected[0].split('..'))
+        numbers = np.array([float(v) if v is not None else np.nan for v in values])
+        with np.errstate(invalid='ignore'):
+            return (numbers >= low) & (numbers <= high)
+    expected = set(expected)
+    matched = np.array([
+        bool(expected & set(map(str, v))) if isinstance(v, list) else str(v) in expected
+        for v in values
+    ], dtype=bool)
+    return ~matched if operator == '!=' else matched
+
+
+def filter_mask(index, filter_by):
+    """
+    Boolean document mask for the subset of Typesense `filter_by` syntax the app uses:
+    `&&`-joined clauses of `field:=value`, `field:[a,b]`, `field:!=value`, `field:>=n`
+    (and the other comparisons) or `field:[low..high]`. String matches are exact.
+    """
+    if not filter_by:
+        return None
+    mask = np.ones(len(index), dtype=bool)
+    for clause in filter_by.split('&&'):
+        match = FILTER_CLAUSE_PATTERN.match(clause)
+        if not match:
+            raise ValueError(f"Unsupported filter clause: {clause}")
+        field, operator, value = match.groups()
+        mask &= _matches(index.column(field), operator or '=', _filter_values(value))
+    return mask
+
+
+def sort_order(index, numbers, scores, sort_by):
+    """
+    Order of the ranked `numbers` under a Typesense `sort_by` of `_text_match` (optionally
+    in buckets of similar rank) and numeric fields. Documents without a value sort last
+    and ties keep their rank order.
+    """
+    keys = []
+    for clause in sort_by.split(','):
+        match = SORT_CLAUSE_PATTERN.match(clause)
+        if not match:
+            raise ValueError(f"Unsupported sort clause: {clause}")
+        field, buckets, direction = match.groups()
+        if field == '_text_match':
+            # `numbers` are ranked best first; buckets split that ranking into equal groups
+            ranks = np.arange(len(numbers))
+            key = ranks * int(buckets) // max(len(numbers), 1) if buckets else ranks
+            keys.append(key if direction == 'desc' else -key)
+        else:
+            column = index.column(field)
+            values = np.array([float(column[n]) if column[n] is not None else np.nan for n in numbers])
+            key = -values if direction == 'desc' else values
+            keys.append(np.where(np.isnan(key), np.inf, key))
+    # lexsort takes the primary key last and is stable
+    return np.lexsort(keys[::-1]) if keys else np.arange(len(numbers))
+
+
+def facet_counts(index, numbers, facet_by, max_values=10):
+    """Typesense-shaped `facet_counts` of the matching documents `numbers`, most frequent values first."""
+    facets = []
+    for field in filter(None, (name.strip() for name in facet_by.split(','))):
+        column = index.column(field)
+        counts = {}
+        for number in numbers:
+            values = column[number]
+            for value in values if isinstance(values, list) else [values]:
+                if value is not None:
+                    counts[str(value)] = counts.get(str(value), 0) + 1
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:max_values]
+        facets.append({'field_name': field, 'counts': [{'value': value, 'count': count} for value, count in top]})
+    return facets
+
+
+class BM25Retriever:
+    """
+    In-process backend over one BM25Index per collection. Every index covers the fields
+    it was built with, so `query_by`, typo tolerance (`num_typos`) and the hybrid
+    `vector_query` are not applied; `filter_by`, `sort_by`, `facet_by`, `per_page` and
+    `exclude_fields` are.
+    """
+
+    remote = False
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    @classmethod
+    def from_directory(cls, collection_names, directory=BM25_INDEX_DIR):
+        return cls({name: BM25Index(os.path.join(directory, name)) for name in collection_names})
+
+    def search(self, collection_name, params):
+        index = self.indexes[collection_name]
+        per_page = int(params.get('per_page', 10))
+        mask = filter_mask(index, params.get('filter_by'))
+        # Sorting and facets need every match, not only the first page
+        limit = len(index) if params.get('sort_by') or params.get('facet_by') else per_page
+        if params.get('q', '*').strip() == '*':
+            numbers = np.flatnonzero(mask) if mask is not None else np.arange(len(index))
+            found = len(numbers)
+            numbers, scores = numbers[:limit], np.zeros(min(found, limit))
+        else:
+            numbers, scores, found = index.top_k(params['q'], limit, mask)
+
+        response = {}
+        if params.get('facet_by'):
+            response['facet_counts'] = facet_counts(index, numbers, params['facet_by'], int(params.get('max_facet_values', 10)))
+        if params.get('sort_by'):
+            order = sort_order(index, numbers, scores, params['sort_by'])
+            numbers, scores = numbers[order], scores[order]
+        numbers, scores = numbers[:per_page], scores[:per_page]
+
+        excluded = set(filter(None, params.get('exclude_fields', '').split(',')))
+        hits = []
+        for number, score in zip(numbers, scores):
+            document = index.document(int(number))
+            for field in excluded:
+                document.pop(field, None)
+            hits.append({'document': document, 'text_match': float(score)})
+        return {**response, 'hits': hits, 'found': found}
+
+    def multi_search(self, searches):
+        results = []
+        for search in searches:
+            params = {key: value for key, value in search.items() if key != 'collection'}
+            try:
+                results.append(self.search(search['collection'], params))
+            except (KeyError, ValueError) as e:
+                # Mirror Typesense: one failing search does not fail the others.
+                results.append({'error': str(e), 'code': 400})
+        return results
+
+
+def build_retriever(typesense_client, collection_names, backend=RETRIEVER_BACKEND):
+    if backend == 'bm25':
+        logger.info(f"Serving searches from the BM25 indexes in {BM25_INDEX_DIR}")
+        return BM25Retriever.from_directory(collection_names)
+    return TypesenseRetriever(typesense_client)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '1024'))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv('SEARCH_CACHE_TTL_SECONDS', '300'))
+SEARCH_CACHE_REDIS_URL = os.getenv('SEARCH_CACHE_REDIS_URL')
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after `ttl_seconds`."""
+
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl_seconds=SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisCache:
+    """Shared backend so that every app worker benefits from the others' hits."""
+
+    def __init__(self, url=SEARCH_CACHE_REDIS_URL, ttl_seconds=SEARCH_CACHE_TTL_SECONDS, prefix='search_cache:'):
+        if redis is None:
+            raise ImportError("The shared search cache needs the `redis` package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except redis.RedisError as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+            return None
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, value, ex=int(self.ttl_seconds))
+        except redis.RedisError as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+
+
+def normalize_query(query):
+    return ' '.join(str(query).lower().split())
+
+
+def normalize_params(params):
+    """Normalize every `q` in (possibly nested) search parameters; Typesense matching ignores case and spacing."""
+    if isinstance(params, dict):
+        return {key: normalize_query(value) if key == 'q' else normalize_params(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [normalize_params(value) for value in params]
+    return params
+
+
+class SearchCache:
+    """
+    Cache of search responses keyed by the normalized query, the search parameters
+    and the version stamps of the collections involved, so entries are invalidated
+    as soon as ingestion bumps a collection version.
+
+    Values are stored as JSON and decoded on every hit, so callers may mutate the
+    results (e.g. hydrate them) without corrupting the cache.
+    """
+
+    def __init__(self, versions, local=None, shared=None):
+        self.versions = versions
+        self.local = local if local is not None else LRUCache()
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, namespace, params, collections):
+        payload = {
+            'namespace': namespace,
+            'params': normalize_params(params),
+            'versions': {name: self.versions.current(name) for name in sorted(collections)},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, namespace, params, collections, compute):
+        """Return the cached value for `params`, or `compute()` it and cache it."""
+        key = self.key(namespace, params, collections)
+
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits')
+            return json.loads(value)
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._count('shared_hits')
+                self.local.set(key, value)
+                return json.loads(value)
+
+        self._count('misses')
+        result = compute()
+        value = json.dumps(result)
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+        return result
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            'entries': len(self.local),
+        }
+
+
+def build_search_cache(versions):
+    shared = RedisCache() if SEARCH_CACHE_REDIS_URL else None
+    return SearchCache(versions, local=LRUCache(), shared=shared)
@@ -0,0 +1,56 @@
+# Search parameters shared by the app and the offline retrieval benchmark, so both
+# always evaluate the same queries.
+import os
+
+# 'keyword' is lexical search only; 'hybrid' also ranks by the chunk embeddings.
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'keyword')
+# Weight of the vector score in hybrid mode; the keyword score gets the rest.
+HYBRID_ALPHA = float(os.getenv('HYBRID_ALPHA', '0.3'))
+
+
+# Recency boost: hits are put in buckets of similar text match and the newest come first within a bucket.
+RECENCY_SORT_BY = '_text_match(buckets:10):desc,created_at:desc'
+
+
+def build_filter_by(repositories=None, created_from=None, created_to=None):
+    """
+    Typesense `filter_by` restricting the search to `repositories` (owner/repo names) and
+    to discussions created between the Unix timestamps `created_from` and `created_to`
+    (both inclusive). Returns None when nothing is restricted.
+    """
+    clauses = []
+    if repositories:
+        clauses.append(f"repository:=[{','.join(f'`{repository}`' for repository in repositories)}]")
+    if created_from is not None:
+        clauses.append(f"created_at:>={int(created_from)}")
+    if created_to is not None:
+        clauses.append(f"created_at:<={int(created_to)}")
+    return ' && '.join(clauses) or None
+
+
+def build_search_parameters(query: str, k: int = 10, num_typos: int = 2, query_vector=None, alpha: float = HYBRID_ALPHA,
+                            filter_by=None, recency: bool = False):
+    params = {
+        'q': query,
+        'query_by': 'title,bodyText',
+        'exclude_fields': 'content_hash,embedding',
+        'num_typos': num_typos,
+        'per_page': k
+    }
+    if filter_by:
+        params['filter_by'] = filter_by
+    if recency:
+        params['sort_by'] = RECENCY_SORT_BY
+    if query_vector is not None:
+        # Typesense fuses the keyword and nearest-neighbour ranks of the same query
+        vector = ','.join(f"{value:.6g}" for value in query_vector)
+        params['vector_query'] = f"embedding:([{vector}], k:{k}, alpha:{alpha})"
+    return params
+
+
+# Candidate RAG approaches: extra search parameters on top of build_search_parameters.
+# All candidates are sent in a single multi_search request, so adding one adds no round-trip.
+RAG_APPROACHES = [
+    {'name': 'rag_approach_1', 'params': {'num_typos': 2}},
+    {'name': 'rag_approach_2', 'params': {'num_typos': 1}},
+]
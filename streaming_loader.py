@@ -0,0 +1,215 @@
+import codecs
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_index_writer import BatchIndexWriter
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1 << 20
+WHITESPACE = ' \t\r\n'
+
+
+def detect_format(path):
+    """'array' for a file holding one JSON array, 'jsonl' for one JSON document per line."""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(4096)
+            if not block:
+                return 'jsonl'
+            stripped = block.lstrip()
+            if stripped:
+                return 'array' if stripped.startswith(b'[') else 'jsonl'
+
+
+def iter_jsonl(path, offset=0):
+    """Yield `(record, end_offset)` for every line from byte `offset` on."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line), offset
+
+
+def iter_json_array(path, offset=0, read_size=READ_SIZE):
+    """
+    Yield `(element, end_offset)` for every element of a top-level JSON array without
+    loading the file: text is decoded incrementally and elements are parsed with
+    `raw_decode` as soon as they are complete. `offset` is 0 or an end offset yielded
+    before, i.e. a position just after an element, to resume from.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        buffer = ''
+        position = 0
+        eof = False
+        opened = offset > 0
+
+        def fill():
+            nonlocal buffer, position, eof
+            block = f.read(read_size)
+            eof = not block
+            buffer = buffer[position:] + utf8.decode(block, final=eof)
+            position = 0
+
+        while True:
+            # Skip to the start of the next element: whitespace, the opening bracket and commas
+            while position < len(buffer) and (buffer[position] in WHITESPACE or buffer[position] == ','
+                                             or (not opened and buffer[position] == '[')):
+                if buffer[position] == '[':
+                    opened = True
+                offset += len(buffer[position].encode('utf-8'))
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of file inside the JSON array")
+                fill()
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number or literal may continue in the next block
+                fill()
+                continue
+            offset += len(buffer[position:end].encode('utf-8'))
+            position = end
+            yield element, offset
+
+
+def iter_records(path, offset=0):
+    if detect_format(path) == 'array':
+        return iter_json_array(path, offset)
+    return iter_jsonl(path, offset)
+
+
+class LoadCheckpoint:
+    """
+    Progress of a file load, persisted as JSON: the byte offset up to which every record
+    has been indexed, the numbers of records and documents before it and the collection
+    written to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read load checkpoint {self.path}, starting over: {e}")
+            return None
+
+    def write(self, state):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.load_checkpoint_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _import_batch(client, collection_name, documents):
+    writer = BatchIndexWriter(client, collection_name, batch_size=len(documents))
+    writer.add_many(documents)
+    writer.flush()
+    return writer.indexed, writer.failures
+
+
+def load_file(client, collection_name, path, map_record, checkpoint=None, batch_size=500, workers=4, progress=None):
+    """
+    Stream a JSON array or JSONL file into a collection through bulk imports, with up to
+    `workers` batches in flight and at most twice that many held in memory.
+
+    With a `checkpoint` (a LoadCheckpoint) the load resumes where an earlier run for the
+    same file and collection stopped. The checkpoint only advances past a batch once it
+    and every batch before it were indexed without failures, so a rerun redoes failed
+    batches; upserts make that safe. It is removed when the file loads cleanly.
+    `map_record` turns a record into a document, or returns None to skip it; `progress`
+    is called with the number of bytes consumed. Returns the counts of the load.
+    """
+    size = os.path.getsize(path)
+    state = checkpoint.read() if checkpoint else None
+    if state and (state.get('file') != os.path.abspath(path) or state.get('size') != size
+                  or state.get('collection') != collection_name):
+        logger.info(f"Ignoring the checkpoint of a different load: {state}")
+        state = None
+    offset = state['offset'] if state else 0
+    if offset:
+        logger.info(f"Resuming {path} at byte {offset} after {state['records']} records")
+
+    # `records` and `documents` count the whole file, including what earlier runs loaded
+    stats = {'records': state['records'] if state else 0, 'documents': state['documents'] if state else 0,
+             'indexed': 0, 'failed': 0, 'skipped': 0, 'resumed_from': offset}
+    started = time.perf_counter()
+    in_flight = deque()
+    clean = True
+
+    def submit(documents, end_offset, consumed):
+        future = executor.submit(_import_batch, client, collection_name, documents)
+        in_flight.append((future, {'offset': end_offset, 'records': stats['records'], 'documents': stats['documents']}, consumed))
+
+    def commit(block=False):
+        # Advance the checkpoint over the finished batches at the head of the queue
+        nonlocal clean
+        while in_flight and (block or in_flight[0][0].done()):
+            future, position, consumed = in_flight.popleft()
+            indexed, failures = future.result()
+            stats['indexed'] += indexed
+            stats['failed'] += len(failures)
+            if progress:
+                progress(consumed)
+            clean = clean and not failures
+            if clean and checkpoint:
+                checkpoint.write({'file': os.path.abspath(path), 'size': size, 'collection': collection_name, **position})
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='load') as executor:
+        batch = []
+        batch_start = offset
+        end_offset = offset
+        for record, end_offset in iter_records(path, offset):
+            stats['records'] += 1
+            document = map_record(record)
+            if document is None:
+                stats['skipped'] += 1
+            else:
+                batch.append(document)
+                stats['documents'] += 1
+            if len(batch) >= batch_size:
+                submit(batch, end_offset, end_offset - batch_start)
+                batch, batch_start = [], end_offset
+                commit()
+                while len(in_flight) >= workers * 2:
+                    in_flight[0][0].result()
+                    commit()
+        if batch:
+            submit(batch, size, size - batch_start)
+        commit(block=True)
+
+    if checkpoint and clean:
+        checkpoint.clear()
+    stats['elapsed_seconds'] = time.perf_counter() - started
+    stats['docs_per_sec'] = stats['indexed'] / stats['elapsed_seconds'] if stats['elapsed_seconds'] > 0 else 0.0
+    logger.info(f"Loaded {path} into '{collection_name}': {stats['indexed']} indexed, {stats['failed']} failed, "
+                f"{stats['skipped']} skipped ({stats['docs_per_sec']:.1f} docs/sec)")
+    return stats
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.getenv('DISCUSSION_SYNC_STATE_PATH', '.discussion_sync_state.json')
+
+
+class SyncStateStore:
+    """
+    Per-repository watermarks for incremental discussion syncs, persisted as a JSON file.
+
+    Each entry holds the newest `updatedAt`/`createdAt` that has been indexed and the
+    GraphQL cursor the last run stopped at.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.state = self._load()
+        # Repositories are synced concurrently and share one store.
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read sync state from {self.path}, starting a full sync: {e}")
+            return {}
+
+    @staticmethod
+    def key(owner, repo):
+        return f"{owner}/{repo}"
+
+    def get(self, owner, repo):
+        return self.state.get(self.key(owner, repo))
+
+    def watermark(self, owner, repo):
+        entry = self.get(owner, repo)
+        return entry.get('updatedAt') if entry else None
+
+    def update(self, owner, repo, updated_at=None, created_at=None, cursor=None):
+        """Advance the watermark of a repository once everything up to `updated_at` has been indexed."""
+        with self.lock:
+            entry = dict(self.get(owner, repo) or {})
+            if updated_at and updated_at > entry.get('updatedAt', ''):
+                entry['updatedAt'] = updated_at
+            if created_at and created_at > entry.get('createdAt', ''):
+                entry['createdAt'] = created_at
+            entry['cursor'] = cursor
+            entry['syncedAt'] = datetime.now(timezone.utc).isoformat()
+            self.state[self.key(owner, repo)] = entry
+            self._save()
+
+    def reset(self, owner, repo):
+        with self.lock:
+            self.state.pop(self.key(owner, repo), None)
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so a crash never leaves a truncated state file behind.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.sync_state_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
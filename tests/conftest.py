@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class WordEncoding:
+    """Offline stand-in for the tiktoken encoder: one token per whitespace-separated word."""
+
+    def encode(self, text):
+        return text.split()
+
+    def encode_batch(self, texts, **kwargs):
+        return [text.split() for text in texts]
+
+    def decode(self, tokens):
+        return ' '.join(tokens)
+
+
+@pytest.fixture
+def word_encoding(monkeypatch):
+    """Route every `get_encoding` import to WordEncoding, so token counts are word counts."""
+    pytest.importorskip('tiktoken')
+    encoding = WordEncoding()
+    for name in ('tokenization', 'chunking', 'context_packing', 'compression'):
+        module = importlib.import_module(name)
+        monkeypatch.setattr(module, 'get_encoding', lambda encoding_name=None: encoding)
+    context_packing = importlib.import_module('context_packing')
+    context_packing.template_tokens.cache_clear()
+    context_packing.separator_tokens.cache_clear()
+    yield encoding
+    context_packing.template_tokens.cache_clear()
+    context_packing.separator_tokens.cache_clear()
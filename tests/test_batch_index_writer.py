@@ -0,0 +1,136 @@
+import pytest
+
+pytest.importorskip('typesense')
+
+import typesense
+
+import batch_index_writer
+from batch_index_writer import BatchIndexWriter
+
+
+class FakeDocument:
+    def __init__(self, documents, document_id):
+        self.documents = documents
+        self.document_id = document_id
+
+    def delete(self):
+        self.documents.calls.append(('delete_one', self.document_id))
+        if self.document_id not in self.documents.stored:
+            raise typesense.exceptions.ObjectNotFound(404, 'Not Found')
+        self.documents.stored.discard(self.document_id)
+
+
+class FakeDocuments:
+    """
+    Documents endpoint of one collection. `import_` answers with the scripted per-row
+    results in `imports` (a callable per request), or raises an exception from the script.
+    """
+
+    def __init__(self, imports=(), stored=()):
+        self.imports = list(imports)
+        self.stored = set(stored)
+        self.calls = []
+
+    def import_(self, documents, params):
+        self.calls.append(('import', [document['id'] for document in documents]))
+        response = self.imports.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return [response(document) for document in documents]
+
+    def delete(self, params):
+        self.calls.append(('delete', params['filter_by']))
+        return {'num_deleted': params['filter_by'].count('`') // 2}
+
+    def __getitem__(self, document_id):
+        return FakeDocument(self, document_id)
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+
+class FakeClient:
+    def __init__(self, documents):
+        self.collections = {'chunks': FakeCollection(documents)}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(batch_index_writer.time, 'sleep', lambda seconds: None)
+
+
+def ok(document):
+    return {'success': True}
+
+
+def fail(code, ids):
+    def result(document):
+        if document['id'] in ids:
+            return {'success': False, 'error': f"error {code}", 'code': code}
+        return {'success': True}
+    return result
+
+
+def docs(*ids):
+    return [{'id': document_id} for document_id in ids]
+
+
+def test_default_batch_size_matches_the_import_setting():
+    writer = BatchIndexWriter(FakeClient(FakeDocuments()), 'chunks')
+    assert writer.batch_size == batch_index_writer.TYPESENSE_IMPORT_BATCH_SIZE
+
+
+def test_only_failed_rows_are_retried():
+    documents = FakeDocuments([fail(503, {'b', 'c'}), fail(503, {'c'}), ok])
+    with BatchIndexWriter(FakeClient(documents), 'chunks', batch_size=10) as writer:
+        writer.add_many(docs('a', 'b', 'c'))
+    assert documents.calls == [('import', ['a', 'b', 'c']), ('import', ['b', 'c']), ('import', ['c'])]
+    assert writer.stats()['indexed'] == 3
+    assert writer.failures == []
+
+
+def test_retries_stop_after_max_retries():
+    documents = FakeDocuments([fail(503, {'a'})] * 3)
+    with BatchIndexWriter(FakeClient(documents), 'chunks', max_retries=2) as writer:
+        writer.add_many(docs('a', 'b'))
+    assert len(documents.calls) == 3
+    assert [failure['id'] for failure in writer.failures] == ['a']
+    assert writer.indexed == 1
+
+
+@pytest.mark.parametrize('code', sorted(batch_index_writer.NON_RETRYABLE_CODES))
+def test_non_retryable_rows_fail_at_once(code):
+    documents = FakeDocuments([fail(code, {'a'})])
+    with BatchIndexWriter(FakeClient(documents), 'chunks') as writer:
+        writer.add_many(docs('a', 'b'))
+    assert documents.calls == [('import', ['a', 'b'])]
+    assert writer.failures == [{'id': 'a', 'error': f"error {code}"}]
+
+
+def test_failed_request_retries_every_row_unless_malformed():
+    documents = FakeDocuments([typesense.exceptions.ServerError(503, 'unavailable'), ok])
+    with BatchIndexWriter(FakeClient(documents), 'chunks') as writer:
+        writer.add_many(docs('a', 'b'))
+    assert writer.indexed == 2
+
+    documents = FakeDocuments([typesense.exceptions.RequestMalformed(400, 'bad')])
+    with BatchIndexWriter(FakeClient(documents), 'chunks') as writer:
+        writer.add_many(docs('a', 'b'))
+    assert len(documents.calls) == 1
+    assert writer.stats()['failed'] == 2
+
+
+def test_deletes_by_quoted_filter_and_backtick_ids_one_by_one():
+    documents = FakeDocuments(stored={'odd%60id'})
+    with BatchIndexWriter(FakeClient(documents), 'chunks') as writer:
+        writer.delete(['plain', 'with,comma', 'odd`id', 'gone`id'])
+    assert documents.calls == [
+        ('delete_one', 'odd%60id'),
+        ('delete_one', 'gone%60id'),
+        ('delete', 'id:[`plain`,`with,comma`]'),
+    ]
+    # The missing backtick id is not a failure
+    assert writer.deleted == 3
+    assert writer.failures == []
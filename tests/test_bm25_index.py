@@ -0,0 +1,88 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from bm25_index import BM25Index, tokenize
+
+DOCUMENTS = [
+    {'id': '0', 'title': 'Freeze layers in Keras', 'bodyText': 'set trainable to false to freeze a layer'},
+    {'id': '1', 'title': 'spaCy license', 'bodyText': 'spacy is released under the MIT license'},
+    {'id': '2', 'title': 'Custom layer', 'bodyText': 'write a custom layer by subclassing Layer, layer weights'},
+    {'id': '3', 'title': 'Training loop', 'bodyText': 'the keras fit loop calls train_step'},
+]
+
+
+def reference_scores(documents, query, field_weights=None, k1=1.2, b=0.75):
+    """Okapi BM25 straight from the definition, with the index's field weighting."""
+    field_weights = field_weights or {'title': 2.0, 'bodyText': 1.0}
+    frequencies = []
+    for document in documents:
+        tf = {}
+        for field, weight in field_weights.items():
+            for term in tokenize(document.get(field, '')):
+                tf[term] = tf.get(term, 0.0) + weight
+        frequencies.append(tf)
+    lengths = [sum(tf.values()) for tf in frequencies]
+    average = sum(lengths) / len(lengths)
+    scores = []
+    for tf, length in zip(frequencies, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in frequencies)
+            if term not in tf:
+                continue
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * length / average))
+        scores.append(score)
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    return BM25Index.build(DOCUMENTS, str(tmp_path / 'chunks'))
+
+
+def test_postings_are_stored_per_term(index):
+    term_id = index.vocabulary['layer']
+    start, end = index.term_offsets[term_id], index.term_offsets[term_id + 1]
+    assert list(index.postings_docs[start:end]) == [0, 2]
+    # 'layer' is in the body of document 0 once; document 2 has it three times in the body and once in the title (weight 2)
+    assert list(index.postings_tf[start:end]) == [1.0, 5.0]
+    assert index.term_offsets[-1] == len(index.postings_docs)
+
+
+@pytest.mark.parametrize('query', ['freeze a layer', 'keras', 'MIT license spacy', 'nothing matches'])
+def test_scores_match_the_bm25_definition(index, query):
+    assert np.allclose(index.score(query), reference_scores(DOCUMENTS, query), rtol=1e-5)
+
+
+def test_top_k_ranks_and_counts_matches(index):
+    numbers, scores, found = index.top_k('keras layer', k=2)
+    assert found == 3
+    assert len(numbers) == 2
+    assert list(scores) == sorted(scores, reverse=True)
+    expected = np.argsort(-np.array(reference_scores(DOCUMENTS, 'keras layer')), kind='stable')[:2]
+    assert list(numbers) == list(expected)
+
+
+def test_mask_excludes_documents(index):
+    mask = np.array([False, True, True, True])
+    numbers, _, found = index.top_k('freeze layer', mask=mask)
+    assert list(numbers) == [2]
+    assert found == 1
+
+
+def test_documents_round_trip_and_rebuild_replaces(index, tmp_path):
+    assert [index.document(number) for number in range(len(index))] == DOCUMENTS
+    rebuilt = BM25Index.build(DOCUMENTS[:1], str(tmp_path / 'chunks'))
+    assert len(rebuilt) == 1
+    assert not (tmp_path / 'chunks.building').exists()
+    assert rebuilt.top_k('spacy')[2] == 0
+
+
+def test_empty_index(tmp_path):
+    index = BM25Index.build([], str(tmp_path / 'empty'))
+    numbers, scores, found = index.top_k('anything')
+    assert (len(numbers), len(scores), found) == (0, 0, 0)
@@ -0,0 +1,47 @@
+import pytest
+
+# tokenization.py imports tiktoken at module level
+pytest.importorskip('tiktoken')
+
+from chunking import chunk_by_tokens
+
+
+def sentences(prefix, count, words=5):
+    return [f"{prefix}{i} " + ' '.join(['word'] * (words - 2)) + ' end.' for i in range(count)]
+
+
+def test_short_text_is_one_chunk(word_encoding):
+    assert chunk_by_tokens('One short sentence. And another.', target_tokens=50) == [
+        ('One short sentence. And another.', 5)
+    ]
+
+
+def test_chunks_respect_target_and_cut_on_sentences(word_encoding):
+    text = ' '.join(sentences('s', 20))
+    chunks = chunk_by_tokens(text, target_tokens=20, overlap_tokens=0)
+    assert len(chunks) == 5
+    for chunk, count in chunks:
+        assert count == len(chunk.split()) <= 20
+        assert chunk.endswith('end.')
+    assert ' '.join(chunk for chunk, _ in chunks) == text
+
+
+def test_consecutive_chunks_overlap(word_encoding):
+    chunks = chunk_by_tokens(' '.join(sentences('s', 12)), target_tokens=20, overlap_tokens=5)
+    assert len(chunks) > 2
+    for (previous, _), (following, _) in zip(chunks, chunks[1:]):
+        # Sentences are 5 tokens, so exactly the last one is carried over
+        last_sentence = ' '.join(previous.split()[-5:])
+        assert following.startswith(last_sentence)
+
+
+def test_paragraph_break_once_half_full(word_encoding):
+    text = ' '.join(sentences('a', 3)) + '\n\n' + ' '.join(sentences('b', 3))
+    # Both paragraphs would fit the target; the first one is half of it
+    chunks = chunk_by_tokens(text, target_tokens=30, overlap_tokens=0)
+    assert [chunk.split()[0] for chunk, _ in chunks] == ['a0', 'b0']
+
+
+def test_long_sentence_is_split_by_tokens(word_encoding):
+    chunks = chunk_by_tokens(' '.join(f"w{i}" for i in range(25)) + '.', target_tokens=10, overlap_tokens=0)
+    assert [count for _, count in chunks] == [10, 10, 5]
@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip('typesense')
+
+import typesense
+
+from collection_aliases import ReindexValidationError, blue_green_reindex, publish_version
+
+
+class FakeTypesense:
+    """Collections and aliases in memory; every mutating call is recorded in `operations`."""
+
+    def __init__(self, collections=None, aliases=None, fail_upsert=False):
+        self.documents = dict(collections or {})
+        self.alias_targets = dict(aliases or {})
+        self.fail_upsert = fail_upsert
+        self.operations = []
+        self.collections = FakeCollections(self)
+        self.aliases = FakeAliases(self)
+
+
+class FakeCollection:
+    def __init__(self, fake, name):
+        self.fake = fake
+        self.name = name
+
+    def retrieve(self):
+        # Like Typesense, a collection takes precedence over an alias of the same name
+        name = self.name if self.name in self.fake.documents else self.fake.alias_targets.get(self.name)
+        if name not in self.fake.documents:
+            raise typesense.exceptions.ObjectNotFound(404, 'Not Found')
+        return {'name': name, 'num_documents': self.fake.documents[name]}
+
+    def delete(self):
+        if self.name not in self.fake.documents:
+            raise typesense.exceptions.ObjectNotFound(404, 'Not Found')
+        self.fake.operations.append(('delete', self.name))
+        del self.fake.documents[self.name]
+
+
+class FakeCollections:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def __getitem__(self, name):
+        return FakeCollection(self.fake, name)
+
+    def create(self, schema):
+        self.fake.operations.append(('create', schema['name']))
+        self.fake.documents[schema['name']] = 0
+
+    def retrieve(self):
+        return [{'name': name} for name in self.fake.documents]
+
+
+class FakeAlias:
+    def __init__(self, fake, name):
+        self.fake = fake
+        self.name = name
+
+    def retrieve(self):
+        if self.name not in self.fake.alias_targets:
+            raise typesense.exceptions.ObjectNotFound(404, 'Not Found')
+        return {'name': self.name, 'collection_name': self.fake.alias_targets[self.name]}
+
+
+class FakeAliases:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def __getitem__(self, name):
+        return FakeAlias(self.fake, name)
+
+    def upsert(self, name, mapping):
+        if self.fake.fail_upsert:
+            raise typesense.exceptions.ServerError(500, 'boom')
+        self.fake.operations.append(('alias', name, mapping['collection_name']))
+        self.fake.alias_targets[name] = mapping['collection_name']
+
+
+def test_legacy_collection_is_dropped_only_after_the_alias_exists():
+    client = FakeTypesense(collections={'docs': 10, 'docs__v2': 10})
+    publish_version(client, 'docs', 'docs__v2')
+    assert client.operations == [('alias', 'docs', 'docs__v2'), ('delete', 'docs')]
+
+
+def test_failed_upsert_keeps_the_legacy_collection():
+    client = FakeTypesense(collections={'docs': 10, 'docs__v2': 10}, fail_upsert=True)
+    with pytest.raises(typesense.exceptions.ServerError):
+        publish_version(client, 'docs', 'docs__v2')
+    assert client.operations == []
+    assert 'docs' in client.documents
+
+
+def test_repointing_an_alias_deletes_nothing():
+    client = FakeTypesense(collections={'docs__v1': 10, 'docs__v2': 10}, aliases={'docs': 'docs__v1'})
+    publish_version(client, 'docs', 'docs__v2')
+    assert client.operations == [('alias', 'docs', 'docs__v2')]
+
+
+def fill(client, count):
+    def load(targets):
+        for collection_name in targets.values():
+            client.documents[collection_name] = count
+        return {alias: count for alias in targets}
+    return load
+
+
+def test_reindex_swaps_then_garbage_collects():
+    client = FakeTypesense(collections={'docs__v20240101000000000000': 10}, aliases={'docs': 'docs__v20240101000000000000'})
+    published = blue_green_reindex(client, {'docs': []}, fill(client, 10), keep=1)
+    new = published['docs']
+    assert client.alias_targets['docs'] == new
+    # Created, published, and only then the old version dropped
+    assert [operation[0] for operation in client.operations] == ['create', 'alias', 'delete']
+    assert set(client.documents) == {new}
+
+
+def test_shrunken_rebuild_is_not_published():
+    client = FakeTypesense(collections={'docs__v1': 100}, aliases={'docs': 'docs__v1'})
+    with pytest.raises(ReindexValidationError):
+        blue_green_reindex(client, {'docs': []}, fill(client, 50), min_ratio=0.9)
+    assert client.alias_targets['docs'] == 'docs__v1'
+    assert set(client.documents) == {'docs__v1'}
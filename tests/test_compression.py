@@ -0,0 +1,63 @@
+import pytest
+
+# tokenization.py imports tiktoken at module level
+pytest.importorskip('tiktoken')
+
+from compression import GAP_MARKER, compress_hits, split_sentences
+from context_packing import render_hit, stored_token_count
+
+FILLER = [f"Unrelated sentence number {i} about nothing." for i in range(8)]
+
+
+def hit(body, comments=(), title='Freezing', **counts):
+    return {'document': {'title': title, 'bodyText': body, 'comments': list(comments), **counts}, 'text_match': 1}
+
+
+def words(document):
+    return len(render_hit(document).split())
+
+
+def test_split_sentences_collapses_whitespace():
+    assert split_sentences('One.  Two\nlines?\n\n\nThree') == ['One.', 'Two lines?', 'Three']
+
+
+def test_keeps_matching_sentence_with_neighbours(word_encoding):
+    body = ' '.join(FILLER[:4] + ['Set trainable to False to freeze a layer.'] + FILLER[4:])
+    [compressed], _ = compress_hits([hit(body)], 'how do I freeze a layer', keep_ratio=0.1, neighbours=1)
+    assert compressed['document']['bodyText'] == ' '.join(FILLER[3:4] + ['Set trainable to False to freeze a layer.'] + FILLER[4:5])
+    assert compressed['document']['title'] == 'Freezing'
+
+
+def test_gaps_are_marked_and_empty_comments_dropped(word_encoding):
+    body = ' '.join(['Freeze the base model first.'] + FILLER + ['Then freeze the head.'])
+    comments = ['Nothing relevant here.', 'You can also freeze layers by name.']
+    [compressed], _ = compress_hits([hit(body, comments)], 'freeze', keep_ratio=0.2, neighbours=0)
+    assert compressed['document']['bodyText'] == f"Freeze the base model first. {GAP_MARKER} Then freeze the head."
+    assert compressed['document']['comments'] == ['You can also freeze layers by name.']
+
+
+def test_without_a_match_the_lead_sentence_is_kept(word_encoding):
+    [compressed], _ = compress_hits([hit(' '.join(FILLER))], 'tokenizer exceptions')
+    assert compressed['document']['bodyText'] == FILLER[0]
+
+
+def test_token_accounting(word_encoding):
+    long_body = ' '.join(FILLER + ['Freeze a layer with trainable.'])
+    hits = [
+        # Stored ingest counts are trusted as the original size
+        hit(long_body, token_count=100, title_token_count=1, comments_token_count=0),
+        # Without them the hit is encoded
+        hit(long_body, ['Freeze it.']),
+    ]
+    compressed, stats = compress_hits(hits, 'freeze layer', keep_ratio=0.1, neighbours=0)
+    template = 3  # 'Title:', 'Body:' and 'Comments:' under the word encoding
+    assert stats['original_tokens'] == (100 + 1 + template) + words(hits[1]['document'])
+    assert stats['compressed_tokens'] == sum(words(h['document']) for h in compressed)
+    assert stats['compression_ratio'] == stats['original_tokens'] / stats['compressed_tokens']
+    # pack_context reads the compressed size back from the stored counts
+    for h in compressed:
+        assert stored_token_count(h['document']) == words(h['document'])
+
+
+def test_no_hits(word_encoding):
+    assert compress_hits([], 'anything') == ([], {'original_tokens': 0, 'compressed_tokens': 0, 'compression_ratio': 1.0})
@@ -0,0 +1,53 @@
+import pytest
+
+# tokenization.py imports tiktoken at module level
+pytest.importorskip('tiktoken')
+
+from context_packing import CONTEXT_SEPARATOR, pack_context, render_hit, stored_token_count, template_tokens
+
+
+def hit(title, words, **counts):
+    return {'document': {'title': title, 'bodyText': ' '.join(['word'] * words), 'comments': [], **counts}}
+
+
+def size(h):
+    return len(render_hit(h['document']).split())
+
+
+def test_stored_counts_include_the_template(word_encoding):
+    document = {'token_count': 10, 'title_token_count': 2, 'comments_token_count': 3}
+    assert stored_token_count(document) == 15 + template_tokens()
+    assert stored_token_count({'token_count': 10}) is None
+
+
+def test_stored_counts_are_trusted(word_encoding):
+    h = hit('t', 50, token_count=1, title_token_count=0, comments_token_count=0)
+    packed = pack_context([h], max_tokens=10)
+    assert packed['hits_used'] == 1
+    assert packed['token_count'] == 1 + template_tokens()
+
+
+def test_oversized_hit_is_skipped_not_ending_the_packing(word_encoding):
+    hits = [hit('first', 20), hit('big', 500), hit('last', 20)]
+    budget = size(hits[0]) + size(hits[2]) + len(CONTEXT_SEPARATOR.split()) + 10
+    packed = pack_context(hits, max_tokens=budget)
+    assert packed['text'] == CONTEXT_SEPARATOR.join([render_hit(hits[0]['document']), render_hit(hits[2]['document'])])
+    assert not packed['truncated']
+    assert packed['token_count'] <= budget
+
+
+def test_best_skipped_hit_is_truncated_to_fill_the_budget(word_encoding):
+    hits = [hit('first', 20), hit('big', 500)]
+    budget = 200
+    packed = pack_context(hits, max_tokens=budget)
+    assert packed['truncated']
+    assert packed['hits_used'] == 2
+    assert packed['token_count'] == budget
+    assert len(packed['text'].split()) == budget
+
+
+def test_small_leftover_is_not_truncated(word_encoding):
+    hits = [hit('first', 20), hit('big', 500)]
+    packed = pack_context(hits, max_tokens=size(hits[0]) + 10)
+    assert packed['hits_used'] == 1
+    assert not packed['truncated']
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import github_fetcher
+from github_fetcher import GitHubGraphQLClient, GitHubQueryError, fetch_discussions
+
+
+class StubGraphQLServer:
+    """
+    Local stand-in for the GitHub GraphQL endpoint. Every request pops the next scripted
+    response: `(status, headers, body)`, or `('sleep', seconds, response)` to stall past the timeout.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                stub.requests.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                response = stub.responses.pop(0)
+                if response[0] == 'sleep':
+                    # Not time.sleep, which the tests replace
+                    threading.Event().wait(response[1])
+                    response = response[2]
+                status, headers, body = response
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in {'Content-Type': 'application/json', **headers}.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/graphql"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def discussion(updated_at):
+    return {'title': f"Discussion {updated_at}", 'bodyText': '', 'createdAt': updated_at, 'updatedAt': updated_at,
+            'url': f"https://github.com/o/r/discussions/{updated_at}", 'author': {'login': 'a'}, 'comments': {'edges': []}}
+
+
+def page(updated_ats, end_cursor, has_next_page):
+    return (200, {}, {'data': {
+        'rateLimit': {'cost': 1, 'remaining': 4999, 'resetAt': '2030-01-01T00:00:00Z'},
+        'repository': {'discussions': {
+            'pageInfo': {'endCursor': end_cursor, 'hasNextPage': has_next_page},
+            'edges': [{'node': discussion(updated_at)} for updated_at in updated_ats],
+        }},
+    }})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(github_fetcher.time, 'sleep', delays.append)
+    return delays
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*responses):
+        servers.append(StubGraphQLServer(responses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def make_client(server, **kwargs):
+    return GitHubGraphQLClient('token', url=server.url, backoff_seconds=0.01, **kwargs)
+
+
+def test_retries_server_errors(stub, sleeps):
+    server = stub((502, {}, {}), (503, {}, {}), page(['2024-01-02'], 'c1', False))
+    discussions, cursor = fetch_discussions(make_client(server), 'o', 'r')
+    assert [d['updatedAt'] for d in discussions] == ['2024-01-02']
+    assert cursor == 'c1'
+    assert len(server.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_gives_up_after_max_retries(stub, sleeps):
+    server = stub(*[(502, {}, {})] * 3)
+    with pytest.raises(GitHubQueryError):
+        make_client(server, max_retries=2).execute('query', {})
+    assert len(server.requests) == 3
+
+
+def test_retries_timeouts(stub, sleeps):
+    server = stub(('sleep', 0.5, (200, {}, {})), page(['2024-01-02'], 'c1', False))
+    discussions, _ = fetch_discussions(make_client(server, timeout_seconds=0.1), 'o', 'r')
+    assert len(discussions) == 1
+    assert len(sleeps) == 1
+
+
+def test_retry_after_seconds(stub, sleeps):
+    server = stub((429, {'Retry-After': '7'}, {'message': 'slow down'}), page([], None, False))
+    make_client(server).execute('query', {})
+    assert sleeps == [7.0]
+
+
+def test_retry_after_http_date(stub, sleeps):
+    retry_after = formatdate(time.time() + 30, usegmt=True)
+    server = stub((403, {'Retry-After': retry_after}, {'message': 'secondary limit'}), page([], None, False))
+    make_client(server).execute('query', {})
+    assert len(sleeps) == 1
+    assert 25 <= sleeps[0] <= 31
+
+
+def test_rate_limit_reset_header(stub, sleeps):
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 20)}
+    server = stub((403, headers, {'message': 'API limit exceeded'}), page([], None, False))
+    make_client(server).execute('query', {})
+    assert len(sleeps) == 1
+    assert 18 <= sleeps[0] <= 22
+
+
+def test_paging_stops_at_watermark(stub, sleeps):
+    server = stub(
+        page(['2024-03-05', '2024-03-04'], 'c1', True),
+        page(['2024-03-03', '2024-03-01', '2024-02-28'], 'c2', True),
+        page(['2024-02-01'], 'c3', False),
+    )
+    discussions, cursor = fetch_discussions(make_client(server), 'o', 'r', since='2024-03-01')
+    assert [d['updatedAt'] for d in discussions] == ['2024-03-05', '2024-03-04', '2024-03-03']
+    assert cursor == 'c2'
+    # The third page is never requested and the second one continues from the first cursor
+    assert len(server.requests) == 2
+    assert server.requests[1]['variables']['cursor'] == 'c1'
@@ -0,0 +1,118 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, select
+
+from interaction_logger import WriteBehindLogger
+
+metadata = MetaData()
+events = Table(
+    'events', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('at', DateTime),
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # SQLite reports the missing table as an OperationalError, like an unreachable Postgres
+    return create_engine(f"sqlite:///{tmp_path / 'log.sqlite'}")
+
+
+@pytest.fixture
+def make_logger(tmp_path, engine):
+    loggers = []
+
+    def make(**kwargs):
+        kwargs = {'flush_interval_seconds': 0.02, 'replay_interval_seconds': 0, 'spill_path': str(tmp_path / 'spill.jsonl'),
+                  'dead_letter_path': str(tmp_path / 'dead.jsonl'), **kwargs}
+        loggers.append(WriteBehindLogger(engine, metadata, **kwargs))
+        return loggers[-1]
+
+    yield make
+    for interaction_logger in loggers:
+        interaction_logger.close()
+
+
+def rows(engine):
+    with engine.connect() as connection:
+        return [(row.name, row.at) for row in connection.execute(select(events).order_by(events.c.id))]
+
+
+def lines(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.01)
+
+
+def test_batches_are_written(engine, make_logger):
+    metadata.create_all(engine)
+    interaction_logger = make_logger(batch_size=2)
+    for i in range(5):
+        assert interaction_logger.log('events', {'name': f"e{i}"})
+    assert interaction_logger.flush(timeout=5)
+    assert [name for name, _ in rows(engine)] == [f"e{i}" for i in range(5)]
+    assert interaction_logger.stats()['written'] == 5
+
+
+def test_outage_spills_and_replays_with_timestamps(engine, make_logger, tmp_path):
+    at = datetime(2024, 3, 1, 12, 30)
+    interaction_logger = make_logger(replay_interval_seconds=3600)
+    interaction_logger.log('events', {'name': 'during outage', 'at': at})
+    interaction_logger.flush(timeout=5)
+    # A replay may be re-spilling it right now
+    wait_for(lambda: lines(tmp_path / 'spill.jsonl') == [{'table': 'events', 'record': {'name': 'during outage', 'at': str(at)}}])
+
+    metadata.create_all(engine)
+    interaction_logger.replay_interval_seconds = 0
+    wait_for(lambda: interaction_logger.stats()['replayed'] == 1)
+    assert rows(engine) == [('during outage', at)]
+    assert not (tmp_path / 'spill.jsonl').exists()
+    assert not (tmp_path / 'spill.jsonl.replay').exists()
+
+
+def test_rejected_rows_are_dead_lettered_after_max_attempts(engine, make_logger, tmp_path):
+    metadata.create_all(engine)
+    interaction_logger = make_logger(max_attempts=3)
+    interaction_logger.log('events', {'name': 'good'})
+    interaction_logger.log('events', {'name': None})
+    wait_for(lambda: interaction_logger.stats()['dead_lettered'] == 1)
+    assert [name for name, _ in rows(engine)] == ['good']
+    assert lines(tmp_path / 'dead.jsonl') == [{'table': 'events', 'record': {'name': None}}]
+    assert lines(tmp_path / 'spill.jsonl') == []
+
+
+def test_rejected_batch_creates_partitions(engine, make_logger):
+    metadata.create_all(engine)
+    calls = []
+    interaction_logger = make_logger(ensure_partitions=lambda: calls.append(1) or 0, partition_check_seconds=3600,
+                                    replay_interval_seconds=3600)
+    interaction_logger.log('events', {'name': 'good'})
+    interaction_logger.flush(timeout=5)
+    assert calls == []
+    interaction_logger.log('events', {'name': None})
+    interaction_logger.flush(timeout=5)
+    assert calls == [1]
+
+
+def test_closed_logger_spills(make_logger, tmp_path):
+    interaction_logger = make_logger()
+    interaction_logger.close()
+    assert not interaction_logger.log('events', {'name': 'late'})
+    assert lines(tmp_path / 'spill.jsonl') == [{'table': 'events', 'record': {'name': 'late'}}]
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+# db.py builds its Postgres engine on import
+pytest.importorskip('psycopg2')
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db import LLMCacheEntry
+from hashing import hashing_embedding
+from llm_cache import LLMCache
+
+PARAMS = {'model': 'gpt-4o-mini', 'temperature': 0}
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return f"answer {len(self.prompts)}"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    LLMCacheEntry.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def ask(cache, llm, prompt, context='context', params=PARAMS):
+    return cache.get_or_invoke('answer', prompt, params, lambda: llm.invoke(prompt), context)
+
+
+def test_exact_hit_ignores_case_and_whitespace(session_factory):
+    cache, llm = LLMCache(session_factory, enabled=True), FakeLLM()
+    assert ask(cache, llm, 'How do I freeze a layer?') == ('answer 1', None)
+    assert ask(cache, llm, '  how do I   FREEZE a layer? ') == ('answer 1', 'exact')
+    assert len(llm.prompts) == 1
+    session = session_factory()
+    assert session.query(LLMCacheEntry).one().hit_count == 1
+
+
+def test_semantic_hit_for_paraphrase(session_factory):
+    cache, llm = LLMCache(session_factory, embed=hashing_embedding, enabled=True, similarity_threshold=0.6), FakeLLM()
+    ask(cache, llm, 'how do I freeze a layer in keras')
+    assert ask(cache, llm, 'how do I freeze a layer in keras please') == ('answer 1', 'semantic')
+    assert ask(cache, llm, 'what license does spacy use') == ('answer 2', None)
+
+
+@pytest.mark.parametrize('embed', [None, hashing_embedding])
+def test_negated_paraphrase_misses(session_factory, embed):
+    cache, llm = LLMCache(session_factory, embed=embed, enabled=True), FakeLLM()
+    ask(cache, llm, 'how do I freeze a layer')
+    assert ask(cache, llm, 'how do I unfreeze a layer') == ('answer 2', None)
+
+
+def test_rewrites_only_match_exactly(session_factory):
+    cache, llm = LLMCache(session_factory, embed=hashing_embedding, enabled=True, similarity_threshold=0.5), FakeLLM()
+
+    def rewrite(prompt):
+        return cache.get_or_invoke('rewrite', prompt, PARAMS, lambda: llm.invoke(prompt))
+
+    rewrite('how do I freeze a layer')
+    assert rewrite('how do I freeze a layer please') == ('answer 2', None)
+    assert rewrite('how do I freeze a layer') == ('answer 1', 'exact')
+    assert all(entry.embedding is None for entry in session_factory().query(LLMCacheEntry))
+
+
+def test_semantic_tier_skips_other_dimensions(session_factory):
+    cache, llm = LLMCache(session_factory, embed=hashing_embedding, enabled=True, similarity_threshold=0.5), FakeLLM()
+    ask(cache, llm, 'how do I freeze a layer')
+    cache.embed = lambda text: hashing_embedding(text, dimensions=256)
+    assert ask(cache, llm, 'how do I freeze a layer please') == ('answer 2', None)
+
+
+def test_changed_context_or_params_invalidate(session_factory):
+    cache, llm = LLMCache(session_factory, enabled=True), FakeLLM()
+    ask(cache, llm, 'question')
+    assert ask(cache, llm, 'question', context='new context') == ('answer 2', None)
+    assert ask(cache, llm, 'question', params={**PARAMS, 'model': 'gpt-4o'}) == ('answer 3', None)
+    assert ask(cache, llm, 'question') == ('answer 1', 'exact')
+
+
+def test_nondeterministic_calls_are_not_cached(session_factory):
+    cache, llm = LLMCache(session_factory, enabled=True), FakeLLM()
+    params = {**PARAMS, 'temperature': 0.7}
+    ask(cache, llm, 'question', params=params)
+    assert ask(cache, llm, 'question', params=params) == ('answer 2', None)
+
+
+def expire_all(session_factory, seconds):
+    session = session_factory()
+    session.query(LLMCacheEntry).update({'created_at': datetime.utcnow() - timedelta(seconds=seconds)})
+    session.commit()
+    session.close()
+
+
+def test_expired_entries_miss_both_tiers(session_factory):
+    cache, llm = LLMCache(session_factory, embed=hashing_embedding, enabled=True, ttl_seconds=60,
+                          similarity_threshold=0.5), FakeLLM()
+    ask(cache, llm, 'how do I freeze a layer')
+    assert ask(cache, llm, 'how do I freeze a layer please') == ('answer 1', 'semantic')
+    expire_all(session_factory, 120)
+    assert ask(cache, llm, 'how do I freeze a layer please') == ('answer 2', None)
+
+
+def test_expired_entry_is_replaced(session_factory):
+    cache, llm = LLMCache(session_factory, enabled=True, ttl_seconds=60, similarity_threshold=1), FakeLLM()
+    ask(cache, llm, 'question')
+    expire_all(session_factory, 30)
+    assert ask(cache, llm, 'question') == ('answer 1', 'exact')
+    expire_all(session_factory, 120)
+    assert ask(cache, llm, 'question') == ('answer 2', None)
+    assert ask(cache, llm, 'question') == ('answer 2', 'exact')
+    assert session_factory().query(LLMCacheEntry).count() == 1
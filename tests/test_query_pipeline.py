@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from query_pipeline import reciprocal_rank_fusion, speculative_retrieval
+
+
+def results(*ids):
+    return {'hits': [{'document': {'id': document_id}, 'text_match': 100 - rank} for rank, document_id in enumerate(ids)]}
+
+
+def ids(result_set):
+    return [hit['document']['id'] for hit in result_set['hits']]
+
+
+def test_rrf_rewards_hits_found_by_both_queries():
+    fused = reciprocal_rank_fusion([results('a', 'b', 'c'), results('c', 'd')], k=60)
+    assert ids(fused) == ['c', 'a', 'b', 'd']
+    assert fused['found'] == 4
+    assert fused['hits'][0]['rrf_score'] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused['hits'][1]['rrf_score'] == pytest.approx(1 / 61)
+
+
+def test_rrf_limit_and_ties_keep_first_seen_order():
+    fused = reciprocal_rank_fusion([results('a', 'b'), results('b', 'a'), results('x')], limit=2)
+    assert ids(fused) == ['a', 'b']
+    assert fused['hits'][0]['rrf_score'] == fused['hits'][1]['rrf_score']
+
+
+def test_rrf_does_not_mutate_the_input_hits():
+    original = results('a')
+    reciprocal_rank_fusion([original])
+    assert 'rrf_score' not in original['hits'][0]
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def search(query):
+    return results(*(f"{query}-{i}" for i in range(2)))
+
+
+def test_speculative_retrieval_fuses_original_and_rewrite(executor):
+    outcome = speculative_retrieval('q', lambda query: 'rewritten', search, executor, deadline_seconds=5)
+    assert outcome['strategy'] == 'fusion'
+    assert outcome['rewritten_query'] == 'rewritten'
+    # Fused down to the size of one result set; on ties the rewritten results come first
+    assert ids(outcome['results']) == ['rewritten-0', 'q-0']
+
+
+def test_slow_rewrite_falls_back_to_the_original_results(executor):
+    def slow_rewrite(query):
+        time.sleep(0.5)
+        return 'rewritten'
+
+    outcome = speculative_retrieval('q', slow_rewrite, search, executor, deadline_seconds=0.05)
+    assert outcome['strategy'] == 'original'
+    assert outcome['rewritten_query'] is None
+    assert ids(outcome['results']) == ['q-0', 'q-1']
+
+
+def test_failed_rewrite_falls_back_to_the_original_results(executor):
+    def failing_rewrite(query):
+        raise RuntimeError('LLM down')
+
+    outcome = speculative_retrieval('q', failing_rewrite, search, executor, deadline_seconds=5)
+    assert outcome['strategy'] == 'original'
+    assert ids(outcome['results']) == ['q-0', 'q-1']
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from rerank import GAP_MARKER, collapse_hits, merge_overlapping, mmr_rerank, rerank_hits
+
+
+def chunk(discussion_id, index, body, score=0, **extra):
+    return {'document': {'id': f"{discussion_id}-{index}", 'discussion_id': discussion_id, 'chunk_index': index,
+                         'title': discussion_id, 'bodyText': body, 'token_count': len(body.split())},
+            'text_match': score, **extra}
+
+
+def test_merge_overlapping_drops_repeated_sentences():
+    assert merge_overlapping('One. Two. Three.', 'Three. Four.') == 'One. Two. Three. Four.'
+    assert merge_overlapping('One. Two.', 'Three.') == 'One. Two. Three.'
+    # A repeat inside a sentence is not an overlap
+    assert merge_overlapping('One two.', 'two. Three.') == 'One two. two. Three.'
+
+
+def test_collapse_merges_chunks_of_a_discussion_in_order():
+    hits = [chunk('a', 2, 'C. D.', 9), chunk('b', 0, 'X.', 8), chunk('a', 0, 'A.', 7), chunk('a', 1, 'B. C.', 6)]
+    collapsed = collapse_hits(hits)
+    assert [hit['document']['discussion_id'] for hit in collapsed] == ['a', 'b']
+    merged = collapsed[0]['document']
+    assert merged['bodyText'] == 'A. B. C. D.'
+    assert merged['merged_chunks'] == [0, 1, 2]
+    assert 'token_count' not in merged
+    assert collapsed[0]['text_match'] == 9
+    assert collapsed[1]['document']['token_count'] == 1
+
+
+def test_collapse_marks_gaps_between_chunks():
+    collapsed = collapse_hits([chunk('a', 0, 'A.'), chunk('a', 3, 'D.')])
+    assert collapsed[0]['document']['bodyText'] == f"A.{GAP_MARKER}D."
+
+
+def test_mmr_pushes_near_duplicates_down():
+    keras = 'how to freeze layers of a keras model during fine tuning'
+    hits = [chunk('a', 0, keras, 100), chunk('b', 0, keras + ' again', 99),
+            chunk('c', 0, 'spacy tokenizer exceptions for german text', 95)]
+    ranked = [hit['document']['discussion_id'] for hit in mmr_rerank(hits, mmr_lambda=0.5)]
+    assert ranked == ['a', 'c', 'b']
+    # Pure relevance keeps the retrieval order
+    assert [hit['document']['discussion_id'] for hit in mmr_rerank(hits, mmr_lambda=1.0)] == ['a', 'b', 'c']
+
+
+def test_mmr_uses_rrf_score_of_fused_hits():
+    hits = [chunk('a', 0, 'alpha beta gamma', 1, rrf_score=0.01), chunk('b', 0, 'delta epsilon zeta', 500, rrf_score=0.02),
+            chunk('c', 0, 'eta theta iota', 2, rrf_score=0.03)]
+    ranked = [hit['document']['discussion_id'] for hit in mmr_rerank(hits, mmr_lambda=1.0)]
+    assert ranked == ['c', 'b', 'a']
+
+
+def test_rerank_hits_returns_one_hit_per_discussion():
+    hits = [chunk('a', 0, 'A.', 3), chunk('a', 1, 'B.', 2), chunk('b', 0, 'X.', 1), chunk('c', 0, 'Y.', 0)]
+    assert sorted(hit['document']['discussion_id'] for hit in rerank_hits(hits)) == ['a', 'b', 'c']
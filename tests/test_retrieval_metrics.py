@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from retrieval_metrics import relevance_matrix, score_rankings, summarize
+
+RANKINGS = [
+    ['a', 'b', 'c', 'd'],
+    ['x', 'y'],
+    ['p', 'q', 'r'],
+    [],
+    ['m', 'n'],
+]
+RELEVANT = [
+    {'b', 'd', 'z'},
+    {'x', 'y'},
+    {'s'},
+    {'a'},
+    set(),
+]
+
+
+def reference(ranking, relevant, k):
+    """The metrics of one query, computed directly."""
+    top = ranking[:k]
+    hits = [document_id in relevant for document_id in top]
+    tp = sum(hits)
+    precision = tp / len(top) if top else 0.0
+    recall = tp / len(relevant) if relevant else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    rr = next((1 / (i + 1) for i, hit in enumerate(hits) if hit), 0.0)
+    dcg = sum(1 / math.log2(i + 2) for i, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'reciprocal_rank': rr, 'ndcg': dcg / ideal if ideal else 0.0}
+
+
+def test_relevance_matrix_pads_and_truncates():
+    matrix = relevance_matrix(RANKINGS[:2], RELEVANT[:2], k=3)
+    assert matrix.tolist() == [[False, True, False], [True, True, False]]
+
+
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_scores_match_the_definitions(k):
+    scores = score_rankings(RANKINGS, RELEVANT, k=k)
+    for q, (ranking, relevant) in enumerate(zip(RANKINGS, RELEVANT)):
+        expected = reference(ranking, relevant, k)
+        for name, value in expected.items():
+            assert scores[name][q] == pytest.approx(value), (name, q)
+
+
+def test_known_values():
+    scores = score_rankings(RANKINGS[:1], RELEVANT[:1], k=4)
+    assert scores['precision'][0] == 0.5
+    assert scores['recall'][0] == pytest.approx(2 / 3)
+    assert scores['reciprocal_rank'][0] == 0.5
+    assert scores['ndcg'][0] == pytest.approx((1 / math.log2(3) + 1 / math.log2(5)) / (1 + 1 / math.log2(3) + 1 / math.log2(4)))
+
+
+def test_summarize():
+    scores = score_rankings(RANKINGS[1:3], RELEVANT[1:3], k=2)
+    summary = summarize(scores, [10, 20, 30, 40])
+    assert summary['precision'] == 0.5
+    assert summary['mrr'] == 0.5
+    assert 'reciprocal_rank' not in summary
+    assert summary['latency_p50_ms'] == 25
+    assert summary['latency_mean_ms'] == 25
+    assert 'latency_p50_ms' not in summarize(scores, [])
+
+
+def test_no_queries():
+    scores = score_rankings([], [], k=5)
+    assert all(len(values) == 0 for values in scores.values())
+    assert summarize(scores, [])['mrr'] == 0.0
@@ -0,0 +1,87 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from bm25_index import BM25Index
+from retrievers import BM25Retriever, filter_mask
+
+DOCUMENTS = [
+    {'id': 'a', 'repository': 'keras', 'title': 'Freeze layers', 'bodyText': 'freeze a layer with trainable', 'created_at': 300,
+     'tags': ['layers', 'training']},
+    {'id': 'b', 'repository': 'spacy', 'title': 'License', 'bodyText': 'spacy is MIT licensed', 'created_at': 100,
+     'tags': ['license']},
+    {'id': 'c', 'repository': 'keras', 'title': 'Custom layer', 'bodyText': 'subclass layer to write a layer', 'created_at': 200,
+     'tags': ['layers']},
+    {'id': 'd', 'repository': 'crewAI', 'title': 'Agents', 'bodyText': 'agents call tools', 'created_at': None, 'tags': []},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return BM25Index.build(DOCUMENTS, str(tmp_path / 'chunks'))
+
+
+@pytest.fixture
+def retriever(index):
+    return BM25Retriever({'chunks': index})
+
+
+def ids(result):
+    return [hit['document']['id'] for hit in result['hits']]
+
+
+@pytest.mark.parametrize('filter_by, expected', [
+    ('repository:=keras', ['a', 'c']),
+    ('repository:[keras,`spacy`]', ['a', 'b', 'c']),
+    ('repository:!=keras', ['b', 'd']),
+    ('created_at:>=200', ['a', 'c']),
+    ('created_at:<200', ['b']),
+    ('created_at:[150..250]', ['c']),
+    ('tags:=layers && created_at:>250', ['a']),
+])
+def test_filter_mask(index, filter_by, expected):
+    assert [DOCUMENTS[number]['id'] for number in np.flatnonzero(filter_mask(index, filter_by))] == expected
+
+
+def test_unsupported_filter_raises(index):
+    with pytest.raises(ValueError):
+        filter_mask(index, 'repository keras')
+
+
+def test_search_ranks_filters_and_pages(retriever):
+    result = retriever.search('chunks', {'q': 'layer', 'per_page': 1})
+    assert ids(result) == ['c']
+    assert result['found'] == 2
+    assert ids(retriever.search('chunks', {'q': 'layer', 'filter_by': 'repository:=spacy'})) == []
+
+
+def test_wildcard_sort_puts_missing_values_last(retriever):
+    result = retriever.search('chunks', {'q': '*', 'sort_by': 'created_at:desc', 'per_page': 10})
+    assert ids(result) == ['a', 'c', 'b', 'd']
+    result = retriever.search('chunks', {'q': '*', 'sort_by': 'created_at:asc'})
+    assert ids(result) == ['b', 'c', 'a', 'd']
+
+
+def test_text_match_buckets_then_recency(retriever):
+    # One bucket over both matches: recency alone decides
+    result = retriever.search('chunks', {'q': 'layer', 'sort_by': '_text_match(buckets: 1):desc,created_at:desc'})
+    assert ids(result) == ['a', 'c']
+
+
+def test_facets_and_excluded_fields(retriever):
+    result = retriever.search('chunks', {'q': '*', 'facet_by': 'repository,tags', 'per_page': 1, 'exclude_fields': 'bodyText,tags'})
+    assert result['facet_counts'][0] == {'field_name': 'repository', 'counts': [
+        {'value': 'keras', 'count': 2}, {'value': 'crewAI', 'count': 1}, {'value': 'spacy', 'count': 1}]}
+    assert result['facet_counts'][1]['counts'][0] == {'value': 'layers', 'count': 2}
+    assert set(result['hits'][0]['document']) == {'id', 'repository', 'title', 'created_at'}
+
+
+def test_multi_search_isolates_failures(retriever):
+    results = retriever.multi_search([
+        {'collection': 'chunks', 'q': 'spacy'},
+        {'collection': 'missing', 'q': 'spacy'},
+        {'collection': 'chunks', 'q': 'spacy', 'filter_by': 'not a filter'},
+    ])
+    assert ids(results[0]) == ['b']
+    assert results[1]['code'] == 400
+    assert results[2]['code'] == 400
@@ -0,0 +1,115 @@
+import pytest
+
+import search_cache
+from search_cache import LRUCache, SearchCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache.time, 'monotonic', clock)
+    return clock
+
+
+class Versions:
+    def __init__(self):
+        self.versions = {}
+
+    def current(self, collection_name):
+        return self.versions.get(collection_name, 0)
+
+
+class DictCache:
+    """Stand-in for the shared Redis backend."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class Search:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'hits': [{'document': {'id': str(self.calls)}}]}
+
+
+def test_lru_entries_expire(clock):
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    cache.set('a', '1')
+    clock.now += 59
+    assert cache.get('a') == '1'
+    clock.now += 2
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.get('a')
+    cache.set('c', '3')
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('1', None, '3')
+
+
+def test_hits_ignore_query_case_and_spacing(clock):
+    cache, search = SearchCache(Versions()), Search()
+    first = cache.get_or_compute('search', {'q': 'Freeze  Layer', 'per_page': 5}, ['chunks'], search)
+    assert cache.get_or_compute('search', {'q': ' freeze layer', 'per_page': 5}, ['chunks'], search) == first
+    cache.get_or_compute('search', {'q': 'freeze layer', 'per_page': 10}, ['chunks'], search)
+    assert search.calls == 2
+    assert cache.stats() == {'hits': 1, 'shared_hits': 0, 'misses': 2, 'hit_rate': 1 / 3, 'entries': 2}
+
+
+def test_version_bump_invalidates(clock):
+    versions, search = Versions(), Search()
+    cache = SearchCache(versions)
+    params = {'searches': [{'q': 'freeze'}]}
+    cache.get_or_compute('multi', params, ['chunks', 'threads'], search)
+    versions.versions['threads'] = 2
+    assert cache.get_or_compute('multi', params, ['chunks', 'threads'], search)['hits'][0]['document']['id'] == '2'
+    # Collections that were not bumped keep their entries
+    cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    versions.versions['threads'] = 3
+    cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    assert search.calls == 3
+
+
+def test_ttl_expiry_recomputes(clock):
+    cache, search = SearchCache(Versions(), local=LRUCache(ttl_seconds=30)), Search()
+    cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    clock.now += 31
+    cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    assert search.calls == 2
+
+
+def test_hits_are_fresh_copies(clock):
+    cache, search = SearchCache(Versions()), Search()
+    cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)['hits'].clear()
+    assert len(cache.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)['hits']) == 1
+
+
+def test_shared_hits_fill_the_local_cache(clock):
+    shared, search = DictCache(), Search()
+    SearchCache(Versions(), shared=shared).get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    other_worker = SearchCache(Versions(), shared=shared)
+    other_worker.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    other_worker.get_or_compute('search', {'q': 'freeze'}, ['chunks'], search)
+    assert search.calls == 1
+    assert (other_worker.shared_hits, other_worker.hits) == (1, 1)
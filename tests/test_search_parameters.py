@@ -0,0 +1,46 @@
+import pytest
+
+from search_parameters import RECENCY_SORT_BY, build_filter_by, build_search_parameters
+
+
+def test_no_restriction_is_none():
+    assert build_filter_by() is None
+    assert build_filter_by(repositories=[]) is None
+
+
+def test_repositories_are_backtick_quoted():
+    assert build_filter_by(['keras-team/keras', 'explosion/spacy']) == 'repository:=[`keras-team/keras`,`explosion/spacy`]'
+
+
+def test_date_range_is_inclusive_and_integer():
+    assert build_filter_by(created_from=1700000000.9) == 'created_at:>=1700000000'
+    assert build_filter_by(created_to=0) == 'created_at:<=0'
+    assert build_filter_by(['o/r'], 10, 20) == 'repository:=[`o/r`] && created_at:>=10 && created_at:<=20'
+
+
+def test_filters_are_understood_by_the_bm25_backend(tmp_path):
+    np = pytest.importorskip('numpy')
+    from bm25_index import BM25Index
+    from retrievers import filter_mask
+
+    index = BM25Index.build([
+        {'id': '1', 'repository': 'keras-team/keras', 'created_at': 10},
+        {'id': '2', 'repository': 'explosion/spacy', 'created_at': 20},
+        {'id': '3', 'repository': 'keras-team/keras', 'created_at': 30},
+    ], str(tmp_path / 'chunks'))
+    mask = filter_mask(index, build_filter_by(['keras-team/keras'], created_from=5, created_to=20))
+    assert list(np.flatnonzero(mask)) == [0]
+
+
+def test_search_parameters():
+    params = build_search_parameters('freeze layer', k=5, num_typos=1)
+    assert params == {'q': 'freeze layer', 'query_by': 'title,bodyText', 'exclude_fields': 'content_hash,embedding',
+                      'num_typos': 1, 'per_page': 5}
+
+
+def test_filter_recency_and_vector():
+    params = build_search_parameters('q', k=3, query_vector=[0.5, -0.25, 1e-7], alpha=0.4, filter_by='created_at:>=1',
+                                     recency=True)
+    assert params['filter_by'] == 'created_at:>=1'
+    assert params['sort_by'] == RECENCY_SORT_BY
+    assert params['vector_query'] == 'embedding:([0.5,-0.25,1e-07], k:3, alpha:0.4)'
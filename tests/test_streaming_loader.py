@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+pytest.importorskip('typesense')
+
+from streaming_loader import LoadCheckpoint, detect_format, iter_json_array, iter_jsonl, iter_records, load_file
+
+RECORDS = [{'id': 1, 'text': 'plain'}, {'id': 2, 'text': 'ünïcödé ✓'}, [1, 2.5, None], 'str', 12345, True,
+           {'nested': {'list': [{'a': 'b'}], 'bracket': '] , ['}}]
+
+
+@pytest.fixture
+def array_file(tmp_path):
+    path = tmp_path / 'records.json'
+    path.write_text(' \n[\n' + ',\n  '.join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + '\n]\n',
+                    encoding='utf-8')
+    return str(path)
+
+
+def test_detect_format(tmp_path, array_file):
+    jsonl = tmp_path / 'records.jsonl'
+    jsonl.write_text('{"id": 1}\n')
+    assert detect_format(array_file) == 'array'
+    assert detect_format(str(jsonl)) == 'jsonl'
+
+
+@pytest.mark.parametrize('read_size', [1, 3, 7, 1 << 20])
+def test_array_elements_across_read_boundaries(array_file, read_size):
+    assert [record for record, _ in iter_json_array(array_file, read_size=read_size)] == RECORDS
+
+
+def test_array_resumes_from_any_yielded_offset(array_file):
+    offsets = [offset for _, offset in iter_json_array(array_file)]
+    for i, offset in enumerate(offsets):
+        assert [record for record, _ in iter_json_array(array_file, offset, read_size=5)] == RECORDS[i + 1:]
+
+
+def test_truncated_array_raises(tmp_path):
+    path = tmp_path / 'truncated.json'
+    path.write_text('[{"id": 1}, {"id": 2')
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), read_size=4))
+
+
+def test_jsonl_offsets_resume(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in RECORDS[:3]) + '\n')
+    pairs = list(iter_records(str(path)))
+    assert [record for record, _ in pairs] == RECORDS[:3]
+    assert [record for record, _ in iter_jsonl(str(path), pairs[0][1])] == RECORDS[1:3]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = LoadCheckpoint(str(tmp_path / 'checkpoint.json'))
+    assert checkpoint.read() is None
+    checkpoint.write({'offset': 10})
+    assert checkpoint.read() == {'offset': 10}
+    checkpoint.clear()
+    assert checkpoint.read() is None
+    (tmp_path / 'checkpoint.json').write_text('{not json')
+    assert checkpoint.read() is None
+
+
+class FakeDocuments:
+    def __init__(self, store, failing_ids):
+        self.store = store
+        self.failing_ids = failing_ids
+
+    def import_(self, documents, params=None):
+        results = []
+        for document in documents:
+            if document['id'] in self.failing_ids:
+                results.append({'success': False, 'error': 'rejected', 'code': 400})
+            else:
+                self.store[document['id']] = document
+                results.append({'success': True})
+        return results
+
+
+class FakeClient:
+    def __init__(self, failing_ids=()):
+        self.store = {}
+        self.failing_ids = set(failing_ids)
+        self.collections = self
+
+    def __getitem__(self, name):
+        return type('Collection', (), {'documents': FakeDocuments(self.store, self.failing_ids)})()
+
+
+def test_load_file_resumes_after_a_failed_batch(tmp_path):
+    path = tmp_path / 'docs.jsonl'
+    path.write_text(''.join(json.dumps({'id': str(i)}) + '\n' for i in range(10)))
+    checkpoint = LoadCheckpoint(str(tmp_path / 'checkpoint.json'))
+
+    client = FakeClient(failing_ids={'5'})
+    stats = load_file(client, 'docs', str(path), lambda record: record, checkpoint, batch_size=2, workers=1)
+    assert stats['failed'] == 1
+    # The checkpoint stops before the batch holding the failed document
+    assert checkpoint.read()['records'] == 4
+
+    client.failing_ids.clear()
+    stats = load_file(client, 'docs', str(path), lambda record: record, checkpoint, batch_size=2, workers=1)
+    assert stats['failed'] == 0
+    assert stats['indexed'] == 6
+    assert stats['records'] == 10
+    assert sorted(client.store, key=int) == [str(i) for i in range(10)]
+    assert checkpoint.read() is None
+
+
+def test_load_file_skips_unmapped_records(tmp_path, array_file):
+    client = FakeClient()
+    stats = load_file(client, 'docs', array_file, lambda record: record if isinstance(record, dict) and 'id' in record else None,
+                      batch_size=1, workers=2)
+    assert stats['indexed'] == 2
+    assert stats['skipped'] == len(RECORDS) - 2
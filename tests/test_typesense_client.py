@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip('typesense')
+
+from typesense.documents import Documents
+
+from typesense_client import build_typesense_client, parse_node
+
+
+@pytest.fixture
+def api_call():
+    client = build_typesense_client(
+        nodes=[parse_node('node-a:8108'), parse_node('node-b:8108')], nearest_node='http://local:8108',
+        healthcheck_interval_seconds=0, api_key='test'
+    )
+    yield client.api_call
+    client.close()
+
+
+def test_timeout_per_endpoint(api_call):
+    documents = Documents(api_call, 'chunks')
+    # delete by filter uses the path the client builds, with its trailing slash
+    assert documents._endpoint_path().endswith('/documents/')
+    assert api_call._timeout('DELETE', documents._endpoint_path()) == api_call.bulk_timeout
+    assert api_call._timeout('POST', documents._endpoint_path('import')) == api_call.bulk_timeout
+    assert api_call._timeout('GET', documents._endpoint_path('export')) == api_call.bulk_timeout
+    assert api_call._timeout('GET', documents._endpoint_path('search')) == api_call.search_timeout
+    assert api_call._timeout('POST', '/multi_search') == api_call.search_timeout
+    assert api_call._timeout('GET', '/collections/chunks') == api_call.config.connection_timeout_seconds
+
+
+def test_reads_rotate_over_all_nodes_and_writes_prefer_nearest(api_call):
+    reads = [api_call.get_node(read=True).host for _ in range(6)]
+    assert sorted(set(reads)) == ['local', 'node-a', 'node-b']
+    assert reads[:3] == reads[3:]
+    assert {api_call.get_node().host for _ in range(4)} == {'local'}
+
+
+def test_read_and_write_cursors_are_independent(api_call):
+    api_call.set_node_healthcheck(api_call.config.nearest_node, False)
+    api_call.config.nearest_node.last_access_ts = float('inf')
+    writes = []
+    for _ in range(4):
+        api_call.get_node(read=True)
+        writes.append(api_call.get_node().host)
+    # interleaved reads do not skew the rotation of writes over the two remaining nodes
+    assert writes == ['node-b', 'node-a', 'node-b', 'node-a']
+
+
+def test_unhealthy_nodes_are_skipped(api_call):
+    node_a = api_call.nodes[0]
+    api_call.set_node_healthcheck(node_a, False)
+    node_a.last_access_ts = float('inf')
+    assert 'node-a' not in {api_call.get_node(read=True).host for _ in range(6)}
+
+
+def test_close_stops_health_checks():
+    client = build_typesense_client(nodes=[parse_node('127.0.0.1:9')], healthcheck_interval_seconds=0.01,
+                                    connection_timeout_seconds=0.1, api_key='test')
+    thread = client.api_call.health_thread
+    assert thread.is_alive()
+    client.close()
+    assert not thread.is_alive()
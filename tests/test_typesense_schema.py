@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from typesense_schema import ensure_schema_fields
+
+
+class FakeCollection:
+    def __init__(self, fields):
+        self.fields = fields
+        self.updates = []
+
+    def retrieve(self):
+        return {'fields': [{'name': 'id', 'type': 'string'}] + self.fields}
+
+    def update(self, schema):
+        self.updates.append(schema)
+
+
+class FakeClient:
+    def __init__(self, fields):
+        self.collection = FakeCollection(fields)
+        self.collections = {'discussions': self.collection}
+
+
+LAYOUT = [
+    {'name': 'repository', 'type': 'string', 'facet': True},
+    {'name': 'title', 'type': 'string'},
+    {'name': 'created_at', 'type': 'int64', 'sort': True, 'optional': True},
+]
+
+
+def test_adds_missing_fields_only():
+    client = FakeClient([{'name': 'repository', 'type': 'string', 'facet': True}, {'name': 'title', 'type': 'string'}])
+    assert ensure_schema_fields(client, 'discussions', LAYOUT) == (['created_at'], [])
+    assert client.collection.updates == [{'fields': [LAYOUT[2]]}]
+
+
+def test_changed_and_extra_fields_are_reported_not_dropped(caplog):
+    client = FakeClient([
+        {'name': 'repository', 'type': 'string', 'facet': False},
+        {'name': 'title', 'type': 'string'},
+        {'name': 'created_at', 'type': 'int64', 'sort': True, 'optional': True},
+        {'name': 'legacy', 'type': 'string'},
+    ])
+    with caplog.at_level(logging.WARNING, logger='typesense_schema'):
+        assert ensure_schema_fields(client, 'discussions', LAYOUT) == ([], ['legacy', 'repository'])
+    assert client.collection.updates == []
+    assert '--reindex' in caplog.text
@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = ENCODING_NAME):
+    """Process-wide encoder; loading the BPE ranks is far more expensive than encoding."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str, encoding_name: str = ENCODING_NAME) -> int:
+    return len(get_encoding(encoding_name).encode(text))
@@ -0,0 +1,106 @@
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+
+# Span attributes stored in their own columns; anything else goes to the `attributes` JSON column.
+STAGE_COLUMNS = ('prompt_tokens', 'completion_tokens', 'hit_count', 'cache_hit')
+REQUEST_COLUMNS = ('approach', 'strategy', 'hit_count', 'hits_used', 'context_tokens',
+                   'compression_ratio', 'precision', 'recall', 'f1_score')
+
+
+class Trace:
+    """
+    Timings of one request. Stages are recorded with `span()`, which yields a dict the
+    stage can fill with attributes (token counts, hit counts, cache hits); request-level
+    attributes are set with `set()`. `finish()` hands one `rag_request_metrics` row and
+    one `rag_stage_metrics` row per span to the sink, e.g. the write-behind logger.
+    Spans may be recorded from several threads.
+    """
+
+    enabled = True
+
+    def __init__(self, sink, operation, request_id=None):
+        self.sink = sink
+        self.operation = operation
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.attributes = {}
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        started = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes['error'] = type(e).__name__
+            raise
+        finally:
+            # list.append is atomic, so concurrent stages need no lock
+            self.spans.append((stage, started - self.started, time.perf_counter() - started, attributes))
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        duration = time.perf_counter() - self.started
+        for stage, offset, stage_duration, attributes in self.spans:
+            self.sink.log('rag_stage_metrics', {
+                'request_id': self.request_id,
+                'operation': self.operation,
+                'stage': stage,
+                'timestamp': self.started_at + timedelta(seconds=offset),
+                'duration_ms': stage_duration * 1000,
+                **{column: attributes.get(column) for column in STAGE_COLUMNS},
+                'attributes': {key: value for key, value in attributes.items() if key not in STAGE_COLUMNS} or None,
+            })
+
+        span_attributes = [attributes for _, _, _, attributes in self.spans]
+        self.sink.log('rag_request_metrics', {
+            'request_id': self.request_id,
+            'operation': self.operation,
+            'timestamp': self.started_at,
+            'duration_ms': duration * 1000,
+            'prompt_tokens': sum(attributes.get('prompt_tokens') or 0 for attributes in span_attributes),
+            'completion_tokens': sum(attributes.get('completion_tokens') or 0 for attributes in span_attributes),
+            'cache_hits': sum(1 for attributes in span_attributes if attributes.get('cache_hit')),
+            **{column: self.attributes.get(column) for column in REQUEST_COLUMNS},
+        })
+
+
+class _NullTrace:
+    """Stand-in used when tracing is off or the request is not sampled; records nothing."""
+
+    enabled = False
+    request_id = None
+
+    def span(self, stage, **attributes):
+        return nullcontext(attributes)
+
+    def set(self, **attributes):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Tracer:
+    def __init__(self, sink, enabled=TRACING_ENABLED, sample_rate=TRACING_SAMPLE_RATE):
+        self.sink = sink
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+
+    def start(self, operation, request_id=None):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NULL_TRACE
+        return Trace(self.sink, operation, request_id)
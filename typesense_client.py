@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+import typesense
+from requests.adapters import HTTPAdapter
+from typesense.api_call import ApiCall
+from typesense.exceptions import HTTPStatus0Error, ServerError, ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated `host:port` or `protocol://host:port` entries; defaults to TYPESENSE_HOST:TYPESENSE_PORT.
+TYPESENSE_NODES = os.getenv('TYPESENSE_NODES', '')
+TYPESENSE_HOST = os.getenv('TYPESENSE_HOST', 'localhost')
+TYPESENSE_PORT = os.getenv('TYPESENSE_PORT', '8108')
+TYPESENSE_PROTOCOL = os.getenv('TYPESENSE_PROTOCOL', 'http')
+# Preferred node, e.g. the replica on the same host; writes go there first.
+TYPESENSE_NEAREST_NODE = os.getenv('TYPESENSE_NEAREST_NODE', '')
+TYPESENSE_API_KEY = os.getenv('TYPESENSE_API_KEY', 'xyz')
+
+TYPESENSE_CONNECTION_TIMEOUT_SECONDS = float(os.getenv('TYPESENSE_CONNECTION_TIMEOUT_SECONDS', '2'))
+TYPESENSE_SEARCH_TIMEOUT_SECONDS = float(os.getenv('TYPESENSE_SEARCH_TIMEOUT_SECONDS', '2'))
+# Imports, exports and deletes by filter work on many documents at once.
+TYPESENSE_BULK_TIMEOUT_SECONDS = float(os.getenv('TYPESENSE_BULK_TIMEOUT_SECONDS', '60'))
+TYPESENSE_NUM_RETRIES = int(os.getenv('TYPESENSE_NUM_RETRIES', '3'))
+TYPESENSE_RETRY_INTERVAL_SECONDS = float(os.getenv('TYPESENSE_RETRY_INTERVAL_SECONDS', '0.1'))
+# Retries allowed per successful request, across all calls, so an outage does not multiply the load.
+TYPESENSE_RETRY_BUDGET_RATIO = float(os.getenv('TYPESENSE_RETRY_BUDGET_RATIO', '0.2'))
+TYPESENSE_HEALTHCHECK_INTERVAL_SECONDS = float(os.getenv('TYPESENSE_HEALTHCHECK_INTERVAL_SECONDS', '10'))
+TYPESENSE_POOL_SIZE = int(os.getenv('TYPESENSE_POOL_SIZE', '16'))
+
+RETRYABLE_ERRORS = (requests.exceptions.RequestException, HTTPStatus0Error, ServerError, ServiceUnavailable)
+BULK_ENDPOINTS = ('/documents/import', '/documents/export')
+
+
+def parse_node(value, protocol=TYPESENSE_PROTOCOL, port=TYPESENSE_PORT):
+    """A Typesense node dict from `host`, `host:port` or `protocol://host:port[/path]`."""
+    value = value.strip()
+    parsed = urlparse(value if '://' in value else f"{protocol}://{value}")
+    return {
+        'host': parsed.hostname,
+        'port': str(parsed.port or port),
+        'protocol': parsed.scheme,
+        'path': parsed.path.rstrip('/'),
+    }
+
+
+def configured_nodes(nodes=TYPESENSE_NODES):
+    entries = [entry for entry in nodes.split(',') if entry.strip()]
+    return [parse_node(entry) for entry in entries] or [parse_node(f"{TYPESENSE_HOST}:{TYPESENSE_PORT}")]
+
+
+class RetryBudget:
+    """
+    Shared cap on retries: every successful request deposits `ratio` of a retry, every
+    retry withdraws one, and `minimum` retries per second are always allowed so a cold
+    client can still fail over.
+    """
+
+    def __init__(self, ratio=TYPESENSE_RETRY_BUDGET_RATIO, minimum=5.0, maximum=100.0):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tokens = maximum
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.maximum, self.tokens + (now - self.updated) * self.minimum)
+        self.updated = now
+
+    def deposit(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class PooledApiCall(ApiCall):
+    """
+    ApiCall over one keep-alive `requests.Session` shared by all threads. Reads (GET and
+    searches) are spread round-robin over the healthy nodes; writes go to the nearest node
+    while it is healthy. Nodes are health-checked in the background, searches and bulk
+    calls get their own timeouts, and retries draw from a shared RetryBudget.
+    """
+
+    def __init__(self, config, pool_size=TYPESENSE_POOL_SIZE, search_timeout=TYPESENSE_SEARCH_TIMEOUT_SECONDS,
+                 bulk_timeout=TYPESENSE_BULK_TIMEOUT_SECONDS, retry_budget=None):
+        super().__init__(config)
+        self.search_timeout = search_timeout
+        self.bulk_timeout = bulk_timeout
+        self.retry_budget = retry_budget or RetryBudget()
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.all_nodes()), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers[ApiCall.API_KEY_HEADER_NAME] = config.api_key
+        # One round-robin cursor per candidate list, as reads and writes rotate over different nodes
+        self.cursors = {'read': 0, 'write': 0}
+        self.stop_event = threading.Event()
+        self.health_thread = None
+        if config.healthcheck_interval_seconds > 0:
+            self.health_thread = threading.Thread(target=self._health_check_loop, name='typesense-health', daemon=True)
+            self.health_thread.start()
+
+    def all_nodes(self):
+        nearest = [self.config.nearest_node] if self.config.nearest_node else []
+        return nearest + self.nodes
+
+    def check_health(self):
+        for node in self.all_nodes():
+            try:
+                response = self.session.get(f"{node.url()}/health", timeout=self.config.connection_timeout_seconds)
+                healthy = response.status_code == 200 and response.json().get('ok', False)
+            except (requests.exceptions.RequestException, ValueError):
+                healthy = False
+            if healthy != node.healthy:
+                logger.warning(f"Typesense node {node.host}:{node.port} is now {'healthy' if healthy else 'unhealthy'}")
+            self.set_node_healthcheck(node, healthy)
+
+    def _health_check_loop(self):
+        while not self.stop_event.wait(self.config.healthcheck_interval_seconds):
+            self.check_health()
+
+    def get_node(self, read=False):
+        nearest = self.config.nearest_node
+        if not read and nearest and (nearest.healthy or self.node_due_for_health_check(nearest)):
+            return nearest
+        candidates = self.all_nodes() if read else self.nodes
+        cursor = 'read' if read else 'write'
+        with self.lock:
+            for _ in range(len(candidates)):
+                self.cursors[cursor] = (self.cursors[cursor] + 1) % len(candidates)
+                node = candidates[self.cursors[cursor]]
+                if node.healthy or self.node_due_for_health_check(node):
+                    return node
+            # Nothing is known to be healthy; try the next node anyway
+            return candidates[self.cursors[cursor]]
+
+    def _timeout(self, method, endpoint):
+        # The client builds some paths with a trailing slash, e.g. `/collections/<c>/documents/`
+        endpoint = endpoint.rstrip('/')
+        if endpoint.endswith('/search') or endpoint == '/multi_search':
+            return self.search_timeout
+        if endpoint.endswith(BULK_ENDPOINTS) or (method == 'DELETE' and endpoint.endswith('/documents')):
+            return self.bulk_timeout
+        return self.config.connection_timeout_seconds
+
+    def request(self, method, endpoint, as_json=True, params=None, data=None, timeout=None):
+        # Searches are reads even when multi_search POSTs them
+        read = method == 'GET' or endpoint == '/multi_search'
+        timeout = timeout or self._timeout(method, endpoint)
+        if data is not None and not isinstance(data, (str, bytes)):
+            data = json.dumps(data)
+
+        last_exception = None
+        for attempt in range(self.config.num_retries + 1):
+            if attempt and not self.retry_budget.withdraw():
+                logger.warning(f"Typesense retry budget exhausted, giving up on {method} {endpoint}")
+                break
+            node = self.get_node(read)
+            try:
+                response = self.session.request(method, node.url() + endpoint, params=params, data=data, timeout=timeout)
+                if 0 < response.status_code < 500:
+                    self.set_node_healthcheck(node, True)
+                if not 200 <= response.status_code < 300:
+                    if response.headers.get('Content-Type', '').startswith('application/json'):
+                        error_message = response.json().get('message', 'API error.')
+                    else:
+                        error_message = 'API error.'
+                    raise ApiCall.get_exception(response.status_code)(response.status_code, error_message)
+                self.retry_budget.deposit()
+                return response.json() if as_json else response.text
+            except RETRYABLE_ERRORS as e:
+                self.set_node_healthcheck(node, False)
+                logger.debug(f"{method} {endpoint} on {node.host}:{node.port} failed: {e}")
+                last_exception = e
+                time.sleep(self.config.retry_interval_seconds)
+        raise last_exception
+
+    def get(self, endpoint, params=None, as_json=True):
+        return self.request('GET', endpoint, as_json, params=params or {})
+
+    def post(self, endpoint, body, params=None, as_json=True):
+        return self.request('POST', endpoint, as_json, params=params or {}, data=body)
+
+    def put(self, endpoint, body, params=None):
+        return self.request('PUT', endpoint, params=params, data=body)
+
+    def patch(self, endpoint, body, params=None):
+        return self.request('PATCH', endpoint, params=params, data=body)
+
+    def delete(self, endpoint, params=None):
+        return self.request('DELETE', endpoint, params=params)
+
+    def close(self):
+        """Stop the health checks and release the pooled connections."""
+        self.stop_event.set()
+        if self.health_thread is not None and self.health_thread is not threading.current_thread():
+            self.health_thread.join(timeout=self.config.connection_timeout_seconds * len(self.all_nodes()) + 1)
+        self.session.close()
+
+
+def build_typesense_client(nodes=None, nearest_node=TYPESENSE_NEAREST_NODE, api_key=TYPESENSE_API_KEY, **overrides):
+    """
+    Typesense client configured from the environment (see the TYPESENSE_* settings), with
+    its requests routed through a PooledApiCall. Build one per process and share it;
+    `client.close()` stops its health checks.
+    """
+    config = {
+        'nodes': nodes or configured_nodes(),
+        'api_key': api_key,
+        'connection_timeout_seconds': TYPESENSE_CONNECTION_TIMEOUT_SECONDS,
+        'num_retries': TYPESENSE_NUM_RETRIES,
+        'retry_interval_seconds': TYPESENSE_RETRY_INTERVAL_SECONDS,
+        'healthcheck_interval_seconds': TYPESENSE_HEALTHCHECK_INTERVAL_SECONDS,
+    }
+    if nearest_node:
+        config['nearest_node'] = parse_node(nearest_node)
+    config.update(overrides)
+
+    client = typesense.Client(config)
+    api_call = PooledApiCall(client.config)
+    # Every endpoint group holds the ApiCall it was built with
+    client.api_call = api_call
+    for group in (client.collections, client.multi_search, client.keys, client.aliases, client.operations, client.debug):
+        group.api_call = api_call
+    client.close = api_call.close
+    logger.info(f"Typesense nodes: {', '.join(f'{node.host}:{node.port}' for node in api_call.all_nodes())}")
+    return client
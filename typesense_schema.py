@@ -0,0 +1,61 @@
+# Field definitions shared by every script that creates or writes the discussion collections.
+#
+# Discussions are stored normalized: one record per discussion holding the fields shared by
+# all of its chunks (URL, author, comments), and lean chunk records that point at it through
+# `discussion_id`. The title stays on the chunks because it is searched together with the body.
+
+import logging
+
+from embeddings import EMBEDDING_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SCHEMA_FIELDS = [
+    {'name': 'repository', 'type': 'string', 'facet': True},
+    {'name': 'discussion_id', 'type': 'string', 'optional': True},
+    {'name': 'chunk_index', 'type': 'int32', 'optional': True},
+    {'name': 'title', 'type': 'string'},
+    {'name': 'bodyText', 'type': 'string'},
+    {'name': 'token_count', 'type': 'int32', 'optional': True},
+    {'name': 'createdAt', 'type': 'string'},
+    # Unix seconds of createdAt, for date-range filters and recency sorting
+    {'name': 'created_at', 'type': 'int64', 'sort': True, 'optional': True},
+    {'name': 'content_hash', 'type': 'string', 'index': False, 'optional': True},
+    # Chunk embedding for hybrid search; optional so chunks indexed without an embedder stay valid
+    {'name': 'embedding', 'type': 'float[]', 'num_dim': EMBEDDING_DIMENSIONS, 'optional': True},
+]
+
+DISCUSSION_SCHEMA_FIELDS = [
+    {'name': 'repository', 'type': 'string', 'facet': True},
+    {'name': 'title', 'type': 'string'},
+    {'name': 'url', 'type': 'string'},
+    {'name': 'author', 'type': 'string', 'facet': True},
+    {'name': 'createdAt', 'type': 'string'},
+    {'name': 'created_at', 'type': 'int64', 'sort': True, 'optional': True},
+    {'name': 'comments', 'type': 'string[]'},
+    {'name': 'title_token_count', 'type': 'int32', 'optional': True},
+    {'name': 'comments_token_count', 'type': 'int32', 'optional': True},
+    {'name': 'content_hash', 'type': 'string', 'index': False, 'optional': True},
+]
+
+
+def ensure_schema_fields(client, collection_name, fields):
+    """
+    Add the fields of `fields` that an existing collection lacks. Fields whose definition
+    changed (e.g. one that became a facet) and fields no longer part of the layout are left
+    alone and only reported: dropping or redefining a field makes Typesense re-index every
+    document while the collection serves searches, so that goes through `--reindex`.
+    Returns the names of the added fields and of the ones that differ.
+    """
+    existing = {field['name']: field for field in client.collections[collection_name].retrieve()['fields']}
+    wanted = {field['name'] for field in fields}
+    missing = [field for field in fields if field['name'] not in existing]
+    changed = [field['name'] for field in fields if field['name'] in existing
+               and any(existing[field['name']].get(key) != value for key, value in field.items())]
+    differing = sorted(changed + [name for name in existing.keys() - wanted if name != 'id'])
+    if missing:
+        client.collections[collection_name].update({'fields': missing})
+    if differing:
+        logger.warning(f"Schema of collection '{collection_name}' differs from the layout for {differing}; "
+                       f"rebuild it with extract_and_insert_data_into.py --reindex")
+    return [field['name'] for field in missing], differing